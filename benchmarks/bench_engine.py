@@ -0,0 +1,83 @@
+"""
+Per-page overhead of model initialisation.
+
+"before": a new engine per page (the old MangaTranslator behaviour, models are
+constructed for every page). "after": one warm engine shared by all pages.
+
+    python benchmarks/bench_engine.py --pages 5
+    python benchmarks/bench_engine.py --pages 5 --full   # include detection + OCR
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from manga_translator.translator import TranslatorEngine
+
+DEFAULT_PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images', 'original')
+
+
+def list_pages(pages_dir, limit):
+    files = sorted(f for f in os.listdir(pages_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')))
+    return [os.path.join(pages_dir, f) for f in files[:limit]]
+
+
+def run_page(engine, image_path, full):
+    page = engine.page(image_path)
+    if full:
+        page.process_bubbles()
+    else:
+        # Только готовность моделей: то, что раньше делал конструктор страницы
+        engine.warm_up()
+    return page
+
+
+def bench_cold(pages, full):
+    """Новый движок на каждую страницу"""
+    timings = []
+    for image_path in pages:
+        start = time.perf_counter()
+        run_page(TranslatorEngine(), image_path, full)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_warm(pages, full):
+    """Один движок на все страницы"""
+    engine = TranslatorEngine()
+    timings = []
+    for image_path in pages:
+        start = time.perf_counter()
+        run_page(engine, image_path, full)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name, timings):
+    total = sum(timings)
+    print(f"{name:>7}: total {total:8.3f}s  per page {total / len(timings):7.3f}s  "
+          f"first {timings[0]:7.3f}s  rest avg {sum(timings[1:]) / max(1, len(timings) - 1):7.3f}s")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Per-page engine overhead benchmark')
+    parser.add_argument('--pages-dir', default=DEFAULT_PAGES_DIR)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--full', action='store_true', help='Also run detection and OCR on each page')
+    args = parser.parse_args()
+
+    pages = list_pages(args.pages_dir, args.pages)
+    if not pages:
+        print(f"No pages found in {args.pages_dir}")
+        return
+
+    report('before', bench_cold(pages, args.full))
+    report('after', bench_warm(pages, args.full))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+OCR preprocessing: fixed 2x upscale vs. scale chosen from the glyph height.
+
+Synthetic pages with known text are rendered at several scales (small to
+large lettering). Each bubble is cropped by its known bbox, preprocessed by
+both paths and recognized by PaddleOCR; the benchmark reports
+preprocessing and OCR time, pixels sent to OCR and accuracy against the
+known text (character similarity and exact word matches).
+
+    python benchmarks/bench_preprocess.py --pages 3 --scales 0.6,1,2,3
+    python benchmarks/bench_preprocess.py --stub    # timings only, no models
+"""
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+import cv2
+
+from manga_translator.ocr import parse_ocr_lines
+from manga_translator.preprocess import OCR_TEXT_HEIGHT, TextPreprocessor
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+
+def normalize(text):
+    return ' '.join(text.upper().split())
+
+
+def accuracy(expected, recognized):
+    """Похожесть по символам и доля угаданных слов"""
+    expected, recognized = normalize(expected), normalize(recognized)
+    similarity = difflib.SequenceMatcher(None, expected, recognized).ratio()
+    expected_words = expected.split()
+    recognized_words = set(recognized.split())
+    words = sum(word in recognized_words for word in expected_words) / max(1, len(expected_words))
+    return similarity, words
+
+
+def sample_bubbles(pages, scale):
+    """Кропы пузырей синтетических страниц в заданном масштабе с известным текстом"""
+    samples = []
+    for seed in range(pages):
+        image, bubbles = generate_page(seed=seed)
+        if scale != 1:
+            image = cv2.resize(image, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+        for bubble in bubbles:
+            x, y, w, h = (int(round(v * scale)) for v in bubble['bbox'])
+            samples.append((image[y:y + h, x:x + w], bubble['text']))
+    return samples
+
+
+def run_path(ocr, preprocess, samples):
+    preprocess_time = ocr_time = 0.0
+    pixels = 0
+    similarity = words = 0.0
+
+    for crop, text in samples:
+        start = time.perf_counter()
+        region = preprocess(crop)
+        preprocess_time += time.perf_counter() - start
+        pixels += region.size
+
+        start = time.perf_counter()
+        lines = parse_ocr_lines(ocr.ocr(region, cls=True))
+        ocr_time += time.perf_counter() - start
+
+        char_score, word_score = accuracy(text, ' '.join(line for line, _ in lines))
+        similarity += char_score
+        words += word_score
+
+    count = max(1, len(samples))
+    return {'preprocess_ms': preprocess_time * 1000, 'ocr_ms': ocr_time * 1000,
+            'mpx': pixels / 1e6, 'chars': similarity / count, 'words': words / count}
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Adaptive OCR preprocessing benchmark')
+    parser.add_argument('--pages', type=int, default=3, help='Synthetic pages per scale')
+    parser.add_argument('--scales', default='0.6,1,2,3', help='Page scales (lettering size)')
+    parser.add_argument('--text-height', type=int, default=OCR_TEXT_HEIGHT or 24,
+                        help='Target glyph height of the adaptive path')
+    parser.add_argument('--stub', action='store_true', help='Use the stub OCR (timings only)')
+    args = parser.parse_args()
+
+    if args.stub:
+        ocr = StubOCR()
+    else:
+        from manga_translator.translator import TranslatorEngine
+        ocr = TranslatorEngine().ocr
+
+    preprocessor = TextPreprocessor(target_text_height=args.text_height)
+    paths = [('fixed 2x', preprocessor.fixed), ('adaptive', preprocessor.process)]
+
+    # Прогревочный вызов, чтобы не учитывать инициализацию OCR
+    warm_up = sample_bubbles(1, 1.0)[:1]
+    run_path(ocr, preprocessor.fixed, warm_up)
+
+    print(f"{'scale':>6} {'path':<10} {'bubbles':>8} {'prep ms':>9} {'ocr ms':>9} {'Mpx':>7} "
+          f"{'chars':>6} {'words':>6}")
+    for scale in (float(value) for value in args.scales.split(',')):
+        samples = sample_bubbles(args.pages, scale)
+        for name, preprocess in paths:
+            result = run_path(ocr, preprocess, samples)
+            print(f"{scale:>6.2f} {name:<10} {len(samples):>8} {result['preprocess_ms']:>9.1f} "
+                  f"{result['ocr_ms']:>9.1f} {result['mpx']:>7.2f} {result['chars']:>6.2f} {result['words']:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Translation requests per page: one request per bubble vs. batched requests.
+
+Runs offline against StubBackend with a simulated per-request latency.
+
+    python benchmarks/bench_translate_batch.py --bubbles 40 --pages 10 --latency 0.05
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manga_translator.backends import StubBackend
+from manga_translator.cache import TranslationCache
+from manga_translator.translator import translate_batch
+
+WORDS = ['hey', 'wait', 'what', 'is', 'this', 'power', 'no', 'way', 'run', 'luffy', 'captain', 'ship']
+
+
+def make_texts(count, rng):
+    """Тексты пузырей страницы, часть из них повторяется"""
+    texts = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))) for _ in range(count)]
+    return texts + rng.sample(texts, k=count // 5)
+
+
+def run(mode, pages, backend, cache_dir):
+    cache = TranslationCache(os.path.join(cache_dir, f'{mode}.sqlite3'))
+    start = time.perf_counter()
+    for texts in pages:
+        if mode == 'per-bubble':
+            for text in texts:
+                translate_batch([text], 'ru', backend=backend, cache=cache)
+        else:
+            translate_batch(texts, 'ru', backend=backend, cache=cache)
+    elapsed = time.perf_counter() - start
+    cache.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batched translation benchmark (offline)')
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--bubbles', type=int, default=40, help='Bubbles per page')
+    parser.add_argument('--latency', type=float, default=0.05, help='Simulated seconds per request')
+    parser.add_argument('--max-chars', type=int, default=4500, help='Backend request size limit')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pages = [make_texts(args.bubbles, rng) for _ in range(args.pages)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for mode in ('per-bubble', 'batched'):
+            backend = StubBackend(latency=args.latency, max_batch_chars=args.max_chars)
+            elapsed = run(mode, pages, backend, cache_dir)
+            print(f"{mode:>10}: {elapsed:7.3f}s  requests {backend.requests:5d}  texts sent {backend.texts:5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Check that worker processes read pages of a .cbz correctly when the parent
+process opened the archive before the pool was forked (as main.py does when
+it lists pages and checks the page cache before run_chapter --workers).
+
+    python benchmarks/check_archive_workers.py [--workers 6] [--pages 40]
+
+Exits with status 1 if any page read in a worker differs from the archive.
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manga_translator.archive import list_pages, open_page, split_member_path
+
+
+def page_digests(image_path, repeat=3):
+    digests = []
+    for _ in range(repeat):
+        with open_page(image_path) as file:
+            digests.append(hashlib.md5(file.read()).hexdigest())
+    return digests
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive reads from forked worker processes')
+    parser.add_argument('--workers', type=int, default=6)
+    parser.add_argument('--pages', type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_path = os.path.join(tmp, 'chapter.cbz')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            for i in range(args.pages):
+                # Несжимаемые данные: чтение страницы - много seek/read по общему файлу
+                archive.writestr(f"{i + 1}.png", os.urandom(2_000_000))
+        with zipfile.ZipFile(archive_path) as archive:
+            expected = {name: hashlib.md5(archive.read(name)).hexdigest() for name in archive.namelist()}
+
+        # Архив открыт в главном процессе до создания пула, как в main.py
+        pages = list_pages(archive_path)
+        errors = 0
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(args.workers, mp_context=context) as executor:
+            for image_path, digests in zip(pages * 3, executor.map(page_digests, pages * 3)):
+                errors += sum(digest != expected[split_member_path(image_path)[1]] for digest in digests)
+
+    print(f"{len(pages) * 9} page reads in {args.workers} workers, {errors} corrupt")
+    print("FAILED" if errors else "OK")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Check of the NumPy contour table against the previous per-contour
+detection, with timings.
+
+For every page, selects bubbles the old way (contourArea, arcLength,
+approxPolyDP and boundingRect per contour, sorted by area, filtered by
+aspect ratio) and compares the result with detect_bubble_table: the same
+contours must be selected in the same order with the same bounding boxes,
+and the perimeters must match arcLength. With --max-side the page is also
+detected on a downscaled copy and the boxes are compared with full
+resolution: at least 90% of the bubbles that stay 30px or larger in the copy
+must be found again.
+
+    python benchmarks/check_contours.py [--pages-dir images/original] [--max-side 1024]
+
+Exits with status 1 if any page differs.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from manga_translator.spatial import overlap_ratio
+from manga_translator.translator import MangaTranslator
+
+from bench_engine import DEFAULT_PAGES_DIR, list_pages
+
+
+def legacy_select(image):
+    """Прежний отбор пузырей: признаки считаются для каждого контура отдельно"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    bubbles = []
+    for contour in contours:
+        if cv2.contourArea(contour) > 100:
+            epsilon = 0.02 * cv2.arcLength(contour, True)
+            if len(cv2.approxPolyDP(contour, epsilon, True)) > 5:
+                bubbles.append(contour)
+
+    selected = []
+    for contour in sorted(bubbles, key=cv2.contourArea, reverse=True):
+        if cv2.contourArea(contour) < 100:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        if w / h > 5 or w / h < 0.2:
+            continue
+        selected.append((contour, (x, y, w, h)))
+    return selected
+
+
+def table_select(page, max_side=0):
+    table = page.detect_bubble_table(max_side=max_side).sorted_by_area()
+    aspect_ratio = table.aspect_ratio
+    return table.select((table.area >= 100) & (aspect_ratio <= 5) & (aspect_ratio >= 0.2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contour table regression check')
+    parser.add_argument('--pages-dir', default=DEFAULT_PAGES_DIR)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--max-side', type=int, default=0,
+                        help='Also compare detection on a copy downscaled to this side')
+    args = parser.parse_args()
+
+    violations = []
+    for image_path in list_pages(args.pages_dir, args.pages):
+        name = os.path.basename(image_path)
+        page = MangaTranslator(image_path)
+
+        start = time.perf_counter()
+        expected = legacy_select(page.image)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table = table_select(page)
+        table_time = time.perf_counter() - start
+
+        problems = []
+        if len(table) != len(expected):
+            problems.append(f"{len(table)} bubbles instead of {len(expected)}")
+        else:
+            for i, (contour, bbox) in enumerate(expected):
+                if not np.array_equal(table.contours[i], contour) or tuple(table.bbox[i].tolist()) != bbox:
+                    problems.append(f"bubble {i} differs")
+                    break
+            perimeters = np.array([cv2.arcLength(contour, True) for contour, _ in expected])
+            if not np.allclose(table.perimeter, perimeters, rtol=1e-6, atol=1e-3):
+                problems.append("perimeters differ from arcLength")
+
+        if args.max_side and max(page.image.shape[:2]) > args.max_side:
+            scale = args.max_side / max(page.image.shape[:2])
+            scaled = table_select(page, args.max_side).bbox.tolist()
+            # Мелкие кандидаты в уменьшенной копии теряются закономерно
+            full = [bbox for bbox in table.bbox.tolist() if min(bbox[2], bbox[3]) * scale >= 30]
+            # Пузырь найден в уменьшенной копии, если рамки почти совпадают
+            found = sum(any(overlap_ratio(bbox, other) > 0.8 for other in scaled) for bbox in full)
+            print(f"{name:>20}: max side {args.max_side}: {len(scaled)} bubbles, "
+                  f"{found} of {len(full)} large bubbles matched")
+            if found < 0.9 * len(full):
+                problems.append(f"downscaled detection matched {found} of {len(full)} large bubbles")
+
+        status = 'ok' if not problems else ', '.join(problems)
+        print(f"{name:>20}: {len(expected):4d} bubbles  per-contour {legacy_time * 1000:7.1f}ms  "
+              f"table {table_time * 1000:7.1f}ms  {status}")
+        violations.extend(f"{name}: {problem}" for problem in problems)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Check of the concurrent image downloader against a local HTTP server.
+
+Serves generated image bytes from http.server with slow, flaky (503 then
+200), failing (500), missing (404) and ETag-aware routes, downloads a chapter
+with ImageDownloader and checks that:
+
+  - slow images are fetched concurrently, never above max_concurrency;
+  - flaky images are retried and saved intact;
+  - failing and missing URLs, and a file that cannot be written, are reported
+    per URL while the rest of the chapter is still downloaded;
+  - a second run sends conditional requests and skips unchanged images;
+  - no .part files are left behind.
+
+    python benchmarks/check_downloader.py [--images 12] [--concurrency 4] [--delay 0.2]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manga_translator.downloader import ImageDownloader
+
+
+def image_bytes(name):
+    """Детерминированное "изображение" для имени"""
+    return hashlib.sha256(name.encode('utf-8')).digest() * 2048
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        route, _, name = self.path.strip('/').partition('/')
+        with server.lock:
+            server.requests[self.path] = server.requests.get(self.path, 0) + 1
+            count = server.requests[self.path]
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            if route == 'slow':
+                time.sleep(server.delay)
+            body = image_bytes(name)
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            if route == 'fail':
+                self._reply(500)
+            elif route == 'flaky' and count <= 2:
+                self._reply(503)
+            elif route not in ('slow', 'flaky', 'image'):
+                self._reply(404)
+            elif self.headers.get('If-None-Match') == etag:
+                self._reply(304, headers={'ETag': etag})
+            else:
+                with server.lock:
+                    server.bodies[self.path] = server.bodies.get(self.path, 0) + 1
+                self._reply(200, body, {'ETag': etag, 'Content-Type': 'image/png'})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class ImageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Клиент закрывает соединение, не дочитав тело незаписываемого файла
+        pass
+
+
+def start_server(delay):
+    server = ImageServer(('127.0.0.1', 0), ImageHandler)
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.requests = {}
+    server.in_flight = server.max_in_flight = 0
+    server.bodies = {}
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Image downloader check against a local server')
+    parser.add_argument('--images', type=int, default=12, help='Number of slow images')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--delay', type=float, default=0.2, help='Seconds per slow image')
+    parser.add_argument('--retries', type=int, default=3)
+    args = parser.parse_args()
+
+    server = start_server(args.delay)
+    # Страница главы: маршрут и ожидаемый статус по порядку
+    pages = [('slow', 'downloaded')] * args.images + [
+        ('flaky', 'downloaded'), ('image', 'failed'), ('fail', 'failed'), ('missing', 'failed')]
+    urls = [f"{server.url}/{route}/{i}.png" for i, (route, _) in enumerate(pages, 1)]
+    filenames = [f"{i}.png" for i in range(1, len(pages) + 1)]
+    expected = [status for _, status in pages]
+    # Файл страницы 'image' записать нельзя: на месте .part лежит директория
+    blocked = args.images + 2
+
+    violations = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, f"{blocked}.png.part"))
+        downloader = ImageDownloader(tmp, max_concurrency=args.concurrency, retries=args.retries, backoff=0.01,
+                                     timeout=10)
+
+        start = time.perf_counter()
+        results = downloader.download_all(urls, filenames)
+        elapsed = time.perf_counter() - start
+        sequential = args.images * args.delay
+        print(f"{len(urls)} urls in {elapsed:.2f}s (sequential slow images {sequential:.2f}s), "
+              f"max in flight {server.max_in_flight}, requests {sum(server.requests.values())}")
+
+        statuses = [status for _, status in results]
+        for url, status, want in zip(urls, statuses, expected):
+            if status != want:
+                violations.append(f"{url}: {status}, expected {want}")
+        for (path, status), url in zip(results, urls):
+            if status == 'downloaded':
+                with open(path, 'rb') as file:
+                    if file.read() != image_bytes(os.path.basename(url)):
+                        violations.append(f"{path} does not match {url}")
+        if server.max_in_flight > args.concurrency:
+            violations.append(f"{server.max_in_flight} requests in flight, limit {args.concurrency}")
+        if args.concurrency > 1 and elapsed > sequential * 0.75:
+            violations.append(f"slow images were not fetched concurrently ({elapsed:.2f}s)")
+        fail_requests = server.requests.get(f"/fail/{len(pages) - 1}.png", 0)
+        if fail_requests != args.retries + 1:
+            violations.append(f"failing url requested {fail_requests} times, expected {args.retries + 1}")
+        missing_requests = server.requests.get(f"/missing/{len(pages)}.png", 0)
+        if missing_requests != 1:
+            violations.append(f"missing url requested {missing_requests} times, 404 must not be retried")
+
+        # Повторный запуск: условные запросы, тела скачанных файлов не передаются
+        downloaded = [url for url, status in zip(urls, statuses) if status == 'downloaded']
+        bodies = sum(server.bodies.get(url[len(server.url):], 0) for url in downloaded)
+        downloader = ImageDownloader(tmp, max_concurrency=args.concurrency, retries=args.retries, backoff=0.01,
+                                     timeout=10)
+        rerun = dict(downloader.download_all(urls, filenames))
+        unchanged = sum(rerun[path] == 'unchanged' for path, status in results if status == 'downloaded')
+        resent = sum(server.bodies.get(url[len(server.url):], 0) for url in downloaded) - bodies
+        print(f"second run: {unchanged} unchanged, {resent} bodies sent")
+        if unchanged != expected.count('downloaded'):
+            violations.append(f"second run skipped {unchanged} of {expected.count('downloaded')} images")
+        if resent:
+            violations.append(f"second run re-downloaded {resent} unchanged images")
+
+        leftovers = [name for name in os.listdir(tmp)
+                     if name.endswith('.part') and name != f"{blocked}.png.part"]
+        if leftovers:
+            violations.append(f"partial files left: {leftovers}")
+    server.shutdown()
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Pixel-by-pixel check of the ROI-local bubble erase against the previous
+full-page implementation, with timings.
+
+    python benchmarks/check_erase_regression.py [--pages-dir images/original]
+
+Exits with status 1 if any page differs.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from manga_translator.translator import MangaTranslator
+
+from bench_engine import DEFAULT_PAGES_DIR, list_pages
+
+
+def legacy_remove_text_from_bubble(image, output_image, contour):
+    """Прежняя реализация с масками на всю страницу"""
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    cv2.drawContours(mask, [contour], -1, (255), -1)
+
+    border_mask = np.zeros_like(mask)
+    cv2.drawContours(border_mask, [contour], -1, (255), 2)
+
+    white_background = np.ones_like(output_image) * 255
+
+    mask_3channel = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
+    output_image = np.where(mask_3channel == 255, white_background, output_image)
+
+    border_mask_3channel = cv2.cvtColor(border_mask, cv2.COLOR_GRAY2BGR)
+    original_borders = cv2.bitwise_and(image, border_mask_3channel)
+    return cv2.addWeighted(output_image, 1, original_borders, 1, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ROI-local erase regression check')
+    parser.add_argument('--pages-dir', default=DEFAULT_PAGES_DIR)
+    parser.add_argument('--pages', type=int, default=100)
+    args = parser.parse_args()
+
+    failures = 0
+    for image_path in list_pages(args.pages_dir, args.pages):
+        page = MangaTranslator(image_path)
+        contours = page.detect_speech_bubbles()
+
+        start = time.perf_counter()
+        expected = page.image.copy()
+        for contour in contours:
+            expected = legacy_remove_text_from_bubble(page.image, expected, contour)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for contour in contours:
+            page.remove_text_from_bubble(contour)
+        roi_time = time.perf_counter() - start
+
+        differing = int(np.count_nonzero(np.any(expected != page.output_image, axis=2)))
+        status = 'ok' if differing == 0 else f'{differing} pixels differ'
+        failures += differing != 0
+        print(f"{os.path.basename(image_path):>20}: {len(contours):4d} bubbles  "
+              f"full-page {legacy_time * 1000:8.1f}ms  roi {roi_time * 1000:7.1f}ms  {status}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
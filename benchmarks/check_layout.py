@@ -0,0 +1,158 @@
+"""
+Pixel-by-pixel check of the cached text layout against the previous
+draw_text_on_image, with timings.
+
+Draws random texts (short and long words, Latin and Cyrillic, words that
+need hyphenation) into random boxes on a blank page, once with the previous
+per-bubble implementation (font size stepped down one by one, a colour
+conversion per bubble) and once with TextLayout.render in a single pass,
+and checks that the pages are identical.
+
+    python benchmarks/check_layout.py [--cases 400] [--bubbles 12]
+
+Exits with status 1 if any page differs.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('FONT_PATH', os.path.join(ROOT, 'fonts', 'animeacev05.ttf'))
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from manga_translator.layout import TextLayout
+from manga_translator.translator import FONT_PATH
+
+WORDS = ['I', 'no', 'yes', 'what', 'really', 'impossible', 'understand', 'да', 'нет', 'что',
+         'конечно', 'невероятно', 'переводчик', 'достопримечательность', 'supercalifragilistic',
+         'WAAAAAAAAAH', '...', '!?']
+
+
+def legacy_hyphenate_word(word, max_width, draw, font):
+    """Прежний перенос слова"""
+    if not word:
+        return []
+    vowels = 'аеёиоуыэюяАЕЁИОУЫЭЮЯ'
+    consonants = 'бвгджзйклмнпрстфхцчшщБВГДЖЗЙКЛМНПРСТФХЦЧШЩ'
+    for i in range(len(word) - 1, 1, -1):
+        if (word[i - 1] in vowels and word[i] in consonants) or \
+                (word[i - 1] in consonants and word[i] in consonants):
+            first_part = word[:i] + '-'
+            bbox = draw.textbbox((0, 0), first_part, font=font)
+            if bbox[2] - bbox[0] <= max_width:
+                return [first_part, word[i:]]
+    mid = len(word) // 2
+    return [word[:mid] + '-', word[mid:]]
+
+
+def legacy_draw_text_on_image(image, text, x, y, w, h, max_font_size=15, padding=4):
+    """Прежняя отрисовка: перебор размеров шрифта и преобразование цвета на каждый пузырь"""
+    img_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    draw = ImageDraw.Draw(img_pil)
+    if w < 20 or h < 20:
+        return image
+
+    inner_x, inner_y = x + padding, y + padding
+    inner_w, inner_h = w - 2 * padding, h - 2 * padding
+    min_font_size = 8
+    font_size = min(h // 2, max_font_size)
+    while font_size >= min_font_size:
+        font = ImageFont.truetype(FONT_PATH, font_size)
+        lines = []
+        current_line = ""
+        for word in text.split():
+            test_line = f"{current_line} {word}".strip()
+            bbox = draw.textbbox((0, 0), test_line, font=font)
+            if bbox[2] - bbox[0] <= inner_w:
+                current_line = test_line
+            else:
+                if current_line:
+                    lines.append(current_line)
+                    current_line = ""
+                word_bbox = draw.textbbox((0, 0), word, font=font)
+                if word_bbox[2] - word_bbox[0] > inner_w:
+                    word_parts = legacy_hyphenate_word(word, inner_w, draw, font)
+                    if word_parts:
+                        lines.append(word_parts[0])
+                        current_line = word_parts[1]
+                else:
+                    current_line = word
+        if current_line:
+            lines.append(current_line)
+
+        total_height = sum(draw.textbbox((0, 0), line, font=font)[3] - draw.textbbox((0, 0), line, font=font)[1]
+                           for line in lines)
+        if total_height <= inner_h:
+            current_y = inner_y + (inner_h - total_height) // 2
+            for line in lines:
+                bbox = draw.textbbox((0, 0), line, font=font)
+                text_x = inner_x + (inner_w - (bbox[2] - bbox[0])) // 2
+                draw.text((text_x, current_y), line, fill='black', font=font)
+                current_y += bbox[3] - bbox[1]
+            break
+        font_size -= 1
+
+    if font_size < min_font_size:
+        draw.text((inner_x, inner_y), text, fill='black', font=ImageFont.load_default())
+    return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+
+
+def random_page(rng, bubbles):
+    """Непересекающиеся пузыри со случайными текстами на сетке страницы"""
+    items = []
+    columns = 4
+    for i in range(bubbles):
+        cell_x, cell_y = (i % columns) * 200, (i // columns) * 200
+        w, h = rng.randint(40, 190), rng.randint(30, 190)
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        items.append((text, cell_x + rng.randint(0, 195 - w), cell_y + rng.randint(0, 195 - h), w, h))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Text layout regression check')
+    parser.add_argument('--cases', type=int, default=400, help='Number of bubbles in total')
+    parser.add_argument('--bubbles', type=int, default=12, help='Bubbles per page')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    layout = TextLayout(FONT_PATH, 15)
+    pages = (args.cases + args.bubbles - 1) // args.bubbles
+    height = ((args.bubbles + 3) // 4) * 200
+    blank = np.full((height, 800, 3), 255, dtype=np.uint8)
+
+    failures = 0
+    legacy_time = layout_time = 0.0
+    for page in range(pages):
+        items = random_page(rng, args.bubbles)
+
+        start = time.perf_counter()
+        expected = blank
+        for text, x, y, w, h in items:
+            expected = legacy_draw_text_on_image(expected, text, x, y, w, h)
+        legacy_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = layout.render(blank, items)
+        layout_time += time.perf_counter() - start
+
+        differing = int(np.count_nonzero(np.any(expected != result, axis=2)))
+        if differing:
+            failures += 1
+            print(f"page {page}: {differing} pixels differ")
+
+    print(f"{pages * args.bubbles} bubbles on {pages} pages: previous {legacy_time * 1000:.0f}ms, "
+          f"layout {layout_time * 1000:.0f}ms, {layout.size_attempts} font sizes tried")
+    print("OK" if not failures else f"FAILED: {failures} pages differ")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
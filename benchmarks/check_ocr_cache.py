@@ -0,0 +1,114 @@
+"""
+Check of the OCR cache on short lines and of its eviction.
+
+Short words are rendered with the repo font into same-size bubbles and
+preprocessed as for OCR. Pairs such as NO/UP and WHAT/WAIT then differ by
+only about 10 of 1024 hash bits. One word of each pair is cached, then:
+- the other word must miss the cache with the default OCR_CACHE_DISTANCE
+  (the count of wrong texts at distance 16 is printed for comparison);
+- the cached word, rendered again, must be a hit with its own text.
+
+The check then fills a small cache past its limit and counts how often
+eviction reloads the in-memory index.
+
+    python benchmarks/check_ocr_cache.py [--font fonts/animeacev05.ttf]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from manga_translator.ocr_cache import _POPCOUNT, OCRCache, dhash
+from manga_translator.preprocess import TextPreprocessor
+
+PAIRS = [('NO', 'UP'), ('WAY', 'RUN'), ('WHAT', 'WAIT'), ('OK', 'GO'), ('HEY', 'WHO'), ('WHY?', 'STOP')]
+# Обычный пузырь: при тексте 14px контур пузыря занимает большую часть хэша
+BUBBLE_SIZE = (200, 140)
+FONT_SIZE = 14
+
+
+def render_word(word, font):
+    """Кроп пузыря со словом по центру, BGR"""
+    image = Image.new('RGB', BUBBLE_SIZE, 'white')
+    draw = ImageDraw.Draw(image)
+    draw.ellipse([2, 2, BUBBLE_SIZE[0] - 3, BUBBLE_SIZE[1] - 3], outline='black', width=3)
+    width = draw.textlength(word, font=font)
+    draw.text(((BUBBLE_SIZE[0] - width) // 2, (BUBBLE_SIZE[1] - FONT_SIZE) // 2), word, fill='black', font=font)
+    return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+
+
+def distance(a, b):
+    return int(_POPCOUNT[np.frombuffer(dhash(a), dtype=np.uint8) ^ np.frombuffer(dhash(b), dtype=np.uint8)].sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR cache short-line and eviction check')
+    parser.add_argument('--font', default='fonts/animeacev05.ttf')
+    args = parser.parse_args()
+
+    font = ImageFont.truetype(args.font, FONT_SIZE)
+    preprocessor = TextPreprocessor()
+    regions = {word: preprocessor.process(render_word(word, font)) for pair in PAIRS for word in pair}
+    cached = [first for first, _ in PAIRS]
+    violations = []
+
+    for first, second in PAIRS:
+        if regions[first].shape == regions[second].shape:
+            print(f"  {first} vs {second}: {distance(regions[first], regions[second])} bits")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = OCRCache(os.path.join(tmp, 'ocr.sqlite3'))
+        cache.store([cache.key(regions[word], 'en') for word in cached], [[(word, 0.9)] for word in cached])
+        cache.close()
+
+        # Новый процесс: кэш читается из базы, области рисуются заново
+        cache = OCRCache(os.path.join(tmp, 'ocr.sqlite3'))
+        near = OCRCache(os.path.join(tmp, 'ocr.sqlite3'), max_distance=16)
+        again = {word: preprocessor.process(render_word(word, font)) for word in regions}
+        for first, second in PAIRS:
+            own, other = cache.lookup([cache.key(again[first], 'en'), cache.key(again[second], 'en')])
+            if own is None or own[0][0] != first:
+                violations.append(f"{first}: expected its own cached text, got {own}")
+            if other is not None:
+                violations.append(f"{second}: got the text of another bubble {other[0][0]!r}")
+        wrong = sum(lines is not None for lines in near.lookup([near.key(again[second], 'en')
+                                                                 for _, second in PAIRS]))
+        print(f"Lookups: {cache.stats()}; with distance 16, {wrong}/{len(PAIRS)} uncached words get another text")
+        cache.close()
+        near.close()
+
+        cache = OCRCache(os.path.join(tmp, 'evict.sqlite3'), max_entries=100)
+        loads = []
+        original_load = cache._load
+        cache._load = lambda: (loads.append(1), original_load())
+        for i in range(300):
+            region = np.full((20, 40), 255, dtype=np.uint8)
+            cv2.putText(region, str(i), (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 0, 1)
+            cache.store([cache.key(region, 'en')], [[(str(i), 0.9)]])
+        entries = cache.stats()['entries']
+        print(f"Eviction: 300 stores into 100 entries, {len(loads)} reloads, {entries} entries left")
+        if entries > 100:
+            violations.append(f"{entries} entries above the limit of 100")
+        if len(loads) > 25:
+            violations.append(f"eviction reloaded the cache {len(loads)} times")
+        cache.close()
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Check of the staged page pipeline (--pipeline) against the sequential run.
+
+Translates a synthetic chapter with a broken page in the middle twice, with
+the stub OCR and the stub translation backend (with a simulated request
+latency): once sequentially and once through the pipeline. Checks that:
+
+  - results come back in page order and the broken page fails alone;
+  - every other output file is byte-identical to the sequential one;
+  - the trace has a page event for every page with the same counters as
+    the sequential run, and the peak memory;
+  - the pipeline is faster, since translation waits overlap other stages;
+  - bounded queues keep the number of items in flight limited, and a
+    consumer that stops early leaves no stage threads behind.
+
+    python benchmarks/check_pipeline.py [--pages 8] [--latency 0.2]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Окружение задается до импорта пакета: модули читают его при импорте
+os.environ.update({'TRANSLATION_BACKEND': 'stub', 'DEFAULT_TARGET_LANG': 'ru',
+                   'TRANSLATION_CACHE_PATH': '', 'OCR_CACHE_PATH': ''})
+os.environ.setdefault('FONT_PATH', os.path.join(ROOT, 'fonts', 'animeacev05.ttf'))
+
+import cv2
+
+from manga_translator.backends import get_backend
+from manga_translator.instrumentation import Tracer, set_tracer
+from manga_translator.pipeline import Pipeline, Stage
+from manga_translator.runner import run_chapter
+from manga_translator.translator import TranslatorEngine
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+
+def run(images, output_dir, pipelined):
+    os.makedirs(output_dir)
+    engine = TranslatorEngine(ocr=StubOCR(), model=None)
+    tracer = set_tracer(Tracer())
+    start = time.perf_counter()
+    results = run_chapter(images, output_dir, True, engine=engine, pipelined=pipelined)
+    elapsed = time.perf_counter() - start
+    set_tracer(None)
+    pages = {event['page']: event['args'] for event in tracer.events if event['name'] == 'page'}
+    return results, elapsed, pages
+
+
+def check_trace(sequential, pipelined, violations):
+    """События страниц конвейера совпадают с последовательным прогоном"""
+    for image_path, expected in sequential.items():
+        name = os.path.basename(image_path)
+        if image_path not in pipelined:
+            violations.append(f"{name}: no page event in the pipeline trace")
+            continue
+        # Время ожидания ограничителя частоты от прогона к прогону разное
+        counters = {key: value for key, value in pipelined[image_path]['counters'].items()
+                    if key != 'translation_rate_wait_ms'}
+        expected_counters = {key: value for key, value in expected['counters'].items()
+                             if key != 'translation_rate_wait_ms'}
+        if counters != expected_counters:
+            violations.append(f"{name}: pipeline page counters {counters}, sequential {expected_counters}")
+        if pipelined[image_path].get('peak_memory_mb') is None and expected.get('peak_memory_mb') is not None:
+            violations.append(f"{name}: no peak memory in the pipeline page event")
+    if set(pipelined) != set(sequential):
+        violations.append(f"pipeline trace has {len(pipelined)} page events, sequential {len(sequential)}")
+
+
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def check_backpressure(violations, items=60, queue_size=2):
+    """Число элементов в работе ограничено очередями, ранний выход останавливает потоки"""
+    stages = [Stage('fast', lambda item: item, 2), Stage('slow', lambda item: time.sleep(0.005) or item, 3)]
+    fed = [0]
+
+    def source():
+        for i in range(items):
+            fed[0] += 1
+            yield i
+
+    threads_before = threading.active_count()
+    # Очереди между стадиями и потоки стадий, с запасом на элемент у подающего потока
+    # и элементы, ждущие своей очереди; без ограничения очередей подача уходит на всю главу
+    limit = 2 * ((len(stages) + 1) * queue_size + sum(stage.workers for stage in stages)) + 1
+    lead = 0
+    results = Pipeline(stages, queue_size).run(source())
+    for consumed, (index, item, error) in enumerate(results, 1):
+        time.sleep(0.01)
+        lead = max(lead, fed[0] - consumed)
+        if index != item or error is not None:
+            violations.append(f"pipeline returned {index}, {item}, {error}")
+            break
+        if consumed == items // 2:
+            # Потребитель уходит раньше конца
+            break
+    results.close()
+    print(f"pipeline: at most {lead} items in flight (limit {limit}), "
+          f"{threading.active_count() - threads_before} threads left after an early exit")
+    if lead > limit:
+        violations.append(f"{lead} items in flight with queue size {queue_size}, limit {limit}")
+    if threading.active_count() != threads_before:
+        violations.append("stage threads are still running after the consumer stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page pipeline check against the sequential run')
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2, help='Simulated seconds per translation request')
+    args = parser.parse_args()
+
+    get_backend().latency = args.latency
+    violations = []
+    with tempfile.TemporaryDirectory() as tmp:
+        images = []
+        for i in range(args.pages):
+            images.append(os.path.join(tmp, f"{i + 1}.png"))
+            cv2.imwrite(images[-1], generate_page(seed=i)[0])
+        # Битая страница в середине главы
+        broken = os.path.join(tmp, 'broken.png')
+        with open(broken, 'wb') as file:
+            file.write(b'not an image')
+        images.insert(args.pages // 2, broken)
+
+        sequential, sequential_time, sequential_pages = run(images, os.path.join(tmp, 'sequential'), False)
+        pipelined, pipelined_time, pipelined_pages = run(images, os.path.join(tmp, 'pipelined'), True)
+        print(f"{len(images)} pages: sequential {sequential_time:.2f}s, pipeline {pipelined_time:.2f}s")
+        check_trace(sequential_pages, pipelined_pages, violations)
+
+        if [result['image_path'] for result in pipelined] != images:
+            violations.append("pipeline results are not in page order")
+        for first, second in zip(sequential, pipelined):
+            name = os.path.basename(first['image_path'])
+            if first['image_path'] == broken:
+                if first['success'] or second['success']:
+                    violations.append("broken page did not fail")
+            elif not (first['success'] and second['success']):
+                violations.append(f"{name}: sequential {first['error']}, pipeline {second['error']}")
+            elif read_bytes(first['output_path']) != read_bytes(second['output_path']):
+                violations.append(f"{name}: pipeline output differs from the sequential one")
+        if args.latency and pipelined_time > sequential_time * 0.75:
+            violations.append(f"pipeline took {pipelined_time:.2f}s, sequential {sequential_time:.2f}s")
+
+    check_backpressure(violations)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Check of partial re-rendering of page projects against a full redraw.
+
+Builds a project by hand on a textured clean plate with bubbles whose boxes
+overlap and a bubble too small for its text (the text overflows the box),
+edits some translations, renders only the changes and checks that:
+
+  - the partially redrawn page is pixel-identical to a full redraw;
+  - bubbles far from the edits are not redrawn.
+
+Then translates a synthetic page into two languages with --save-project
+and checks that the clean plate is written once and shared by both projects.
+
+    python benchmarks/check_project_render.py
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Окружение задается до импорта пакета: модули читают его при импорте
+os.environ.update({'TRANSLATION_BACKEND': 'stub', 'TRANSLATION_CACHE_PATH': '', 'OCR_CACHE_PATH': ''})
+os.environ.setdefault('FONT_PATH', os.path.join(ROOT, 'fonts', 'animeacev05.ttf'))
+
+import cv2
+import numpy as np
+
+from manga_translator.project import CLEAN_PLATE_SUFFIX, PageProject, encode_contour
+from manga_translator.runner import translate_page_targets
+from manga_translator.translator import FONT_PATH, TranslatorEngine
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+# (x, y, w, h, исходный перевод, новый перевод или None)
+BLOCKS = [
+    (40, 40, 200, 110, "first bubble text", "edited first bubble with a longer text"),
+    (150, 70, 200, 110, "overlapping neighbour", None),
+    (420, 40, 150, 90, "untouched bubble", None),
+    (60, 260, 44, 30, "tiny", "a text far too long for this tiny bubble"),
+    (100, 262, 160, 80, "next to the tiny one", None),
+    (420, 280, 150, 90, "far away", None),
+]
+
+
+def make_project(directory, name, clean_plate):
+    blocks = []
+    for x, y, w, h, text, _ in BLOCKS:
+        contour = np.array([[[x, y]], [[x + w, y]], [[x + w, y + h]], [[x, y + h]]], dtype=np.int32)
+        blocks.append({'text': text, 'confidence': 1.0, 'bbox': [x, y, w, h],
+                       'contour': encode_contour(contour), 'translation': text, 'rendered': text})
+    project = PageProject(os.path.join(directory, f"{name}.json"), 'page.png',
+                          os.path.join(directory, f"{name}.png"), [clean_plate.shape[1], clean_plate.shape[0]],
+                          blocks, FONT_PATH, 15, 4, {'format': 'png', 'png_compression': None,
+                                                     'jpeg_quality': 95, 'webp_quality': None,
+                                                     'webp_lossless': False, 'max_width': 0},
+                          os.path.join(directory, 'page' + CLEAN_PLATE_SUFFIX))
+    project.clean_plate = clean_plate
+    project.save()
+    return project
+
+
+def check_partial(tmp, violations):
+    rng = np.random.default_rng(0)
+    clean_plate = rng.integers(200, 256, (400, 640, 3), dtype=np.uint8)
+    partial = make_project(tmp, 'partial', clean_plate)
+    full = make_project(tmp, 'full', clean_plate)
+    partial.render(full=True)
+
+    for project in (partial, full):
+        for block, (*_, edited) in zip(project.blocks, BLOCKS):
+            if edited is not None:
+                block['translation'] = edited
+    redrawn = partial.render()
+    full.render(full=True)
+
+    partial_image, full_image = cv2.imread(partial.output_path), cv2.imread(full.output_path)
+    differing = int(np.count_nonzero(np.any(partial_image != full_image, axis=2)))
+    print(f"partial render redrew {redrawn} of {len(BLOCKS)} bubbles, {differing} pixels differ from a full redraw")
+    if differing:
+        violations.append(f"partial render differs from a full redraw in {differing} pixels")
+    if redrawn >= len(BLOCKS):
+        violations.append("partial render redrew every bubble")
+    if PageProject.load(partial.path).changed():
+        violations.append("rendered translations were not saved in the project")
+
+
+def check_shared_clean_plate(tmp, violations):
+    image_path = os.path.join(tmp, 'page.png')
+    cv2.imwrite(image_path, generate_page(seed=3)[0])
+    output_dir, project_dir = os.path.join(tmp, 'out'), os.path.join(tmp, 'projects')
+    for target_lang in ('en', 'ru'):
+        os.makedirs(os.path.join(output_dir, target_lang))
+    engine = TranslatorEngine(ocr=StubOCR(), model=None)
+    outputs = translate_page_targets(image_path, output_dir, ['en', 'ru'], engine, project_dir=project_dir)
+
+    plates = [os.path.relpath(os.path.join(root, name), project_dir)
+              for root, _, names in os.walk(project_dir) for name in names if name.endswith(CLEAN_PLATE_SUFFIX)]
+    print(f"clean plates: {plates}")
+    name = os.path.splitext(os.path.basename(outputs['en']))[0]
+    if plates != [name + CLEAN_PLATE_SUFFIX]:
+        violations.append(f"expected one shared clean plate, found {plates}")
+    for target_lang, output_path in outputs.items():
+        project = PageProject.load(os.path.join(project_dir, target_lang, f"{name}.json"))
+        if project.clean_plate_path != os.path.join(project_dir, name + CLEAN_PLATE_SUFFIX):
+            violations.append(f"{target_lang} project points to {project.clean_plate_path}")
+        expected = cv2.imread(output_path)
+        if project.render(full=True) == 0 or not np.array_equal(cv2.imread(output_path), expected):
+            violations.append(f"{target_lang} project does not re-render to the same page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page project partial render check')
+    parser.parse_args()
+
+    violations = []
+    with tempfile.TemporaryDirectory() as tmp:
+        check_partial(tmp, violations)
+        check_shared_clean_plate(tmp, violations)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
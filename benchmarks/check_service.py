@@ -0,0 +1,240 @@
+"""
+End-to-end check of the translation service with the stub OCR and the stub
+translation backend.
+
+Builds synthetic chapters (directories and a .cbz), queues them through the
+HTTP API, the inbox directory and JobQueue.submit with different priorities
+and targets, runs the service until the queue drains and checks that:
+
+  - every page is written and is pixel-identical to a one-off run_chapter,
+    which in turn matches a page rendered with the stub translations;
+  - a strip taller than TILE_HEIGHT is processed in tiles on the service thread;
+  - the high-priority job finishes before the jobs queued ahead of it;
+  - OCR batches contain pages of several jobs;
+  - /status and /jobs/<id> report throughput and page results, and malformed
+    requests get 400;
+  - pages interrupted by a shutdown are re-queued on restart.
+
+    python benchmarks/check_service.py [--pages 6]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Окружение задается до импорта пакета: модули читают его при импорте.
+# Кэши и результаты - во временной директории, а не в saved/
+TMP_DIR = tempfile.mkdtemp()
+TARGET_LANG = 'ru'
+TILE_HEIGHT = 2000
+os.environ.update({
+    'TRANSLATION_BACKEND': 'stub',
+    'DEFAULT_TARGET_LANG': TARGET_LANG,
+    'TRANSLATION_CACHE_PATH': os.path.join(TMP_DIR, 'translation_cache.sqlite3'),
+    'OCR_CACHE_PATH': os.path.join(TMP_DIR, 'ocr_cache.sqlite3'),
+    'SERVICE_OUTPUT_DIR': os.path.join(TMP_DIR, 'service_output'),
+    'TILE_HEIGHT': str(TILE_HEIGHT),
+})
+
+import cv2
+import numpy as np
+
+from manga_translator.runner import run_chapter
+from manga_translator.service import InboxWatcher, JobQueue, TranslationService, start_api
+from manga_translator.cache import normalize_text
+from manga_translator.translator import TranslatorEngine
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+
+def write_chapter(directory, pages, seed):
+    os.makedirs(directory, exist_ok=True)
+    for i in range(pages):
+        cv2.imwrite(os.path.join(directory, f"{i + 1}.png"), generate_page(seed=seed * 100 + i)[0])
+    return directory
+
+
+def request(url, data=None, method=None, raw=None):
+    body = raw if raw is not None else json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(url, body, {'Content-Type': 'application/json'}, method=method)
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def http_status(url, raw=None):
+    """HTTP-статус ответа на запрос (POST с телом raw или GET)"""
+    try:
+        request(url, raw=raw)
+    except urllib.error.HTTPError as e:
+        return e.code
+    return 200
+
+
+def render_expected(image_path):
+    """Страница, нарисованная напрямую с переводами заглушки ("[язык] текст")"""
+    page = TranslatorEngine(ocr=StubOCR(), model=None).page(image_path)
+    text_blocks = page.process_bubbles()
+    translations = {block['text']: f"[{TARGET_LANG}] {normalize_text(block['text'])}" for block in text_blocks}
+    page.apply_translations(text_blocks, translations, auto_mode=True)
+    return page.output_image, len(text_blocks)
+
+
+def list_pngs(directory):
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))]
+
+
+def same_image(a, b):
+    first, second = cv2.imread(a), cv2.imread(b)
+    return first is not None and second is not None and np.array_equal(first, second)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation service end-to-end check')
+    parser.add_argument('--pages', type=int, default=6)
+    args = parser.parse_args()
+
+    violations = []
+    tmp = TMP_DIR
+    try:
+        chapters = {name: write_chapter(os.path.join(tmp, 'chapters', name), args.pages, seed)
+                    for seed, name in enumerate(['first', 'second', 'urgent', 'multi'])}
+        archive_path = os.path.join(tmp, 'inbox', 'packed.cbz')
+        os.makedirs(os.path.dirname(archive_path))
+        with zipfile.ZipFile(archive_path + '.part', 'w') as archive:
+            for name in sorted(os.listdir(chapters['first'])):
+                archive.write(os.path.join(chapters['first'], name), name)
+        os.replace(archive_path + '.part', archive_path)
+        # Лента выше TILE_HEIGHT обрабатывается полосами
+        chapters['strip'] = os.path.join(tmp, 'chapters', 'strip')
+        os.makedirs(chapters['strip'])
+        cv2.imwrite(os.path.join(chapters['strip'], '1.png'),
+                    generate_page(800, TILE_HEIGHT + 1000, bubbles=20, seed=7)[0])
+
+        # Эталон: те же главы отдельными запусками run_chapter
+        reference = {}
+        engine = TranslatorEngine(ocr=StubOCR(), model=None)
+        for name in ['first', 'second', 'urgent', 'strip']:
+            output_dir = os.path.join(tmp, 'reference', name)
+            os.makedirs(output_dir)
+            results = run_chapter(list_pngs(chapters[name]), output_dir, True, engine=engine)
+            reference[name] = [result['output_path'] for result in results]
+            if not all(result['success'] for result in results):
+                violations.append(f"reference run of {name} failed")
+        if engine.translation_failures:
+            violations.append(f"reference run left {engine.translation_failures} texts untranslated")
+
+        # Эталон сам проверяется: на нем нарисованы переводы заглушки
+        for name in ['first', 'second', 'urgent']:
+            expected, blocks = render_expected(list_pngs(chapters[name])[0])
+            if not blocks or not np.array_equal(expected, cv2.imread(reference[name][0])):
+                violations.append(f"reference page of {name} does not show the stub translations")
+
+        queue = JobQueue(os.path.join(tmp, 'jobs.sqlite3'))
+        ocr = StubOCR()
+        service = TranslationService(queue, TranslatorEngine(ocr=ocr, model=None), batch_pages=4,
+                                     poll_interval=0.05,
+                                     inbox=InboxWatcher(os.path.join(tmp, 'inbox'), queue, priority=0))
+        api = start_api(service, port=0)
+        base = f"http://127.0.0.1:{api.server_address[1]}"
+
+        jobs = {
+            'first': queue.submit(chapters['first'], os.path.join(tmp, 'out', 'first')),
+            'second': request(f"{base}/jobs", {'input': chapters['second'],
+                                               'output': os.path.join(tmp, 'out', 'second')})['id'],
+            'urgent': request(f"{base}/jobs", {'input': chapters['urgent'], 'priority': 10,
+                                               'output': os.path.join(tmp, 'out', 'urgent')})['id'],
+            'multi': queue.submit(chapters['multi'], os.path.join(tmp, 'out', 'multi'), targets=['en', 'ru']),
+            'strip': queue.submit(chapters['strip'], os.path.join(tmp, 'out', 'strip')),
+        }
+        for raw in [b'[1, 2]', b'{"input": 5}', b'{"input": "x", "targets": "en"}', b'not json']:
+            if http_status(f"{base}/jobs", raw) != 400:
+                violations.append(f"POST /jobs {raw!r} did not return 400")
+        if http_status(f"{base}/jobs?limit=abc") != 400:
+            violations.append("GET /jobs?limit=abc did not return 400")
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=service.run)
+        thread.start()
+        while time.perf_counter() - start < 120:
+            counts = queue.counts()
+            if not counts['queued_pages'] and not counts['jobs']['running'] and counts['jobs']['done'] >= 6:
+                break
+            time.sleep(0.1)
+        status = request(f"{base}/status")
+        urgent = request(f"{base}/jobs/{jobs['urgent']}")
+        service.stop()
+        thread.join()
+        api.shutdown()
+        elapsed = time.perf_counter() - start
+
+        print(f"{status['pages_done']} pages in {elapsed:.1f}s, {status['batches']} batches, "
+              f"{status['jobs_per_batch']:.2f} jobs per batch, {status['pages_per_minute']:.0f} pages/min")
+
+        all_jobs = {job['id']: job for job in queue.jobs()}
+        inbox_jobs = [job for job in all_jobs.values() if job['source'] == 'inbox']
+        if len(inbox_jobs) != 1:
+            violations.append(f"expected one job from the inbox, got {len(inbox_jobs)}")
+        for job in all_jobs.values():
+            if job['status'] != 'done' or job['pages_done'] != job['pages_total']:
+                violations.append(f"job {job['id']} ({job['input_path']}): {job['status']}, "
+                                  f"{job['pages_done']}/{job['pages_total']} pages")
+
+        for name in ['first', 'second', 'urgent', 'strip']:
+            for page, expected in zip(queue.job(jobs[name], pages=True)['pages'], reference[name]):
+                if not page['outputs'] or not same_image(page['outputs'][''], expected):
+                    violations.append(f"{name} page {page['page_index']} differs from run_chapter")
+        for page in queue.job(jobs['multi'], pages=True)['pages']:
+            if sorted((page['outputs'] or {}).keys()) != ['en', 'ru']:
+                violations.append(f"multi page {page['page_index']} outputs: {page['outputs']}")
+        if inbox_jobs:
+            for page in queue.job(inbox_jobs[0]['id'], pages=True)['pages']:
+                expected = reference['first'][page['page_index'] - 1]
+                if not page['outputs'] or not same_image(page['outputs'][''], expected):
+                    violations.append(f"inbox page {page['page_index']} differs from run_chapter")
+
+        if all_jobs[jobs['urgent']]['finished'] > all_jobs[jobs['second']]['finished']:
+            violations.append("high-priority job finished after a job queued before it")
+        if urgent['status'] != 'done' or [page['status'] for page in urgent['pages']] != ['done'] * args.pages:
+            violations.append(f"/jobs/{jobs['urgent']} reports {urgent['status']}")
+        if status['jobs_per_batch'] <= 1:
+            violations.append("no OCR batch mixed pages of several jobs")
+        if status['translation_failures']:
+            violations.append(f"/status reports {status['translation_failures']} untranslated texts")
+        if status['pages_done'] != 5 * args.pages + 1:
+            violations.append(f"/status reports {status['pages_done']} pages")
+
+        # Перезапуск: страницы, прерванные остановкой, снова в очереди
+        restart_job = queue.submit(chapters['second'], os.path.join(tmp, 'out', 'restart'))
+        taken = queue.next_pages(2)
+        queue.close()
+        queue = JobQueue(os.path.join(tmp, 'jobs.sqlite3'))
+        if queue.recover() != len(taken) or queue.counts()['queued_pages'] != args.pages:
+            violations.append("interrupted pages were not re-queued")
+        if not queue.cancel(restart_job) or queue.counts()['queued_pages']:
+            violations.append("cancelled job still has queued pages")
+        queue.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
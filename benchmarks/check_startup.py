@@ -0,0 +1,93 @@
+"""
+Startup-time regression check for the package and the CLI.
+
+Each measurement runs in a fresh interpreter: importing the package, importing
+main.py, running `main.py --help` and exiting on a bad argument. The check
+fails if a run takes longer than the budget or if any heavy dependency
+(OCR, detection, translation, HTML parsing) was imported along the way.
+
+    python benchmarks/check_startup.py [--budget 1.0] [--repeat 5]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули, которые не должны загружаться до стадии, где они нужны
+HEAVY_MODULES = ['paddleocr', 'paddle', 'inference', 'supervision', 'deep_translator', 'bs4',
+                 'requests', 'cv2', 'torch']
+
+# Печатает загруженные тяжелые модули после выполнения кода проверки
+PROBE = """
+import sys
+{code}
+heavy = {heavy!r}
+print('@@' + __import__('json').dumps(sorted(m for m in heavy if m in sys.modules)))
+"""
+
+CHECKS = [
+    ('import manga_translator', 'import manga_translator'),
+    ('import main', "sys.argv = ['main.py']; import main"),
+    ('main.py --help', "sys.argv = ['main.py', '--help']\n"
+                       "try:\n    import runpy; runpy.run_path('main.py', run_name='__main__')\n"
+                       "except SystemExit:\n    pass"),
+    ('main.py bad argument', "sys.argv = ['main.py', '--mode', 'nowhere']\n"
+                             "try:\n    import runpy; runpy.run_path('main.py', run_name='__main__')\n"
+                             "except SystemExit:\n    pass"),
+]
+
+
+def run_probe(code):
+    """Запускает код в новом интерпретаторе, возвращает время и загруженные тяжелые модули"""
+    source = PROBE.format(code=code, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, '-c', source], cwd=ROOT, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    marker = [line for line in completed.stdout.splitlines() if line.startswith('@@')]
+    if not marker:
+        raise RuntimeError(f"probe failed:\n{completed.stderr.strip()}")
+    return elapsed, json.loads(marker[-1][2:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup-time regression check')
+    parser.add_argument('--budget', type=float, default=1.0, help='Maximum median seconds per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    baseline = statistics.median(run_probe('pass')[0] for _ in range(args.repeat))
+    print(f"{'interpreter':>22}: {baseline * 1000:7.1f}ms")
+
+    failures = 0
+    for name, code in CHECKS:
+        try:
+            runs = [run_probe(code) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{name:>22}: {e}")
+            failures += 1
+            continue
+
+        elapsed = statistics.median(t for t, _ in runs)
+        heavy = runs[-1][1]
+        problems = []
+        if elapsed > args.budget:
+            problems.append(f"over budget {args.budget:.2f}s")
+        if heavy:
+            problems.append(f"imported {', '.join(heavy)}")
+        failures += bool(problems)
+        print(f"{name:>22}: {elapsed * 1000:7.1f}ms (+{(elapsed - baseline) * 1000:6.1f}ms)  "
+              f"{'; '.join(problems) or 'ok'}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Check of the overlapping-candidate suppression before OCR.
+
+On the sample pages (images/original), runs suppress_overlapping on the
+detected candidates and checks that:
+
+  - known speech bubbles whose boxes lie inside the box of a white fleck or
+    of a large artwork contour are kept with their own box;
+  - every dropped wrapper really contains, by contour, a much smaller
+    candidate, and every merged candidate has a contour of similar area.
+
+On hand-made contours it also checks the three cases: a wrapper around a
+bubble is dropped, two pieces of one bubble are merged, and an irregular
+contour whose box covers a bubble leaves the bubble alone.
+
+    python benchmarks/check_suppression.py [--pages-dir images/original]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from manga_translator.spatial import SIMILAR_AREA, SUPPRESS_OVERLAP, contained_fraction, suppress_overlapping
+from manga_translator.translator import MangaTranslator
+
+from bench_engine import DEFAULT_PAGES_DIR, list_pages
+from check_contours import table_select
+
+# Пузыри страниц images/original, которые раньше отбрасывались или склеивались
+KNOWN_BUBBLES = {
+    '10.png': [(780, 302, 136, 136), (996, 670, 143, 121), (131, 704, 155, 133)],
+    '11.png': [(30, 10, 140, 173)],
+    '12.png': [(11, 676, 203, 281)],
+}
+
+
+def ellipse(cx, cy, ax, ay):
+    return cv2.ellipse2Poly((cx, cy), (ax, ay), 0, 0, 360, 5).reshape(-1, 1, 2).astype(np.int32)
+
+
+def run(contours):
+    """suppress_overlapping по контурам в порядке убывания площади"""
+    contours = sorted(contours, key=cv2.contourArea, reverse=True)
+    bboxes = [list(cv2.boundingRect(contour)) for contour in contours]
+    areas = [cv2.contourArea(contour) for contour in contours]
+    return suppress_overlapping(bboxes, contours, areas)
+
+
+def check_cases(violations):
+    bubble = ellipse(200, 200, 60, 40)
+    kept, merged, wrappers = run([ellipse(200, 200, 150, 120), bubble])
+    if wrappers != 1 or len(kept) != 1:
+        violations.append(f"wrapper around a bubble: kept {kept}, {wrappers} wrappers")
+
+    kept, merged, wrappers = run([bubble, ellipse(200, 200, 57, 38)])
+    if wrappers or list(merged.values()) != [((140, 160, 121, 81), [1])]:
+        violations.append(f"two pieces of one bubble: merged {merged}, {wrappers} wrappers")
+
+    # Рисунок в форме буквы L: рамка накрывает пузырь, контур - нет
+    artwork = np.array([[[0, 0]], [[400, 0]], [[400, 60]], [[60, 60]], [[60, 400]], [[0, 400]]], dtype=np.int32)
+    kept, merged, wrappers = run([artwork, bubble])
+    if wrappers or merged or len(kept) != 2:
+        violations.append(f"bubble inside the box of an artwork contour: merged {merged}, {wrappers} wrappers")
+
+
+def check_page(image_path, violations):
+    name = os.path.basename(image_path)
+    table = table_select(MangaTranslator(image_path))
+    bboxes = table.bbox.tolist()
+    kept, merged, wrappers = suppress_overlapping(bboxes, table.contours, table.area)
+    boxes = {tuple(merged[i][0]) if i in merged else tuple(bboxes[i]) for i in kept}
+    print(f"{name:>20}: {len(bboxes):4d} candidates, {len(bboxes) - len(kept)} suppressed "
+          f"({wrappers} wrappers, {sum(len(members) for _, members in merged.values())} merged)")
+
+    for bbox in KNOWN_BUBBLES.get(name, []):
+        if bbox not in boxes:
+            violations.append(f"{name}: bubble {list(bbox)} was dropped or merged")
+    for i, (_, members) in merged.items():
+        for j in members:
+            if table.area[j] < SIMILAR_AREA * table.area[i]:
+                violations.append(f"{name}: {bboxes[j]} merged into a much larger contour {bboxes[i]}")
+    for i in set(range(len(bboxes))) - set(kept) - {j for _, members in merged.values() for j in members}:
+        if not any(contained_fraction(table.contours[j], table.contours[i]) >= SUPPRESS_OVERLAP
+                   and table.area[j] < SIMILAR_AREA * table.area[i] for j in range(len(bboxes)) if j != i):
+            violations.append(f"{name}: wrapper {bboxes[i]} does not contain a smaller candidate")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Candidate suppression check')
+    parser.add_argument('--pages-dir', default=DEFAULT_PAGES_DIR)
+    parser.add_argument('--pages', type=int, default=100)
+    args = parser.parse_args()
+
+    violations = []
+    check_cases(violations)
+    for image_path in list_pages(args.pages_dir, args.pages):
+        check_page(image_path, violations)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
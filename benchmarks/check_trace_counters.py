@@ -0,0 +1,103 @@
+"""
+Check of the tracer's OCR counters in batched and per-bubble OCR modes.
+
+A stub OCR gives each recognized line a confidence derived from the crop, so
+about half of the lines fall below MIN_LINE_CONFIDENCE. For a synthetic page
+each mode must report ocr_lines and ocr_low_confidence_lines
+matching the lines the stub actually returned, and write the counters
+into the page event and the JSONL trace.
+
+    python benchmarks/check_trace_counters.py [--pages 3]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Кэш OCR вернул бы строки без вызова модели и исказил бы счет
+os.environ['OCR_CACHE_PATH'] = ''
+
+import cv2
+import numpy as np
+
+from manga_translator.instrumentation import Tracer, set_tracer
+from manga_translator.ocr import MIN_LINE_CONFIDENCE
+from manga_translator.translator import TranslatorEngine
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+
+class MixedConfidenceOCR(StubOCR):
+    """Заглушка OCR с уверенностью строки от 0 до 1 и счетом выданных строк"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = 0
+        self.low = 0
+
+    def _recognize(self, image):
+        digest = hashlib.md5(np.ascontiguousarray(image).tobytes()).hexdigest()
+        confidence = int(digest[8:10], 16) / 255
+        self.lines += 1
+        self.low += confidence <= MIN_LINE_CONFIDENCE
+        return (f"text {digest[:8]}", confidence)
+
+
+def run(image_path, batched, trace_path):
+    tracer = set_tracer(Tracer())
+    ocr = MixedConfidenceOCR()
+    engine = TranslatorEngine(ocr=ocr, model=None)
+    with tracer.page(image_path):
+        engine.page(image_path).process_bubbles(batched=batched)
+    tracer.write(trace_path)
+    with open(trace_path, encoding='utf-8') as file:
+        events = [json.loads(line) for line in file]
+    page_counters = next(event['args']['counters'] for event in events if event['name'] == 'page')
+    trace_counters = events[-1]['args']
+    return ocr, dict(tracer.counters), page_counters, trace_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tracer OCR counter check')
+    parser.add_argument('--pages', type=int, default=3)
+    args = parser.parse_args()
+
+    violations = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in range(args.pages):
+            image_path = os.path.join(tmp, f"{seed}.png")
+            cv2.imwrite(image_path, generate_page(seed=seed)[0])
+            for batched in (True, False):
+                mode = 'batched' if batched else 'per-bubble'
+                ocr, counters, page_counters, trace_counters = run(
+                    image_path, batched, os.path.join(tmp, f"{seed}_{mode}.jsonl"))
+                print(f"page {seed} {mode}: {ocr.lines} lines, {ocr.low} low confidence, "
+                      f"counters ocr_lines={counters.get('ocr_lines')} "
+                      f"ocr_low_confidence_lines={counters.get('ocr_low_confidence_lines')}")
+                expected = {'ocr_lines': ocr.lines, 'ocr_low_confidence_lines': ocr.low}
+                for source, values in (('tracer', counters), ('page event', page_counters),
+                                       ('trace file', trace_counters)):
+                    for name, value in expected.items():
+                        if values.get(name, 0) != value:
+                            violations.append(f"page {seed} {mode} {source}: {name}={values.get(name, 0)}, "
+                                              f"expected {value}")
+                if not ocr.low:
+                    violations.append(f"page {seed} {mode}: the stub produced no low-confidence lines")
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Check of the translation client against the local stand-in server.
+
+Starts benchmarks/translation_server.py in-process and translates a set of
+unique strings through the libretranslate backend twice:
+
+  1. with throttling (429 + Retry-After) and random 503 errors - every string
+     must come back translated, and in-flight requests must never exceed the
+     client's concurrency limit;
+  2. against a server that always fails - every string must be reported in
+     `failures`, keep its original text and stay out of the translation cache.
+
+It also checks that network errors are retried while errors in the backend
+code (KeyError and the like) are raised at once without retries.
+
+    python benchmarks/check_translation_client.py [--texts 400] [--concurrency 4] [--rate 20]
+
+Exits with status 1 on any violation.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from manga_translator.backends import LibreTranslateBackend, TranslationBackend
+from manga_translator.cache import TranslationCache
+from manga_translator.client import TranslationClient
+from manga_translator.translator import translate_batch
+
+from translation_server import fake_translation, start_server
+
+
+def run(server, texts, args, cache):
+    backend = LibreTranslateBackend(server.url, timeout=10)
+    backend.max_batch_items = args.batch_items
+    client = backend._client = TranslationClient(backend, max_concurrency=args.concurrency, rate=args.client_rate,
+                                                 burst=args.concurrency, retries=args.retries, backoff=0.05,
+                                                 max_backoff=1.0)
+    failures = {}
+    start = time.perf_counter()
+    translations = translate_batch(texts, 'ru', source_lang='en', backend=backend, cache=cache, failures=failures)
+    elapsed = time.perf_counter() - start
+    print(f"  {len(texts)} texts in {elapsed:.2f}s, client {client.stats()}, "
+          f"server requests={server.requests} throttled={server.throttled} failed={server.failed} "
+          f"max in flight={server.max_in_flight} connections={len(server.connections)}")
+    return translations, failures
+
+
+class RaisingBackend(TranslationBackend):
+    """Бэкенд, который бросает заданное исключение"""
+    name = 'raising'
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        self.calls += 1
+        raise self.error
+
+
+def check_errors(violations):
+    backend = RaisingBackend(ConnectionResetError('connection reset'))
+    client = TranslationClient(backend, retries=2, backoff=0)
+    translated, error = client.translate_batches([['text']], 'en', 'ru')[0]
+    if translated is not None or backend.calls != 3:
+        violations.append(f"network error: {backend.calls} attempts, result {translated}")
+
+    for error in (KeyError('text'), TypeError('bad argument')):
+        backend = RaisingBackend(error)
+        client = TranslationClient(backend, retries=2, backoff=0)
+        try:
+            client.translate_batches([['text']], 'en', 'ru')
+        except type(error):
+            pass
+        else:
+            violations.append(f"{type(error).__name__} was not raised")
+        if backend.calls != 1:
+            violations.append(f"{type(error).__name__} was retried: {backend.calls} attempts")
+    print("  network error retried, errors in the backend code raised")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation client check against a local server')
+    parser.add_argument('--texts', type=int, default=400)
+    parser.add_argument('--batch-items', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=20, help='Server limit, requests per second')
+    parser.add_argument('--client-rate', type=float, default=0, help='Client token bucket rate (0 - off)')
+    parser.add_argument('--fail-rate', type=float, default=0.2)
+    parser.add_argument('--retries', type=int, default=8)
+    args = parser.parse_args()
+
+    texts = [f"line {i} of the check" for i in range(args.texts)]
+    violations = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TranslationCache(os.path.join(tmp, 'cache.sqlite3'))
+
+        print("Throttled and flaky server:")
+        server = start_server(rate=args.rate, fail_rate=args.fail_rate, latency=0.01)
+        translations, failures = run(server, texts, args, cache)
+        server.shutdown()
+        if failures:
+            violations.append(f"{len(failures)} texts failed: {next(iter(failures.values()))}")
+        wrong = sum(result != fake_translation(text, 'ru') for text, result in zip(texts, translations))
+        if wrong:
+            violations.append(f"{wrong} texts were not translated")
+        if server.max_in_flight > args.concurrency:
+            violations.append(f"{server.max_in_flight} requests in flight, limit {args.concurrency}")
+        if not server.throttled and args.rate:
+            print("  note: the server never throttled, raise --texts or lower --rate")
+
+        print("Server that always fails:")
+        failing = [f"failing {text}" for text in texts[:20]]
+        server = start_server(fail_rate=1.0)
+        args.retries = 2
+        translations, failures = run(server, failing, args, cache)
+        server.shutdown()
+        if set(failures) != set(failing):
+            violations.append(f"{len(failures)} of {len(failing)} failed texts were reported")
+        if translations != failing:
+            violations.append("failed texts did not keep their original text")
+        cached = sum(cache.get(text, 'en', 'ru', 'libretranslate') is not None for text in failing)
+        if cached:
+            violations.append(f"{cached} failed texts were cached")
+
+    print("Backend errors:")
+    check_errors(violations)
+
+    if violations:
+        print("FAILED:")
+        for violation in violations:
+            print(f"  {violation}")
+    else:
+        print("OK")
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
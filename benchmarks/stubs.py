@@ -0,0 +1,44 @@
+"""Deterministic stand-ins for the OCR model used by the benchmarks."""
+import hashlib
+
+import numpy as np
+
+
+class StubOCR:
+    """
+    Заглушка PaddleOCR с тем же интерфейсом ocr().
+
+    Детекция возвращает одну строку по рамке темных пикселей, распознавание -
+    текст, зависящий только от содержимого кропа.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.images = 0
+
+    def _detect(self, image):
+        gray = image if image.ndim == 2 else image.mean(axis=2)
+        ys, xs = np.nonzero(gray < 128)
+        if len(xs) == 0:
+            return None
+        x1, y1, x2, y2 = int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1
+        return [[[x1, y1], [x2, y1], [x2, y2], [x1, y2]]]
+
+    def _recognize(self, image):
+        digest = hashlib.md5(np.ascontiguousarray(image).tobytes()).hexdigest()
+        return (f"text {digest[:8]}", 0.9)
+
+    def ocr(self, img, det=True, rec=True, cls=True):
+        self.calls += 1
+        if not rec:
+            self.images += 1
+            return [self._detect(img)]
+        if not det:
+            self.images += len(img)
+            return [[self._recognize(crop) for crop in img]]
+
+        self.images += 1
+        boxes = self._detect(img)
+        if not boxes:
+            return [None]
+        return [[[box, self._recognize(img)] for box in boxes]]
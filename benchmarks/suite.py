@@ -0,0 +1,152 @@
+"""
+Stage-level benchmark suite on synthetic pages with stub OCR and translation.
+
+Times detection, preprocessing, OCR, translation, erase, layout/render,
+encode and the whole page separately at several page sizes, and writes
+the results as JSON that can be compared between runs.
+
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --output new.json --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Бенчмарк не должен читать или наполнять настоящие кэши переводов и OCR
+os.environ['TRANSLATION_CACHE_PATH'] = ''
+os.environ['OCR_CACHE_PATH'] = ''
+
+import cv2
+import numpy as np
+
+from manga_translator.backends import StubBackend
+from manga_translator.translator import TranslatorEngine, translate_batch
+
+from stubs import StubOCR
+from synthetic import generate_page
+
+# (имя, ширина, высота, число пузырей)
+PAGE_SIZES = [
+    ('small', 800, 1200, 8),
+    ('medium', 1600, 2400, 24),
+    ('strip', 800, 8000, 40),
+]
+
+
+def measure(func, repeat):
+    """Медиана и минимум времени выполнения в миллисекундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': statistics.median(timings), 'min_ms': min(timings)}
+
+
+def bench_page(engine, image, repeat):
+    """Время каждой стадии и всей страницы"""
+    backend = StubBackend()
+    page = engine.page('synthetic', image=image)
+    candidates = page.collect_bubble_regions()
+    crops = [image[c['y']:c['y'] + c['h'], c['x']:c['x'] + c['w']] for c in candidates]
+    regions = [c['region'] for c in candidates]
+    blocks = page.build_text_blocks(candidates, engine.recognize_regions(regions))
+    texts = [block['text'] for block in blocks]
+    items = [(f"translated {block['text']}", block['x'], block['y'], block['w'], block['h']) for block in blocks]
+
+    def erase():
+        page.output_image = image.copy()
+        for block in blocks:
+            page.remove_text_from_bubble(block['contour'])
+
+    def render():
+        page.output_image = image.copy()
+        page.render_text_blocks(items)
+
+    def end_to_end():
+        full_page = engine.page('synthetic', image=image)
+        with contextlib.redirect_stdout(io.StringIO()):
+            page_blocks = full_page.process_bubbles()
+            full_page.translate_and_replace_text(page_blocks, auto_mode=True)
+        cv2.imencode('.png', full_page.output_image)
+
+    stages = {
+        'detect': measure(page.detect_bubble_table, repeat),
+        'preprocess': measure(lambda: [page.preprocess_text_region(crop) for crop in crops], repeat),
+        'ocr': measure(lambda: engine.recognize_regions(regions), repeat),
+        'translate': measure(lambda: translate_batch(texts, 'ru', backend=backend), repeat),
+        'erase': measure(erase, repeat),
+        'render': measure(render, repeat),
+        'encode': measure(lambda: cv2.imencode('.png', page.output_image), repeat),
+        'end_to_end': measure(end_to_end, repeat),
+    }
+    return {'bubbles': len(candidates), 'text_blocks': len(blocks), 'stages': stages}
+
+
+def compare(results, baseline):
+    """Печатает отношение времени к прошлому прогону"""
+    print(f"\n{'page':>8} {'stage':>12} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for name, current in results['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for stage, timing in current['stages'].items():
+            old = previous['stages'].get(stage)
+            if not old:
+                continue
+            ratio = timing['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+            print(f"{name:>8} {stage:>12} {old['median_ms']:9.2f}ms {timing['median_ms']:9.2f}ms {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage-level benchmark suite')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write JSON results')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', default=','.join(name for name, *_ in PAGE_SIZES),
+                        help='Comma-separated page sizes to run')
+    args = parser.parse_args()
+
+    engine = TranslatorEngine(ocr=StubOCR())
+    selected = set(args.sizes.split(','))
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'repeat': args.repeat,
+        },
+        'results': {}
+    }
+
+    for name, width, height, bubbles in PAGE_SIZES:
+        if name not in selected:
+            continue
+        image, _ = generate_page(width, height, bubbles, seed=len(name))
+        result = bench_page(engine, image, args.repeat)
+        result.update({'width': width, 'height': height})
+        results['results'][name] = result
+
+        print(f"{name} {width}x{height}: {result['bubbles']} bubbles, {result['text_blocks']} text blocks")
+        for stage, timing in result['stages'].items():
+            print(f"  {stage:>12}: {timing['median_ms']:9.2f}ms (min {timing['min_ms']:.2f}ms)")
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Synthetic manga pages with a controlled number and size of bubbles."""
+import os
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import cv2
+
+FONT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fonts', 'animeacev05.ttf')
+WORDS = ['HEY', 'WAIT', 'WHAT', 'IS', 'THIS', 'POWER', 'NO', 'WAY', 'RUN', 'CAPTAIN', 'SHIP', 'THE',
+         'SEA', 'KING', 'PIRATE', 'FRIEND', 'NEVER', 'GIVE', 'UP', 'COME', 'BACK', 'HERE']
+
+
+def random_text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate_page(width=800, height=1200, bubbles=12, bubble_size=(120, 200), words=(2, 8), seed=0):
+    """
+    Рисует страницу: серый фон со штриховкой и белые пузыри с текстом
+
+    Returns:
+        (изображение BGR, список {'bbox': (x, y, w, h), 'text': str})
+    """
+    rng = random.Random(seed)
+    page = Image.new('RGB', (width, height), (150, 150, 150))
+    draw = ImageDraw.Draw(page)
+
+    # Штриховка, чтобы фон не был сплошным
+    for x in range(-height, width, 12):
+        draw.line([(x, 0), (x + height, height)], fill=(90, 90, 90), width=2)
+
+    try:
+        font = ImageFont.truetype(FONT, 14)
+    except OSError:
+        font = ImageFont.load_default()
+
+    placed = []
+    for _ in range(bubbles * 20):
+        if len(placed) >= bubbles:
+            break
+        w = rng.randint(*bubble_size)
+        h = int(w * rng.uniform(0.6, 1.0))
+        x = rng.randint(5, max(5, width - w - 5))
+        y = rng.randint(5, max(5, height - h - 5))
+        # Пузыри не пересекаются
+        if any(x < px + pw + 10 and px < x + w + 10 and y < py + ph + 10 and py < y + h + 10
+               for px, py, pw, ph in (b['bbox'] for b in placed)):
+            continue
+
+        text = random_text(rng, rng.randint(*words))
+        draw.ellipse([x, y, x + w, y + h], fill='white', outline='black', width=3)
+
+        # Текст по строкам в центральной части пузыря
+        lines, line = [], ''
+        for word in text.split():
+            test = f"{line} {word}".strip()
+            if draw.textlength(test, font=font) <= w * 0.6:
+                line = test
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+        line_height = 16
+        ty = y + (h - line_height * len(lines)) // 2
+        for text_line in lines:
+            tx = x + (w - draw.textlength(text_line, font=font)) // 2
+            draw.text((tx, ty), text_line, fill='black', font=font)
+            ty += line_height
+
+        placed.append({'bbox': (x, y, w, h), 'text': text})
+
+    return cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR), placed
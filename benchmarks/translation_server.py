@@ -0,0 +1,117 @@
+"""
+Local stand-in for a LibreTranslate-style translation server.
+
+Answers POST /translate with {"translatedText": [...]} where every string is
+reversed and prefixed with the target language. It can throttle (429 with
+Retry-After above --rate requests per second), fail randomly (503) and add
+latency, so the translation client can be exercised without network access.
+
+    python benchmarks/translation_server.py [--port 5000] [--rate 20] [--fail-rate 0.1] [--latency 0.05]
+"""
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import threading
+import time
+
+
+def fake_translation(text, target_lang):
+    return f"[{target_lang}] {text[::-1]}"
+
+
+class TranslationHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        data = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            now = time.monotonic()
+            # Окно последней секунды для ограничения частоты
+            server.recent = [t for t in server.recent if now - t < 1.0]
+            throttled = server.rate and len(server.recent) >= server.rate
+            if not throttled:
+                server.recent.append(now)
+        try:
+            if server.latency:
+                time.sleep(server.latency)
+            if self.path != '/translate':
+                self._reply(404, {'error': 'not found'})
+            elif throttled:
+                with server.lock:
+                    server.throttled += 1
+                self._reply(429, {'error': 'Slowdown: too many requests'}, {'Retry-After': '1'})
+            elif random.random() < server.fail_rate:
+                with server.lock:
+                    server.failed += 1
+                self._reply(503, {'error': 'Service unavailable'})
+            else:
+                texts = data.get('q', [])
+                translated = [fake_translation(text, data.get('target')) for text in
+                              (texts if isinstance(texts, list) else [texts])]
+                self._reply(200, {'translatedText': translated if isinstance(texts, list) else translated[0]})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def start_server(port=0, rate=0, fail_rate=0.0, latency=0.0):
+    """
+    Запускает сервер в фоновом потоке
+
+    Returns:
+        Сервер; адрес - server.url, счетчики - requests, throttled, failed,
+        max_in_flight, connections. Остановка - server.shutdown()
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), TranslationHandler)
+    server.daemon_threads = True
+    server.rate = rate
+    server.fail_rate = fail_rate
+    server.latency = latency
+    server.lock = threading.Lock()
+    server.recent = []
+    server.requests = server.throttled = server.failed = 0
+    server.in_flight = server.max_in_flight = 0
+    server.connections = set()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/translate"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local LibreTranslate-style test server')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=0, help='Requests per second before answering 429')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Share of requests answered with 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.rate, args.fail_rate, args.latency)
+    print(f"Serving on {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
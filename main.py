@@ -1,32 +1,45 @@
 import os
 import argparse
-import requests
-from bs4 import BeautifulSoup
-from manga_translator.translator import MangaTranslator, translate_text
+from urllib.parse import urljoin
 from dotenv import load_dotenv
+# Модули пакета читают настройки при импорте, поэтому .env загружается раньше них
+load_dotenv()
+# Здесь только легкие модули: --help и ошибки аргументов не должны ждать
+# импорта OpenCV, PaddleOCR и бэкендов перевода
+from manga_translator.downloader import ImageDownloader, DOWNLOAD_CONCURRENCY
+from manga_translator.instrumentation import Tracer, get_tracer, set_tracer
+from manga_translator.output import EXTENSIONS, OUTPUT_WORKERS, OutputFormat
+from manga_translator.pipeline import PIPELINE_QUEUE_SIZE, STAGE_WORKERS
 
-def parse_images_from_url(url, input_dir):
+def parse_images_from_url(url, input_dir, max_concurrency=DOWNLOAD_CONCURRENCY):
     """Images parsing from the URL"""
+    from bs4 import BeautifulSoup
+
     try:
-        response = requests.get(url)
+        downloader = ImageDownloader(input_dir, max_concurrency=max_concurrency)
+        response = downloader.session.get(url, timeout=downloader.timeout)
         response.raise_for_status()
         soup = BeautifulSoup(response.text, "html.parser")
         
-        downloaded_images = []
+        urls = []
+        filenames = []
         for i, pic in enumerate(soup.find_all('img'), 1):
             img_url = pic.get('src')
             if not img_url:
                 continue
-                
-            response = requests.get(img_url)
-            if response.status_code == 200:
-                image_path = os.path.join(input_dir, f"{i}.png")
-                with open(image_path, 'wb') as file:
-                    file.write(response.content)
-                downloaded_images.append(image_path)
-                print(f'Downloaded image {i}: {image_path}')
+            urls.append(urljoin(url, img_url))
+            filenames.append(f"{i}.png")
+        
+        downloaded_images = []
+        for image_path, status in downloader.download_all(urls, filenames):
+            if status == 'failed':
+                print(f'Failed to download image: {image_path}')
+                continue
+            downloaded_images.append(image_path)
+            if status == 'unchanged':
+                print(f'Image unchanged, skipped download: {image_path}')
             else:
-                print(f'Failed to download image {i}')
+                print(f'Downloaded image: {image_path}')
         
         return downloaded_images
     except Exception as e:
@@ -34,47 +47,112 @@ def parse_images_from_url(url, input_dir):
         return []
 
 def process_local_images(input_dir):
-    """Getting list of local images"""
-    supported_formats = ('.png', '.jpg', '.jpeg', '.webp')
-    images = []
-    
-    for file in sorted(os.listdir(input_dir)):
-        if file.lower().endswith(supported_formats):
-            images.append(os.path.join(input_dir, file))
-    
-    return images
+    """Getting list of local images; .cbz/.zip archives are read in place, pages in natural order"""
+    from manga_translator.archive import list_images
 
-def translate_manga(image_path, output_dir, auto_translate=False):
-    """Page translating"""
-    try:
-        translator = MangaTranslator(image_path)
-        text_blocks = translator.process_bubbles()
-        
-        # Определяем имя выходного файла
-        basename = os.path.basename(image_path)
-        output_path = os.path.join(output_dir, f"translated_{basename}")
-        
-        # Используем обновленный метод с поддержкой автоматического режима
-        translator.translate_and_replace_text(text_blocks, auto_mode=auto_translate)
-        
-        translator.save_result(output_path)
-        return True
-    except Exception as e:
-        print(f"Error processing {image_path}: {e}")
-        return False
+    return list_images(input_dir)
+
+def archive_path_for(output_archive, lang):
+    """chapter.cbz -> chapter.<lang>.cbz for per-language archives"""
+    stem, extension = os.path.splitext(output_archive)
+    return f"{stem}.{lang}{extension}"
+
+def parse_stage_workers(value):
+    """Parses 'translate=4,render=2' into a dict of stage worker counts"""
+    workers = {}
+    for item in value.split(','):
+        name, _, count = item.partition('=')
+        name = name.strip()
+        if name not in STAGE_WORKERS or not count.strip().isdigit() or int(count) < 1:
+            raise argparse.ArgumentTypeError(
+                f"expected STAGE=N with STAGE in {', '.join(STAGE_WORKERS)}, got '{item}'")
+        workers[name] = int(count)
+    return workers
+
+def parse_targets(value):
+    """Parses 'en,ru,es' into a list of unique target languages"""
+    targets = list(dict.fromkeys(lang.strip() for lang in value.split(',') if lang.strip()))
+    if not targets:
+        raise argparse.ArgumentTypeError("expected comma-separated language codes, e.g. en,ru,es")
+    return targets
 
 def main():
-    load_dotenv()
-    
     parser = argparse.ArgumentParser(description='Manga Translator')
     parser.add_argument('--mode', choices=['url', 'local'], required=True,
                       help='Source of images: url or local directory')
     parser.add_argument('--url', help='URL to parse images from (required if mode=url)')
+    parser.add_argument('--input', metavar='PATH',
+                      help='Directory or .cbz/.zip archive to translate in local mode (default: INPUT_IMAGES_DIR)')
+    parser.add_argument('--output-archive', metavar='PATH',
+                      help='Write translated pages into this .cbz as they finish instead of loose files '
+                           '(with --targets: one PATH.<lang>.cbz per language)')
     parser.add_argument('--auto', action='store_true',
                       help='Enable automatic translation without user confirmation')
+    parser.add_argument('--ocr-batch-size', type=int, default=None,
+                      help='Number of text lines recognized per OCR batch (default: OCR_BATCH_SIZE or 6)')
+    parser.add_argument('--download-concurrency', type=int, default=DOWNLOAD_CONCURRENCY,
+                      help='Number of parallel image downloads in url mode')
+    parser.add_argument('--tile-height', type=int, default=None,
+                      help='Process pages taller than this in overlapping horizontal tiles (webtoon strips)')
+    parser.add_argument('--invalidate-cache', action='store_true',
+                      help='Forget already translated pages and process every page again')
+    parser.add_argument('--trace', metavar='PATH',
+                      help='Write per-page and per-bubble stage timings and counters to PATH')
+    parser.add_argument('--trace-format', choices=['jsonl', 'chrome'], default='jsonl',
+                      help='Trace file format: JSON Lines or Chrome trace (chrome://tracing, Perfetto)')
+    parser.add_argument('--preview', action='store_true',
+                      help='Show a window with the bubble being processed (needs a display)')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Number of worker processes for pages (requires --auto when > 1)')
+    parser.add_argument('--output-format', choices=sorted(EXTENSIONS), default=None,
+                      help='Output image format (default: OUTPUT_FORMAT or the input format)')
+    parser.add_argument('--png-compression', type=int, choices=range(10), default=None, metavar='0-9',
+                      help='PNG compression level')
+    parser.add_argument('--quality', type=int, default=None,
+                      help='JPEG / lossy WebP quality (0-100)')
+    parser.add_argument('--lossless', action='store_true', default=None,
+                      help='Write lossless WebP')
+    parser.add_argument('--max-width', type=int, default=None,
+                      help='Downscale output pages wider than this')
+    parser.add_argument('--output-workers', type=int, default=OUTPUT_WORKERS,
+                      help='Background threads encoding and writing output pages')
+    parser.add_argument('--pipeline', action='store_true',
+                      help='Overlap stages of different pages (load, detect, translate, render, encode); requires --auto')
+    parser.add_argument('--stage-workers', type=parse_stage_workers, default=None,
+                      help='Threads per pipeline stage, e.g. translate=4,render=2 '
+                           f"(default: {','.join(f'{k}={v}' for k, v in STAGE_WORKERS.items())})")
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE,
+                      help='Pages waiting between two pipeline stages')
+    parser.add_argument('--targets', type=parse_targets, default=None,
+                      help='Translate into several languages, e.g. en,ru,es: each page is detected, recognized '
+                           'and erased once, results go to one output subdirectory per language; requires --auto')
+    parser.add_argument('--save-project', action='store_true',
+                      help='Save page projects (blocks and clean plate) to the "projects" output subdirectory '
+                           'for re-rendering with python -m manga_translator.project')
     
     args = parser.parse_args()
 
+    if args.workers > 1 and not args.auto:
+        parser.error('--workers > 1 requires --auto: worker processes cannot ask for input')
+    if args.workers > 1 and args.preview:
+        parser.error('--preview is only available with a single worker')
+    if args.pipeline and (not args.auto or args.preview or args.workers > 1):
+        parser.error('--pipeline requires --auto and cannot be combined with --preview or --workers')
+    if args.targets and (not args.auto or args.preview):
+        parser.error('--targets requires --auto and cannot be combined with --preview')
+    if args.output_archive and (args.workers > 1 or args.save_project):
+        parser.error('--output-archive is written by one process and cannot be combined with --workers '
+                     'or --save-project')
+    if args.output_archive and not args.output_archive.lower().endswith(('.cbz', '.zip')):
+        parser.error('--output-archive must end with .cbz or .zip')
+
+    from manga_translator.archive import ArchiveWriter
+    from manga_translator.page_cache import PageCache, pipeline_config
+    from manga_translator.runner import run_chapter, print_summary
+
+    # Трассировка выключена, пока не задан --trace
+    tracer = set_tracer(Tracer()) if args.trace else None
+
     # Получаем пути из переменных окружения
     input_dir = os.getenv('IMAGES_DIR') + os.getenv('INPUT_IMAGES_DIR')
     output_dir = os.getenv('IMAGES_DIR') + os.getenv('OUTPUT_IMAGE_PATH')
@@ -88,23 +166,79 @@ def main():
         if not args.url:
             print("Error: URL is required when mode is 'url'")
             return
-        images = parse_images_from_url(args.url, input_dir)
+        with get_tracer().span('download'):
+            images = parse_images_from_url(args.url, input_dir, args.download_concurrency)
     else:
-        images = process_local_images(input_dir)
+        images = process_local_images(args.input or input_dir)
 
     if not images:
         print("No images found to process!")
         return
 
+    output_format = OutputFormat(args.output_format, png_compression=args.png_compression,
+                                 jpeg_quality=args.quality, webp_quality=args.quality,
+                                 webp_lossless=args.lossless, max_width=args.max_width)
+
+    # Пропускаем страницы, которые уже переведены с теми же настройками.
+    # У каждого языка своя директория результатов и свой манифест
+    if args.targets:
+        page_caches = {}
+        for lang in args.targets:
+            os.makedirs(os.path.join(output_dir, lang), exist_ok=True)
+            page_caches[lang] = PageCache(os.path.join(output_dir, lang),
+                                          pipeline_config(lang, output_format=output_format))
+    else:
+        page_caches = {None: PageCache(output_dir, pipeline_config(output_format=output_format))}
+    if args.output_archive:
+        # Архив собирается заново целиком, поэтому пропускать страницы нельзя
+        page_caches = {}
+    if args.invalidate_cache:
+        for page_cache in page_caches.values():
+            page_cache.invalidate()
+    # Страница обрабатывается, если ее нет хотя бы в одном языке: детекция все равно общая
+    pending = [image_path for image_path in images
+               if not page_caches or not all(page_cache.is_done(image_path) for page_cache in page_caches.values())]
+    if len(pending) < len(images):
+        print(f"\nSkipping {len(images) - len(pending)} already translated images")
+    if not pending:
+        print("All images are already translated!")
+        return
+
+    def record_page(result):
+        # Страница с непереведенными текстами обрабатывается заново при следующем запуске
+        if not result['success'] or result['translation_failures']:
+            return
+        for lang, output_path in (result['outputs'] or {None: result['output_path']}).items():
+            if lang in page_caches:
+                page_caches[lang].record(result['image_path'], output_path)
+
     # Обрабатываем изображения
-    print(f"\nFound {len(images)} images to process")
-    for i, image_path in enumerate(images, 1):
-        print(f"\nProcessing image {i}/{len(images)}: {image_path}")
-        success = translate_manga(image_path, output_dir, args.auto)
-        if success:
-            print(f"Successfully processed {image_path}")
-        else:
-            print(f"Failed to process {image_path}")
+    print(f"\nFound {len(pending)} images to process")
+    # Один движок на процесс: модели загружаются один раз
+    # Результаты директории языка (или всей главы) пишутся в свой архив
+    archives = {}
+    if args.output_archive:
+        for lang in args.targets or [None]:
+            directory = os.path.join(output_dir, lang) if lang else output_dir
+            archives[directory] = ArchiveWriter(archive_path_for(args.output_archive, lang) if lang
+                                                else args.output_archive)
+    try:
+        results = run_chapter(pending, output_dir, args.auto, workers=args.workers,
+                              ocr_batch_size=args.ocr_batch_size, on_result=record_page,
+                              tile_height=args.tile_height, preview=args.preview, pipelined=args.pipeline,
+                              stage_workers=args.stage_workers, queue_size=args.queue_size,
+                              output_format=output_format, output_workers=args.output_workers,
+                              project_dir=os.path.join(output_dir, 'projects') if args.save_project else None,
+                              targets=args.targets, archives=archives)
+    finally:
+        for archive in archives.values():
+            archive.close()
+            print(f"Archive written to {archive.path}")
+    print_summary(results)
+
+    if tracer:
+        tracer.write(args.trace, args.trace_format)
+        print(f"Trace written to {args.trace}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
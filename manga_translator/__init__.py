@@ -1,3 +1,20 @@
-from .translator import MangaTranslator, translate_text
+import importlib
 
-__all__ = ['MangaTranslator', 'translate_text']
\ No newline at end of file
+# Модули с тяжелыми зависимостями загружаются при первом обращении к имени,
+# поэтому импорт легких модулей пакета (например, для --help) остается быстрым
+_EXPORTS = {
+    'MangaTranslator': 'translator',
+    'TranslatorEngine': 'translator',
+    'get_default_engine': 'translator',
+    'translate_text': 'translator',
+    'translate_batch': 'translator',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        module = importlib.import_module(f'.{_EXPORTS[name]}', __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,163 @@
+import os
+import re
+import threading
+import zipfile
+
+import numpy as np
+
+ARCHIVE_EXTENSIONS = ('.cbz', '.zip')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# Путь страницы внутри архива: chapter.cbz!/001.jpg
+MEMBER_SEPARATOR = '!/'
+
+# Открытые архивы страниц: {(pid, путь): ZipFile}
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def natural_key(name):
+    """Ключ естественной сортировки: page2 раньше page10"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def member_path(archive_path, name):
+    return f"{archive_path}{MEMBER_SEPARATOR}{name}"
+
+
+def split_member_path(path):
+    """(путь архива, имя файла в архиве) или (None, path) для обычного файла"""
+    archive_path, separator, name = path.partition(MEMBER_SEPARATOR)
+    if separator and archive_path.lower().endswith(ARCHIVE_EXTENSIONS):
+        return archive_path, name
+    return None, path
+
+
+def page_name(image_path):
+    """
+    Имя страницы для файлов результата и манифеста
+
+    У страниц архива к имени добавляется имя архива, чтобы страницы
+    001.jpg разных глав не совпадали.
+    """
+    archive_path, name = split_member_path(image_path)
+    if archive_path is None:
+        return os.path.basename(image_path)
+    stem = os.path.splitext(os.path.basename(archive_path))[0]
+    return f"{stem}_{name.replace('/', '_')}"
+
+
+def _open_archive(archive_path):
+    """
+    ZipFile архива, открытый один раз на процесс
+
+    Ключ включает pid: рабочие процессы, созданные fork после того, как
+    главный процесс открыл архив, наследуют его дескриптор с общей позицией
+    чтения, и одновременные seek/read разных процессов путали бы страницы.
+    """
+    key = (os.getpid(), archive_path)
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            archive = _archives[key] = zipfile.ZipFile(archive_path)
+        return archive
+
+
+def list_pages(archive_path):
+    """Пути страниц архива в естественном порядке (служебные и скрытые файлы пропускаются)"""
+    names = []
+    for info in _open_archive(archive_path).infolist():
+        base = os.path.basename(info.filename)
+        if info.is_dir() or base.startswith('.') or info.filename.startswith('__MACOSX/'):
+            continue
+        if base.lower().endswith(IMAGE_EXTENSIONS):
+            names.append(info.filename)
+    return [member_path(archive_path, name) for name in sorted(names, key=natural_key)]
+
+
+def list_images(path):
+    """
+    Страницы директории или архива .cbz/.zip
+
+    Файлы директории - по имени, страницы архивов в директории - на месте
+    архива в этом порядке.
+    """
+    if is_archive(path):
+        return list_pages(path)
+
+    images = []
+    for file in sorted(os.listdir(path)):
+        file_path = os.path.join(path, file)
+        if file.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(file_path)
+        elif is_archive(file_path):
+            # Страницы архива декодируются прямо из zip, без распаковки на диск
+            images.extend(list_pages(file_path))
+    return images
+
+
+def open_page(image_path):
+    """Открывает файл страницы или файл в архиве на чтение в двоичном режиме"""
+    archive_path, name = split_member_path(image_path)
+    if archive_path is None:
+        return open(image_path, 'rb')
+    return _open_archive(archive_path).open(name)
+
+
+def read_image(image_path):
+    """Декодирует страницу в BGR; страницы архива - из памяти, без распаковки на диск"""
+    import cv2
+
+    if split_member_path(image_path)[0] is None:
+        return cv2.imread(image_path)
+    with open_page(image_path) as file:
+        data = np.frombuffer(file.read(), dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+
+class ArchiveWriter:
+    """
+    Запись страниц в архив CBZ по мере готовности.
+
+    Каждая страница сразу пишется в файл архива, поэтому в памяти остаются
+    только страницы в работе. Изображения уже сжаты и хранятся без
+    повторного сжатия. Архив собирается во временном файле и заменяет
+    прежний при close, поэтому прерванный запуск не оставляет битый архив.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tmp_path = path + '.tmp'
+        self._zip = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_STORED)
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def add(self, name, data):
+        """Добавляет файл в архив; возвращает путь страницы в архиве"""
+        with self._lock:
+            if name in self._names:
+                raise ValueError(f"Duplicate archive member {name} in {self.path}")
+            self._names.add(name)
+            self._zip.writestr(name, bytes(data))
+        return member_path(self.path, name)
+
+    def close(self):
+        """Завершает архив: уже записанные страницы сохраняются и при ошибке главы"""
+        with self._lock:
+            if self._zip is None:
+                return
+            self._zip.close()
+            self._zip = None
+            os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
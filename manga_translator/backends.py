@@ -0,0 +1,232 @@
+import os
+import threading
+import time
+
+TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', 'google')
+# Сервер с API LibreTranslate (бэкенд libretranslate)
+TRANSLATION_URL = os.getenv('TRANSLATION_URL', 'http://localhost:5000/translate')
+TRANSLATION_API_KEY = os.getenv('TRANSLATION_API_KEY', '')
+TRANSLATION_TIMEOUT = float(os.getenv('TRANSLATION_TIMEOUT', 30))
+
+
+class TranslationError(Exception):
+    """
+    Ошибка запроса перевода
+
+    Args:
+        retryable: Имеет ли смысл повторить запрос (429, 5xx, обрыв соединения)
+        status: HTTP-статус ответа, если он был
+        retry_after: Сколько секунд сервис просит подождать
+    """
+
+    def __init__(self, message, retryable=False, status=None, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TranslationBackend:
+    """
+    Интерфейс бэкенда перевода.
+
+    Бэкенд переводит список строк за один запрос; ограничения запроса
+    задаются max_batch_chars и max_batch_items.
+    """
+    name = 'base'
+    max_batch_chars = 4500
+    max_batch_items = 50
+    # Длина разделителя, который бэкенд добавляет между строками запроса
+    separator_length = 1
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        """Переводит список строк, возвращает список той же длины"""
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """
+    Google Translate через deep_translator: строки пакета склеиваются переводом строки
+
+    GoogleTranslator хранит текст запроса в самом объекте, поэтому у каждого
+    потока клиента свои экземпляры переводчиков.
+    """
+    name = 'google'
+    # Ограничение Google Translate - 5000 символов на запрос
+    max_batch_chars = 4500
+    max_batch_items = 100
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _translator(self, source_lang, target_lang):
+        from deep_translator import GoogleTranslator
+
+        translators = getattr(self._local, 'translators', None)
+        if translators is None:
+            translators = self._local.translators = {}
+        key = (source_lang, target_lang)
+        if key not in translators:
+            translators[key] = GoogleTranslator(source=source_lang, target=target_lang)
+        return translators[key]
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        from deep_translator.exceptions import BaseError, RequestError, ServerException, TooManyRequests
+
+        try:
+            return self._translate_batch(texts, source_lang, target_lang)
+        except TooManyRequests as e:
+            raise TranslationError(f"rate limited: {e}", retryable=True, status=429) from e
+        except (RequestError, ServerException) as e:
+            raise TranslationError(f"request failed: {e}", retryable=True) from e
+        except BaseError as e:
+            # Сервис ответил, но перевода нет: повтор не поможет
+            raise TranslationError(f"translation failed: {e}") from e
+
+    def _translate_batch(self, texts, source_lang, target_lang):
+        translator = self._translator(source_lang, target_lang)
+        if len(texts) == 1:
+            return [translator.translate(texts[0])]
+
+        translated = translator.translate('\n'.join(texts))
+        parts = translated.split('\n') if translated else []
+        if len(parts) == len(texts):
+            return [part.strip() for part in parts]
+
+        # Сервис объединил или разбил строки - переводим пакет по одной строке
+        return [translator.translate(text) for text in texts]
+
+
+class LibreTranslateBackend(TranslationBackend):
+    """
+    HTTP API в формате LibreTranslate: POST {"q": [строки], "source", "target"}
+
+    Все запросы идут через одну сессию requests с пулом соединений, поэтому
+    соединения (и TLS) переиспользуются между запросами и потоками.
+    """
+    name = 'libretranslate'
+    max_batch_chars = 4500
+    max_batch_items = 50
+    separator_length = 0
+
+    def __init__(self, url=TRANSLATION_URL, api_key=TRANSLATION_API_KEY, timeout=TRANSLATION_TIMEOUT,
+                 pool_size=8):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        import requests
+
+        payload = {'q': list(texts), 'source': source_lang or 'auto', 'target': target_lang, 'format': 'text'}
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TranslationError(f"request failed: {e}", retryable=True) from e
+
+        if response.status_code != 200:
+            retry_after = response.headers.get('Retry-After')
+            raise TranslationError(
+                f"HTTP {response.status_code}: {response.text[:200]}",
+                retryable=response.status_code == 429 or response.status_code >= 500,
+                status=response.status_code,
+                retry_after=float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else None
+            )
+
+        translated = response.json().get('translatedText')
+        if isinstance(translated, str):
+            translated = [translated]
+        if not isinstance(translated, list):
+            raise TranslationError(f"unexpected response: {response.text[:200]}")
+        return translated
+
+
+class StubBackend(TranslationBackend):
+    """
+    Офлайн-заглушка для тестов и бенчмарков.
+
+    Возвращает детерминированный "перевод" и считает запросы; latency
+    имитирует задержку сети на каждый запрос.
+    """
+    name = 'stub'
+
+    def __init__(self, latency=0.0, max_batch_chars=4500, max_batch_items=50):
+        self.latency = latency
+        self.max_batch_chars = max_batch_chars
+        self.max_batch_items = max_batch_items
+        self.requests = 0
+        self.texts = 0
+
+    def translate_batch(self, texts, source_lang, target_lang):
+        self.requests += 1
+        self.texts += len(texts)
+        if self.latency:
+            time.sleep(self.latency)
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+_BACKENDS = {
+    'google': GoogleBackend,
+    'libretranslate': LibreTranslateBackend,
+    'stub': StubBackend,
+}
+_backend_instances = {}
+
+
+def register_backend(name, factory):
+    """Регистрирует фабрику бэкенда под именем"""
+    _BACKENDS[name] = factory
+
+
+def get_backend(name=None):
+    """Возвращает общий экземпляр бэкенда по имени"""
+    name = name or TRANSLATION_BACKEND
+    if name not in _backend_instances:
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown translation backend: {name}")
+        _backend_instances[name] = _BACKENDS[name]()
+    return _backend_instances[name]
+
+
+def split_batches(texts, max_chars, max_items, separator_length=1):
+    """
+    Делит строки на пакеты в пределах ограничений запроса
+
+    Строка длиннее max_chars отправляется отдельным пакетом.
+    """
+    batches = []
+    current = []
+    current_chars = 0
+
+    for text in texts:
+        added = len(text) + (separator_length if current else 0)
+        if current and (current_chars + added > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_chars = 0
+            added = len(text)
+        current.append(text)
+        current_chars += added
+
+    if current:
+        batches.append(current)
+    return batches
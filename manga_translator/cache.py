@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Пустое значение TRANSLATION_CACHE_PATH отключает кэш
+TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', os.path.join('saved', 'translation_cache.sqlite3'))
+TRANSLATION_CACHE_SIZE = int(os.getenv('TRANSLATION_CACHE_SIZE', 100000))
+
+
+def normalize_text(text):
+    """Нормализует текст для ключа кэша"""
+    return ' '.join(text.split())
+
+
+class TranslationCache:
+    """
+    Постоянный кэш переводов в SQLite с вытеснением давно неиспользуемых записей.
+
+    Ключ: нормализованный исходный текст, язык источника, целевой язык и бэкенд.
+    """
+
+    def __init__(self, path=TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL позволяет нескольким процессам читать кэш во время записи
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS translations (
+                source_text TEXT NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (source_text, source_lang, target_lang, backend)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS translations_last_used ON translations (last_used)')
+        self._conn.commit()
+        self._size = self._count()
+
+    def _count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM translations').fetchone()[0]
+
+    def get(self, text, source_lang, target_lang, backend):
+        """Возвращает перевод из кэша или None"""
+        key = (normalize_text(text), source_lang or 'auto', target_lang, backend)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT translation FROM translations '
+                'WHERE source_text = ? AND source_lang = ? AND target_lang = ? AND backend = ?',
+                key
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute(
+                'UPDATE translations SET last_used = ? '
+                'WHERE source_text = ? AND source_lang = ? AND target_lang = ? AND backend = ?',
+                (time.time(),) + key
+            )
+            self._conn.commit()
+            return row[0]
+
+    def set(self, text, source_lang, target_lang, backend, translation):
+        """Сохраняет перевод в кэш"""
+        self.set_many([(text, source_lang, target_lang, backend, translation)])
+
+    def set_many(self, entries):
+        """Сохраняет несколько переводов одной транзакцией"""
+        now = time.time()
+        rows = [(normalize_text(text), source_lang or 'auto', target_lang, backend, translation, now)
+                for text, source_lang, target_lang, backend, translation in entries]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+            self._size += len(rows)
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Удаляет самые давно использованные записи сверх лимита"""
+        self._size = self._count()
+        excess = self._size - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM translations WHERE rowid IN '
+                '(SELECT rowid FROM translations ORDER BY last_used LIMIT ?)',
+                (excess,)
+            )
+            self._conn.commit()
+            self._size -= excess
+
+    def stats(self):
+        """Счетчики попаданий и размер кэша"""
+        with self._lock:
+            size = self._count()
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def export(self, path):
+        """Выгружает кэш в файл JSON Lines"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source_text, source_lang, target_lang, backend, translation '
+                'FROM translations ORDER BY last_used'
+            ).fetchall()
+
+        with open(path, 'w', encoding='utf-8') as file:
+            for source_text, source_lang, target_lang, backend, translation in rows:
+                file.write(json.dumps({
+                    'text': source_text,
+                    'source': source_lang,
+                    'target': target_lang,
+                    'backend': backend,
+                    'translation': translation
+                }, ensure_ascii=False) + '\n')
+        return len(rows)
+
+    def prewarm(self, path):
+        """Загружает переводы из файла JSON Lines (формат export)"""
+        entries = []
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                entries.append((item['text'], item.get('source', 'auto'), item['target'],
+                                item['backend'], item['translation']))
+        self.set_many(entries)
+        return len(entries)
+
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._conn.execute('DELETE FROM translations')
+            self._conn.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation cache maintenance')
+    parser.add_argument('--path', default=TRANSLATION_CACHE_PATH, help='Cache database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show cache size')
+    export_parser = subparsers.add_parser('export', help='Export cache to a JSON Lines file')
+    export_parser.add_argument('file')
+    import_parser = subparsers.add_parser('prewarm', help='Load translations from a JSON Lines file')
+    import_parser.add_argument('file')
+    subparsers.add_parser('clear', help='Remove all cached translations')
+    args = parser.parse_args()
+
+    cache = TranslationCache(args.path)
+    if args.command == 'stats':
+        print(f"{cache.stats()['entries']} cached translations in {args.path}")
+    elif args.command == 'export':
+        print(f"Exported {cache.export(args.file)} translations to {args.file}")
+    elif args.command == 'prewarm':
+        print(f"Loaded {cache.prewarm(args.file)} translations from {args.file}")
+    elif args.command == 'clear':
+        cache.clear()
+        print(f"Cleared {args.path}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
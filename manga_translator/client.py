@@ -0,0 +1,167 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import threading
+import time
+
+from .backends import TranslationError, get_backend
+from .instrumentation import get_tracer
+
+# Одновременных запросов к бэкенду на процесс
+TRANSLATION_CONCURRENCY = int(os.getenv('TRANSLATION_CONCURRENCY', 4))
+# Запросов в секунду (0 - без ограничения) и запас для коротких всплесков
+TRANSLATION_RATE = float(os.getenv('TRANSLATION_RATE', 0))
+TRANSLATION_BURST = int(os.getenv('TRANSLATION_BURST', 5))
+# Повторы запроса после временной ошибки и пределы паузы между ними, секунды
+TRANSLATION_RETRIES = int(os.getenv('TRANSLATION_RETRIES', 4))
+TRANSLATION_BACKOFF = float(os.getenv('TRANSLATION_BACKOFF', 0.5))
+TRANSLATION_MAX_BACKOFF = float(os.getenv('TRANSLATION_MAX_BACKOFF', 30))
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты запросов "корзина жетонов".
+
+    Жетоны пополняются со скоростью rate в секунду до burst; запрос забирает
+    жетон или ждет его появления. rate=0 отключает ограничение.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Забирает жетон, возвращает время ожидания в секундах"""
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Задерживает все запросы: сервис сам попросил подождать (Retry-After)"""
+        if not self.rate:
+            return
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class TranslationClient:
+    """
+    Общий для процесса клиент бэкенда перевода.
+
+    Пакеты строк отправляются параллельно, но не более max_concurrency
+    запросов одновременно на весь процесс (пул потоков клиента общий для
+    всех страниц). Частота запросов ограничена TokenBucket. Временные ошибки
+    (429, 5xx, обрыв соединения) повторяются с экспоненциальной паузой со
+    случайным разбросом; ответ Retry-After задерживает и остальные запросы.
+    Прочие исключения (TypeError, KeyError и т.п.) не повторяются и не
+    глушатся, а пробрасываются вызывающему.
+    Пакет, который так и не удалось перевести, возвращается с ошибкой, а
+    не подменяется исходным текстом молча.
+    """
+
+    def __init__(self, backend=None, max_concurrency=TRANSLATION_CONCURRENCY, rate=TRANSLATION_RATE,
+                 burst=TRANSLATION_BURST, retries=TRANSLATION_RETRIES, backoff=TRANSLATION_BACKOFF,
+                 max_backoff=TRANSLATION_MAX_BACKOFF):
+        self.backend = backend if backend is not None else get_backend()
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='translate')
+        # Ограничение действует и на запросы, выполняемые прямо в потоке вызывающего
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.failures = 0
+
+    def _count(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def _delay(self, attempt, error):
+        """Пауза перед повтором: Retry-After сервиса или экспонента со случайным разбросом"""
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            return min(self.max_backoff, retry_after)
+        # "Полный разброс": одновременно упавшие запросы не повторяются одновременно
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _translate(self, batch, source_lang, target_lang):
+        """Переводит один пакет с повторами, возвращает (переводы, None) или (None, ошибка)"""
+        tracer = get_tracer()
+        for attempt in range(self.retries + 1):
+            waited = self.bucket.acquire()
+            if waited:
+                tracer.count('translation_rate_wait_ms', int(waited * 1000))
+            self._count('requests')
+            tracer.count('translation_requests')
+            try:
+                with self._slots, tracer.span('translation_request', backend=self.backend.name,
+                                              texts=len(batch), attempt=attempt):
+                    translated = self.backend.translate_batch(batch, source_lang, target_lang)
+                if len(translated) != len(batch):
+                    raise TranslationError(f"expected {len(batch)} translations, got {len(translated)}")
+                return translated, None
+            except Exception as e:
+                # Повторяются сетевые ошибки (в том числе ошибки requests) и ошибки, которые
+                # бэкенд сам пометил временными; ошибки в коде сразу пробрасываются дальше
+                if not hasattr(e, 'retryable') and not isinstance(e, OSError):
+                    raise
+                retryable = getattr(e, 'retryable', True)
+                if getattr(e, 'status', None) == 429:
+                    self._count('rate_limited')
+                    tracer.count('translation_rate_limited')
+                    self.bucket.pause(getattr(e, 'retry_after', None) or 0)
+                if not retryable or attempt == self.retries:
+                    self._count('failures')
+                    tracer.count('translation_failures')
+                    return None, f"{type(e).__name__}: {e}"
+                self._count('retried')
+                tracer.count('translation_retries')
+                time.sleep(self._delay(attempt, e))
+
+    def translate_batches(self, batches, source_lang, target_lang):
+        """
+        Переводит пакеты строк параллельно
+
+        Returns:
+            Для каждого пакета по порядку (список переводов, None) или (None, текст ошибки)
+        """
+        if len(batches) == 1:
+            return [self._translate(batches[0], source_lang, target_lang)]
+        futures = [self._executor.submit(self._translate, batch, source_lang, target_lang) for batch in batches]
+        return [future.result() for future in futures]
+
+    def stats(self):
+        return {'requests': self.requests, 'retried': self.retried, 'rate_limited': self.rate_limited,
+                'failures': self.failures}
+
+
+_clients_lock = threading.Lock()
+
+
+def get_client(backend=None):
+    """Возвращает общий клиент процесса для бэкенда (один на экземпляр бэкенда)"""
+    backend = backend if backend is not None else get_backend()
+    with _clients_lock:
+        client = getattr(backend, '_client', None)
+        if client is None:
+            client = backend._client = TranslationClient(backend)
+        return client
@@ -0,0 +1,94 @@
+import numpy as np
+import cv2
+
+
+class ContourTable:
+    """
+    Признаки контуров в массивах numpy: площадь, рамка, соотношение сторон,
+    периметр и число вершин аппроксимации.
+
+    Каждый признак считается один раз: периметр и рамка - векторно по точкам
+    всех контуров сразу; фильтрация и сортировка - операциями над массивами.
+    """
+
+    def __init__(self, contours, area, perimeter, bbox, vertices):
+        self.contours = contours
+        self.area = area
+        self.perimeter = perimeter
+        self.bbox = bbox
+        self.vertices = vertices
+
+    @property
+    def aspect_ratio(self):
+        return self.bbox[:, 2] / self.bbox[:, 3]
+
+    def __len__(self):
+        return len(self.contours)
+
+    @classmethod
+    def from_contours(cls, contours, min_area=None):
+        """
+        Считает признаки для списка контуров OpenCV
+
+        Args:
+            contours: Контуры OpenCV
+            min_area: Если задано, контуры не больше этой площади отбрасываются
+                      до расчета остальных признаков
+        """
+        contours = list(contours)
+        # Площадь нужна для всех контуров, поэтому считается одним проходом в C
+        area = np.fromiter(map(cv2.contourArea, contours), dtype=np.float64, count=len(contours))
+        if min_area is not None:
+            keep = np.flatnonzero(area > min_area)
+            contours = [contours[i] for i in keep]
+            area = area[keep]
+
+        count = len(contours)
+        if count == 0:
+            return cls([], area, np.zeros(0), np.zeros((0, 4), dtype=np.int32),
+                       np.zeros(0, dtype=np.int32))
+
+        lengths = np.fromiter((len(c) for c in contours), dtype=np.int64, count=count)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        points = np.concatenate([c.reshape(-1, 2) for c in contours]).astype(np.float64)
+        x, y = points[:, 0], points[:, 1]
+
+        # Индекс следующей точки того же (замкнутого) контура
+        following = np.arange(len(points)) + 1
+        following[starts + lengths - 1] = starts
+
+        # Длина замкнутой ломаной, как в arcLength
+        perimeter = np.add.reduceat(np.hypot(x[following] - x, y[following] - y), starts)
+
+        x_min = np.minimum.reduceat(x, starts)
+        y_min = np.minimum.reduceat(y, starts)
+        x_max = np.maximum.reduceat(x, starts)
+        y_max = np.maximum.reduceat(y, starts)
+        bbox = np.stack([x_min, y_min, x_max - x_min + 1, y_max - y_min + 1], axis=1).astype(np.int32)
+
+        # Число вершин считается позже и только для оставшихся контуров
+        vertices = np.full(count, -1, dtype=np.int32)
+        return cls(contours, area, perimeter, bbox, vertices)
+
+    def select(self, indices):
+        """Возвращает таблицу из выбранных строк (индексы или булева маска)"""
+        indices = np.flatnonzero(indices) if np.asarray(indices).dtype == bool else np.asarray(indices, dtype=np.int64)
+        return ContourTable([self.contours[i] for i in indices], self.area[indices],
+                            self.perimeter[indices], self.bbox[indices], self.vertices[indices])
+
+    def compute_vertices(self, epsilon_ratio=0.02):
+        """Число вершин аппроксимации approxPolyDP для каждого контура"""
+        for i in np.flatnonzero(self.vertices < 0):
+            approx = cv2.approxPolyDP(self.contours[i], epsilon_ratio * self.perimeter[i], True)
+            self.vertices[i] = len(approx)
+        return self.vertices
+
+    def sorted_by_area(self, descending=True):
+        """Сортирует строки по площади (устойчиво, как sorted)"""
+        order = np.argsort(-self.area if descending else self.area, kind='stable')
+        return self.select(order)
+
+    def scaled(self, factor, min_area=None):
+        """Переводит контуры в другой масштаб и пересчитывает признаки"""
+        contours = [np.round(c * factor).astype(np.int32) for c in self.contours]
+        return ContourTable.from_contours(contours, min_area)
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import random
+import threading
+import time
+
+DOWNLOAD_CONCURRENCY = int(os.getenv('DOWNLOAD_CONCURRENCY', 4))
+DOWNLOAD_RETRIES = int(os.getenv('DOWNLOAD_RETRIES', 3))
+# Файл с ETag/Last-Modified уже скачанных изображений
+MANIFEST_NAME = '.downloads.json'
+CHUNK_SIZE = 64 * 1024
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def create_session(max_connections=DOWNLOAD_CONCURRENCY):
+    """Сессия с пулом соединений под заданное число параллельных запросов"""
+    # requests импортируется только для загрузки, не при запуске CLI
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class ImageDownloader:
+    """
+    Параллельная загрузка изображений с переиспользованием соединений.
+
+    Тела ответов пишутся на диск частями, уже скачанные и не изменившиеся
+    файлы пропускаются по условным запросам (ETag / Last-Modified).
+    """
+
+    def __init__(self, output_dir, max_concurrency=DOWNLOAD_CONCURRENCY, retries=DOWNLOAD_RETRIES,
+                 backoff=0.5, timeout=30, session=None):
+        self.output_dir = output_dir
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = session or create_session(self.max_concurrency)
+        self._manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self._manifest = self._load_manifest()
+        self._lock = threading.Lock()
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self._manifest, file, indent=2)
+        os.replace(tmp_path, self._manifest_path)
+
+    def _conditional_headers(self, url, path):
+        """Заголовки условного запроса для уже скачанного файла"""
+        entry = self._manifest.get(url)
+        if not entry or not os.path.exists(path) or os.path.getsize(path) != entry.get('size'):
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def fetch(self, url, path):
+        """
+        Скачивает один файл с повторными попытками
+
+        Returns:
+            'downloaded', 'unchanged' или 'failed'
+        """
+        import requests
+
+        headers = self._conditional_headers(url, path)
+
+        for attempt in range(self.retries + 1):
+            try:
+                with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 304:
+                        return 'unchanged'
+
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                    response.raise_for_status()
+
+                    # Пишем во временный файл, чтобы не оставить обрезанное изображение
+                    tmp_path = path + '.part'
+                    size = 0
+                    with open(tmp_path, 'wb') as file:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            file.write(chunk)
+                            size += len(chunk)
+                    os.replace(tmp_path, path)
+
+                    with self._lock:
+                        self._manifest[url] = {
+                            'path': os.path.basename(path),
+                            'size': size,
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified')
+                        }
+                    return 'downloaded'
+            except requests.RequestException as e:
+                response = getattr(e, 'response', None)
+                permanent = response is not None and response.status_code not in RETRY_STATUSES
+                if permanent or attempt >= self.retries:
+                    print(f"Failed to download {url}: {e}")
+                    return 'failed'
+                # Экспоненциальная задержка со случайным разбросом
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            except OSError as e:
+                # Ошибка записи на диск не лечится повтором и не должна прерывать главу
+                print(f"Failed to save {url} to {path}: {e}")
+                try:
+                    os.remove(path + '.part')
+                except OSError:
+                    pass
+                return 'failed'
+
+        return 'failed'
+
+    def download_all(self, urls, filenames=None):
+        """
+        Скачивает изображения параллельно
+
+        Args:
+            urls: Адреса изображений в порядке страниц
+            filenames: Имена файлов (по умолчанию 1.png, 2.png, ...)
+
+        Returns:
+            Список (путь, статус) в порядке страниц
+        """
+        filenames = filenames or [f"{i}.png" for i in range(1, len(urls) + 1)]
+        paths = [os.path.join(self.output_dir, name) for name in filenames]
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            statuses = list(executor.map(self.fetch, urls, paths))
+
+        self._save_manifest()
+        return list(zip(paths, statuses))
@@ -0,0 +1,227 @@
+from collections import defaultdict
+import json
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_memory_mb():
+    """Пиковый RSS процесса в мегабайтах (None, если недоступно)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает килобайты, macOS - байты
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTracer:
+    """Выключенная трассировка: все вызовы ничего не делают"""
+    enabled = False
+
+    def span(self, name, **args):
+        return _NULL_SPAN
+
+    def page(self, name):
+        return _NULL_SPAN
+
+    def bind(self, name, counters=None):
+        return _NULL_SPAN
+
+    def finish_page(self, name, start, counters):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def drain(self):
+        return []
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class _PageSpan(_Span):
+    def __init__(self, tracer, page_name):
+        super().__init__(tracer, 'page', {})
+        self.page_name = page_name
+
+    def __enter__(self):
+        self.tracer._local.page = self.page_name
+        self.tracer._local.counters = defaultdict(int)
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        local = self.tracer._local
+        self.args = {'counters': dict(local.counters), 'peak_memory_mb': peak_memory_mb()}
+        super().__exit__(*exc)
+        local.page = None
+        local.counters = None
+        return False
+
+
+class _PageBinding:
+    def __init__(self, tracer, page_name, counters):
+        self.tracer = tracer
+        self.page_name = page_name
+        self.counters = counters
+
+    def __enter__(self):
+        local = self.tracer._local
+        self.previous = getattr(local, 'page', None)
+        self.previous_counters = getattr(local, 'counters', None)
+        local.page = self.page_name
+        if self.counters is not None:
+            local.counters = self.counters
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._local.page = self.previous
+        self.tracer._local.counters = self.previous_counters
+        return False
+
+
+class Tracer:
+    """
+    Сбор времени стадий и счетчиков по страницам и пузырям.
+
+    События пишутся в JSON Lines или в формате Chrome trace (chrome://tracing,
+    Perfetto).
+    """
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self.counters = defaultdict(int)
+        # Время событий - от эпохи, чтобы события разных процессов совпадали по шкале
+        self._origin = time.perf_counter()
+        self._origin_wall = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name, **args):
+        """Контекст, измеряющий время стадии"""
+        return _Span(self, name, args)
+
+    def page(self, name):
+        """Контекст обработки страницы: собирает счетчики и пиковую память страницы"""
+        return _PageSpan(self, name)
+
+    def bind(self, name, counters=None):
+        """
+        Относит события потока к странице без отдельного события страницы (стадии конвейера)
+
+        Args:
+            counters: Счетчики страницы (defaultdict(int)), общие для всех ее стадий;
+                      событие страницы с ними записывает finish_page
+        """
+        return _PageBinding(self, name, counters)
+
+    def finish_page(self, name, start, counters):
+        """Записывает событие страницы, обработанной стадиями в разных потоках"""
+        with self.bind(name):
+            self._record('page', start, time.perf_counter(),
+                         {'counters': dict(counters), 'peak_memory_mb': peak_memory_mb()})
+
+    def count(self, name, value=1):
+        """Увеличивает счетчик (общий и текущей страницы)"""
+        with self._lock:
+            self.counters[name] += value
+        counters = getattr(self._local, 'counters', None)
+        if counters is not None:
+            counters[name] += value
+
+    def _record(self, name, start, end, args):
+        event = {
+            'name': name,
+            'page': getattr(self._local, 'page', None),
+            'ts': (self._origin_wall + start - self._origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def drain(self):
+        """Забирает накопленные события (для передачи из рабочего процесса)"""
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        """Добавляет события из другого процесса"""
+        with self._lock:
+            self.events.extend(events)
+            # Общие счетчики складываются из счетчиков страниц
+            for event in events:
+                if event['name'] == 'page':
+                    for name, value in event['args']['counters'].items():
+                        self.counters[name] += value
+
+    def write(self, path, trace_format='jsonl'):
+        """Сохраняет трассу в файл"""
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+
+        with open(path, 'w', encoding='utf-8') as file:
+            if trace_format == 'chrome':
+                trace_events = [{
+                    'name': event['name'],
+                    'cat': 'page' if event['name'] == 'page' else 'stage',
+                    'ph': 'X',
+                    'ts': event['ts'],
+                    'dur': event['dur'],
+                    'pid': event['pid'],
+                    'tid': event['tid'],
+                    'args': dict(event['args'], page=event['page'])
+                } for event in events]
+                json.dump({'traceEvents': trace_events, 'otherData': {'counters': counters}}, file)
+            else:
+                for event in events:
+                    file.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+                file.write(json.dumps({'name': 'counters', 'args': counters}) + '\n')
+
+
+_tracer = NullTracer()
+
+
+def get_tracer():
+    """Текущий трассировщик процесса (по умолчанию выключен)"""
+    return _tracer
+
+
+def set_tracer(tracer):
+    global _tracer
+    _tracer = tracer if tracer is not None else NullTracer()
+    return _tracer
@@ -0,0 +1,230 @@
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+import numpy as np
+import cv2
+
+MIN_FONT_SIZE = 8
+# Изображение-заглушка только для измерения текста
+_measure_draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+@lru_cache(maxsize=1)
+def default_font():
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=128)
+def load_font(font_path, font_size):
+    """Загружает шрифт один раз для каждой пары (путь, размер)"""
+    try:
+        return ImageFont.truetype(font_path, font_size)
+    except Exception:
+        print("Failed to load custom font, using default")
+        return default_font()
+
+
+@lru_cache(maxsize=65536)
+def text_bbox(font, text):
+    """Запоминает габариты строки для шрифта"""
+    return _measure_draw.textbbox((0, 0), text, font=font)
+
+
+def text_width(font, text):
+    bbox = text_bbox(font, text)
+    return bbox[2] - bbox[0]
+
+
+def text_height(font, text):
+    bbox = text_bbox(font, text)
+    return bbox[3] - bbox[1]
+
+
+def hyphenate_word(word, max_width, font):
+    """Разбивает длинное слово с помощью дефиса"""
+    if not word:
+        return []
+
+    vowels = 'аеёиоуыэюяАЕЁИОУЫЭЮЯ'
+    consonants = 'бвгджзйклмнпрстфхцчшщБВГДЖЗЙКЛМНПРСТФХЦЧШЩ'
+
+    for i in range(len(word)-1, 1, -1):
+        # Проверяем, можно ли разделить слово в этой позиции
+        if (word[i-1] in vowels and word[i] in consonants) or \
+        (word[i-1] in consonants and word[i] in consonants):
+            # Пробуем разделить слово
+            first_part = word[:i] + '-'
+            if text_width(font, first_part) <= max_width:
+                return [first_part, word[i:]]
+
+    # Если не удалось найти подходящее место для переноса,
+    # просто разделим слово пополам с дефисом
+    mid = len(word) // 2
+    return [word[:mid] + '-', word[mid:]]
+
+
+def wrap_text(text, font, max_width):
+    """Разбивает текст на строки по ширине с переносом длинных слов"""
+    lines = []
+    current_line = ""
+
+    for word in text.split():
+        # Проверяем, поместится ли слово целиком
+        test_line = f"{current_line} {word}".strip()
+
+        if text_width(font, test_line) <= max_width:
+            current_line = test_line
+        else:
+            # Если текущая строка не пуста, добавляем её
+            if current_line:
+                lines.append(current_line)
+                current_line = ""
+
+            # Проверяем, нужно ли разбивать слово
+            if text_width(font, word) > max_width:
+                # Разбиваем длинное слово
+                word_parts = hyphenate_word(word, max_width, font)
+                if word_parts:
+                    lines.append(word_parts[0])
+                    current_line = word_parts[1]
+            else:
+                current_line = word
+
+    if current_line:
+        lines.append(current_line)
+
+    return lines
+
+
+class TextLayout:
+    """
+    Раскладка текста в пузырях.
+
+    Шрифты и измерения строк кэшируются, размер шрифта подбирается
+    двоичным поиском, все пузыри страницы рисуются за один проход PIL.
+    """
+
+    def __init__(self, font_path, max_font_size, min_font_size=MIN_FONT_SIZE, padding=4):
+        self.font_path = font_path
+        self.max_font_size = max_font_size
+        self.min_font_size = min_font_size
+        self.padding = padding
+        # Количество проверенных размеров шрифта (для статистики)
+        self.size_attempts = 0
+
+    def _try_size(self, text, font_size, inner_w, inner_h):
+        """Раскладывает текст шрифтом заданного размера, None если не помещается"""
+        self.size_attempts += 1
+        font = load_font(self.font_path, font_size)
+        lines = wrap_text(text, font, inner_w)
+        total_height = sum(text_height(font, line) for line in lines)
+        if total_height > inner_h:
+            return None
+        return font, lines, total_height
+
+    def fit(self, text, w, h, max_font_size=None):
+        """
+        Подбирает наибольший размер шрифта, при котором текст помещается в пузырь
+
+        Returns:
+            (шрифт, строки, высота текста) или None
+        """
+        inner_w = w - 2 * self.padding
+        inner_h = h - 2 * self.padding
+        low = self.min_font_size
+        high = min(h // 2, max_font_size or self.max_font_size)
+
+        best = None
+        while low <= high:
+            font_size = (low + high) // 2
+            layout = self._try_size(text, font_size, inner_w, inner_h)
+            if layout:
+                best = layout
+                low = font_size + 1
+            else:
+                high = font_size - 1
+        return best
+
+    def place(self, text, x, y, w, h, max_font_size=None):
+        """
+        Раскладывает текст в пузыре, ничего не рисуя
+
+        Returns:
+            Список ((x, y), строка, шрифт) для draw.text; пустой, если пузырь
+            слишком мал
+        """
+        # Проверка минимальных размеров
+        if w < 20 or h < 20:
+            print(f"Warning: Box too small for text: {w}x{h}")
+            return []
+
+        inner_x = x + self.padding
+        inner_y = y + self.padding
+        inner_w = w - 2 * self.padding
+        inner_h = h - 2 * self.padding
+        fallback = [((inner_x, inner_y), text, default_font())]
+
+        try:
+            layout = self.fit(text, w, h, max_font_size)
+            if layout is None:
+                print(f"Warning: Could not fit text within bounds")
+                return fallback
+
+            font, lines, total_height = layout
+            # Вертикальное центрирование
+            current_y = inner_y + (inner_h - total_height) // 2
+
+            placed = []
+            for line in lines:
+                bbox = text_bbox(font, line)
+                text_x = inner_x + (inner_w - (bbox[2] - bbox[0])) // 2
+                placed.append(((text_x, current_y), line, font))
+                current_y += bbox[3] - bbox[1]
+            return placed
+
+        except Exception as e:
+            print(f"Error drawing text: {e}")
+            return fallback
+
+    def draw(self, draw, text, x, y, w, h, max_font_size=None):
+        """Рисует текст в пузыре на уже созданном ImageDraw"""
+        for position, line, font in self.place(text, x, y, w, h, max_font_size):
+            draw.text(position, line, fill='black', font=font)
+
+    def extent(self, text, x, y, w, h, max_font_size=None):
+        """
+        Рамка пикселей, которые закрашивает draw
+
+        Текст, не поместившийся в пузырь, выходит за его рамку.
+
+        Returns:
+            (x0, y0, x1, y1) или None, если ничего не рисуется
+        """
+        boxes = []
+        for (left, top), line, font in self.place(text, x, y, w, h, max_font_size):
+            bbox = text_bbox(font, line)
+            boxes.append((left + bbox[0], top + bbox[1], left + bbox[2], top + bbox[3]))
+        if not boxes:
+            return None
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+    def render(self, image, items, max_font_size=None):
+        """
+        Рисует тексты всех пузырей страницы за одно преобразование цвета
+
+        Args:
+            image: Изображение BGR
+            items: Список (текст, x, y, w, h)
+
+        Returns:
+            Новое изображение BGR
+        """
+        if not items:
+            return image
+
+        img_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        draw = ImageDraw.Draw(img_pil)
+        for text, x, y, w, h in items:
+            self.draw(draw, text, x, y, w, h, max_font_size)
+        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
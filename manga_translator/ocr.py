@@ -0,0 +1,85 @@
+import numpy as np
+import cv2
+
+# Порог уверенности распознавания строки
+MIN_LINE_CONFIDENCE = 0.5
+
+
+def parse_ocr_lines(result):
+    """Достает пары (текст, уверенность) из ответа PaddleOCR для одного изображения"""
+    lines = []
+    if not result or not result[0]:
+        return lines
+
+    for line in result[0]:
+        if isinstance(line, list):
+            for item in line:
+                if isinstance(item, tuple) and len(item) >= 2:
+                    lines.append((item[0], item[1]))
+    return lines
+
+
+def sort_text_boxes(boxes):
+    """Сортирует боксы строк сверху вниз и слева направо (как PaddleOCR)"""
+    boxes = sorted(boxes, key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            # Боксы на одной линии упорядочиваем по x
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_text_line(image, box):
+    """Вырезает строку текста по четырехугольнику с выравниванием перспективы"""
+    points = np.array(box, dtype=np.float32)
+    crop_width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    crop_height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    crop_width, crop_height = max(crop_width, 1), max(crop_height, 1)
+
+    target = np.float32([[0, 0], [crop_width, 0], [crop_width, crop_height], [0, crop_height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(image, matrix, (crop_width, crop_height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+
+    # Вертикальные строки поворачиваем, как это делает PaddleOCR
+    if crop.shape[0] / crop.shape[1] >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def recognize_batched(ocr, regions):
+    """
+    Батчевое распознавание нескольких областей.
+
+    Детекция строк выполняется для каждой области отдельно, а все найденные
+    строки всех областей распознаются общими батчами (rec_batch_num).
+
+    Returns:
+        Список пар (текст, уверенность) для каждой области, в исходном порядке;
+        строки не фильтруются по уверенности (это делает build_text_blocks)
+    """
+    line_crops = []
+    owners = []
+
+    for index, region in enumerate(regions):
+        if region.ndim == 2:
+            region = cv2.cvtColor(region, cv2.COLOR_GRAY2BGR)
+
+        detected = ocr.ocr(region, rec=False)
+        boxes = detected[0] if detected and detected[0] else []
+        for box in sort_text_boxes(boxes):
+            line_crops.append(crop_text_line(region, box))
+            owners.append(index)
+
+    results = [[] for _ in regions]
+    if not line_crops:
+        return results
+
+    recognized = ocr.ocr(line_crops, det=False, cls=True)
+    for owner, item in zip(owners, recognized[0] if recognized else []):
+        results[owner].append((item[0], item[1]))
+
+    return results
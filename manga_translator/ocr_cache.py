@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Пустое значение OCR_CACHE_PATH отключает кэш
+OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', os.path.join('saved', 'ocr_cache.sqlite3'))
+OCR_CACHE_SIZE = int(os.getenv('OCR_CACHE_SIZE', 20000))
+# Наибольшее расстояние Хэмминга (из 1024 бит хэша), при котором области считаются одинаковыми.
+# По умолчанию только точное совпадение: короткие строки одного размера ("NO" и "UP",
+# "WHAT" и "WAIT") отличаются всего на 8-10 бит, и похожий хэш вернул бы чужой текст.
+# Повторное сжатие JPEG меняет до 20 бит, поэтому такие повторы находятся только при
+# расстоянии больше 0 - ценой риска перепутать короткие строки
+OCR_CACHE_DISTANCE = int(os.getenv('OCR_CACHE_DISTANCE', 0))
+# Сетка 32x32: на более грубой сетке форма пузыря заглушает различия в тексте
+HASH_SIZE = 32
+# Допустимая разница размеров областей при совпадении хэшей
+SIZE_TOLERANCE = 0.1
+# Доля max_entries, до которой кэш сокращается при переполнении: вытеснение
+# (и перезагрузка массивов) происходит раз на 10% лимита новых записей, а не на каждой
+EVICT_TO = 0.9
+
+# Число единичных битов для каждого значения байта
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Разностный перцептивный хэш изображения
+
+    Изображение уменьшается до (hash_size + 1) x hash_size, каждый бит -
+    ярче ли пиксель своего левого соседа. Шум сжатия и сдвиги на пиксель
+    меняют лишь несколько бит.
+
+    Returns:
+        hash_size * hash_size / 8 байт
+    """
+    import cv2
+
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return np.packbits(small[:, 1:] > small[:, :-1]).tobytes()
+
+
+class OCRCache:
+    """
+    Постоянный кэш результатов OCR по перцептивному хэшу подготовленной области.
+
+    Повторяющиеся области (звуковые эффекты, титры, водяные знаки) находятся
+    по хэшу и размеру и не распознаются повторно. При max_distance > 0
+    подходят и хэши с расстоянием Хэмминга до max_distance при близком
+    размере; хэши держатся в памяти массивом numpy, поиск похожих - одной
+    векторной операцией. Записи хранятся в SQLite; при превышении
+    max_entries самые давно использованные вытесняются до EVICT_TO.
+    """
+
+    def __init__(self, path=OCR_CACHE_PATH, max_entries=OCR_CACHE_SIZE, max_distance=OCR_CACHE_DISTANCE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                hash BLOB NOT NULL,
+                height INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                lang TEXT NOT NULL,
+                lines TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (hash, height, width, lang)
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)')
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        """Загружает хэши и результаты в память"""
+        rows = self._conn.execute(
+            'SELECT hash, height, width, lang, lines FROM ocr_results ORDER BY last_used DESC LIMIT ?',
+            (self.max_entries,)
+        ).fetchall()
+        self._keys = [(row[0], row[1], row[2], row[3]) for row in rows]
+        self._lines = [[tuple(line) for line in json.loads(row[4])] for row in rows]
+        self._index = {key: i for i, key in enumerate(self._keys)}
+        self._hashes = np.array([np.frombuffer(key[0], dtype=np.uint8) for key in self._keys],
+                                dtype=np.uint8).reshape(len(rows), HASH_SIZE * HASH_SIZE // 8)
+        self._sizes = np.array([(key[1], key[2]) for key in self._keys], dtype=np.int64).reshape(len(rows), 2)
+        self._langs = np.array([key[3] for key in self._keys], dtype=object)
+
+    def _find(self, key):
+        """Индекс записи для ключа: точное совпадение или ближайший похожий хэш"""
+        index = self._index.get(key)
+        if index is not None or not self.max_distance or not self._keys:
+            return index
+
+        image_hash, height, width, lang = key
+        size = np.array([height, width])
+        similar_size = np.all(np.abs(self._sizes - size) <= SIZE_TOLERANCE * size, axis=1) & (self._langs == lang)
+        candidates = np.flatnonzero(similar_size)
+        if len(candidates) == 0:
+            return None
+
+        query = np.frombuffer(image_hash, dtype=np.uint8)
+        distances = _POPCOUNT[self._hashes[candidates] ^ query].sum(axis=1)
+        best = int(np.argmin(distances))
+        return int(candidates[best]) if distances[best] <= self.max_distance else None
+
+    def key(self, region, lang):
+        return (dhash(region), region.shape[0], region.shape[1], lang or '')
+
+    def lookup(self, keys):
+        """
+        Ищет результаты для ключей областей
+
+        Returns:
+            Список строк OCR для каждой области или None для промахов
+        """
+        results = []
+        used = []
+        with self._lock:
+            for key in keys:
+                index = self._find(key)
+                if index is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self.hits += 1
+                    results.append(list(self._lines[index]))
+                    used.append(self._keys[index])
+
+            if used:
+                now = time.time()
+                self._conn.executemany(
+                    'UPDATE ocr_results SET last_used = ? WHERE hash = ? AND height = ? AND width = ? AND lang = ?',
+                    [(now,) + key for key in used]
+                )
+                self._conn.commit()
+        return results
+
+    def store(self, keys, results):
+        """Сохраняет результаты OCR для ключей областей"""
+        now = time.time()
+        rows = [key + (json.dumps(lines, ensure_ascii=False), now) for key, lines in zip(keys, results)]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO ocr_results VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+            added = []
+            for key, lines in zip(keys, results):
+                if key in self._index:
+                    self._lines[self._index[key]] = [tuple(line) for line in lines]
+                    continue
+                self._index[key] = len(self._keys)
+                self._keys.append(key)
+                self._lines.append([tuple(line) for line in lines])
+                added.append(key)
+
+            # Массивы расширяются один раз на вызов
+            if added:
+                self._hashes = np.vstack([self._hashes] + [np.frombuffer(key[0], dtype=np.uint8) for key in added])
+                self._sizes = np.vstack([self._sizes, [(key[1], key[2]) for key in added]])
+                self._langs = np.append(self._langs, np.array([key[3] for key in added], dtype=object))
+
+            if len(self._keys) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Удаляет самые давно использованные записи, оставляя EVICT_TO от лимита"""
+        excess = self._conn.execute('SELECT COUNT(*) FROM ocr_results').fetchone()[0] - int(
+            self.max_entries * EVICT_TO)
+        self._conn.execute(
+            'DELETE FROM ocr_results WHERE rowid IN '
+            '(SELECT rowid FROM ocr_results ORDER BY last_used LIMIT ?)',
+            (excess,)
+        )
+        self._conn.commit()
+        self._load()
+
+    def stats(self):
+        """Счетчики попаданий и размер кэша"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._keys),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._conn.execute('DELETE FROM ocr_results')
+            self._conn.commit()
+            self._load()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR cache maintenance')
+    parser.add_argument('--path', default=OCR_CACHE_PATH, help='Cache database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Show cache size')
+    subparsers.add_parser('clear', help='Remove all cached OCR results')
+    args = parser.parse_args()
+
+    cache = OCRCache(args.path)
+    if args.command == 'stats':
+        print(f"{cache.stats()['entries']} cached OCR results in {args.path}")
+    elif args.command == 'clear':
+        cache.clear()
+        print(f"Cleared {args.path}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
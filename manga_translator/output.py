@@ -0,0 +1,188 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import threading
+import time
+
+from .instrumentation import get_tracer
+
+# Формат результата: png, webp, jpeg (пусто - как у исходной страницы)
+OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', '')
+# Уровень сжатия PNG 0-9 (пусто - по умолчанию OpenCV)
+PNG_COMPRESSION = os.getenv('PNG_COMPRESSION', '')
+JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', 95))
+# Качество WebP 0-100 (пусто - 90 при явном --output-format webp, иначе без потерь)
+WEBP_QUALITY = os.getenv('WEBP_QUALITY', '')
+DEFAULT_WEBP_QUALITY = 90
+WEBP_LOSSLESS = os.getenv('WEBP_LOSSLESS', '0') == '1'
+# Максимальная ширина результата (0 - без уменьшения)
+OUTPUT_MAX_WIDTH = int(os.getenv('OUTPUT_MAX_WIDTH', 0))
+OUTPUT_WORKERS = int(os.getenv('OUTPUT_WORKERS', 2))
+
+EXTENSIONS = {'png': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+FORMATS = {'.png': 'png', '.webp': 'webp', '.jpg': 'jpeg', '.jpeg': 'jpeg'}
+
+
+class OutputFormat:
+    """Формат и параметры сжатия результата"""
+
+    def __init__(self, format=None, png_compression=None, jpeg_quality=None, webp_quality=None,
+                 webp_lossless=None, max_width=None):
+        format = OUTPUT_FORMAT if format is None else format
+        if format and format not in EXTENSIONS:
+            raise ValueError(f"Unknown output format: {format}")
+        self.format = format or None
+        if png_compression is None and PNG_COMPRESSION:
+            png_compression = int(PNG_COMPRESSION)
+        self.png_compression = png_compression
+        self.jpeg_quality = JPEG_QUALITY if jpeg_quality is None else jpeg_quality
+        if webp_quality is None and WEBP_QUALITY:
+            webp_quality = int(WEBP_QUALITY)
+        self.webp_quality = webp_quality
+        self.webp_lossless = WEBP_LOSSLESS if webp_lossless is None else webp_lossless
+        self.max_width = OUTPUT_MAX_WIDTH if max_width is None else max_width
+
+    def config(self):
+        """Параметры, от которых зависит файл результата"""
+        return {'format': self.format, 'png_compression': self.png_compression,
+                'jpeg_quality': self.jpeg_quality, 'webp_quality': self.webp_quality,
+                'webp_lossless': self.webp_lossless, 'max_width': self.max_width}
+
+    def path_for(self, path):
+        """Меняет расширение пути под выбранный формат"""
+        if not self.format:
+            return path
+        return os.path.splitext(path)[0] + EXTENSIONS[self.format]
+
+    def lossless(self, format):
+        """Сохраняет ли формат пиксели без потерь"""
+        if format == 'jpeg':
+            return False
+        if format != 'webp' or self.webp_lossless:
+            return True
+        # Исходные страницы .webp без явного формата и качества пишутся
+        # без потерь, как cv2.imwrite по умолчанию
+        return self.webp_quality is None and not self.format
+
+    def _params(self, format):
+        import cv2
+
+        if format == 'png' and self.png_compression is not None:
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        if format == 'jpeg':
+            return [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        if format == 'webp':
+            # Качество выше 100 включает сжатие без потерь
+            quality = self.webp_quality if self.webp_quality is not None else DEFAULT_WEBP_QUALITY
+            return [cv2.IMWRITE_WEBP_QUALITY, 101 if self.lossless(format) else quality]
+        return []
+
+    def encode(self, image, path):
+        """Кодирует изображение в байты файла"""
+        # OpenCV не нужен для разбора аргументов CLI, импортируется при кодировании
+        import cv2
+
+        if self.max_width and image.shape[1] > self.max_width:
+            height = round(image.shape[0] * self.max_width / image.shape[1])
+            image = cv2.resize(image, (self.max_width, height), interpolation=cv2.INTER_AREA)
+
+        extension = os.path.splitext(path)[1].lower()
+        format = self.format or FORMATS.get(extension)
+        # Прочие расширения (bmp, tiff) кодируются OpenCV с параметрами по умолчанию
+        ok, data = cv2.imencode(EXTENSIONS[format] if format else extension, image, self._params(format))
+        if not ok:
+            raise ValueError(f"Failed to encode image: {path}")
+        return data
+
+
+def write_image(image, path, output_format=None, archive=None):
+    """
+    Кодирует и атомарно записывает изображение
+
+    Args:
+        archive: ArchiveWriter, в который изображение добавляется под именем файла path
+
+    Returns:
+        Словарь с путем, размером файла и временем кодирования
+    """
+    output_format = output_format or OutputFormat()
+    start = time.perf_counter()
+    with get_tracer().span('encode'):
+        data = output_format.encode(image, path)
+    encode_time = time.perf_counter() - start
+
+    if archive is not None:
+        path = archive.add(os.path.basename(path), data)
+        return {'path': path, 'bytes': len(data), 'encode_time': encode_time}
+
+    # Прерванная запись не оставляет обрезанный файл
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.write(data.tobytes())
+    os.replace(tmp_path, path)
+    return {'path': path, 'bytes': len(data), 'encode_time': encode_time}
+
+
+class OutputWriter:
+    """
+    Кодирование и запись результатов в фоновом пуле потоков.
+
+    Пока страница кодируется, следующая уже обрабатывается. Число страниц,
+    ждущих записи, ограничено max_pending: при переполнении submit ждет.
+    При workers=0 запись выполняется сразу в вызывающем потоке.
+    Результаты из директории, для которой в archives задан ArchiveWriter,
+    добавляются в этот архив вместо записи файлами.
+    """
+
+    def __init__(self, output_format=None, workers=OUTPUT_WORKERS, max_pending=None, archives=None):
+        self.output_format = output_format or OutputFormat()
+        self.archives = {os.path.normpath(directory): archive for directory, archive in (archives or {}).items()}
+        self.workers = max(0, workers)
+        self._executor = ThreadPoolExecutor(self.workers) if self.workers else None
+        self._slots = threading.BoundedSemaphore(max_pending or max(1, self.workers) * 2)
+        self._futures = {}
+
+    def path_for(self, path):
+        return self.output_format.path_for(path)
+
+    def submit(self, image, path):
+        """
+        Ставит изображение в очередь записи
+
+        Изображение не должно изменяться после вызова.
+
+        Returns:
+            Future со словарем write_image
+        """
+        archive = self.archives.get(os.path.normpath(os.path.dirname(path)))
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(write_image(image, path, self.output_format, archive))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            self._slots.acquire()
+            future = self._executor.submit(write_image, image, path, self.output_format, archive)
+            future.add_done_callback(lambda _: self._slots.release())
+        self._futures[path] = future
+        return future
+
+    def done(self, path):
+        future = self._futures.get(path)
+        return future is None or future.done()
+
+    def wait(self, path):
+        """Ждет записи файла, возвращает результат write_image (или бросает ошибку записи)"""
+        return self._futures.pop(path).result()
+
+    def close(self):
+        """Дожидается всех записей"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
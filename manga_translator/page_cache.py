@@ -0,0 +1,100 @@
+import hashlib
+import json
+import os
+
+from .archive import open_page, page_name
+from .backends import TRANSLATION_BACKEND
+from .output import OutputFormat
+from .preprocess import OCR_TEXT_HEIGHT
+from .spatial import SUPPRESS_OVERLAP
+from .translator import (DEFAULT_TARGET_LANG, DETECTION_MAX_SIDE, FONT_PATH, MAX_FONT_SIZE, OCR_LANG,
+                         PIPELINE_VERSION)
+
+MANIFEST_NAME = '.page_cache.json'
+
+
+def _file_hash(path):
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pipeline_config(target_lang=None, output_format=None):
+    """Настройки, от которых зависит результат обработки страницы"""
+    font_hash = _file_hash(FONT_PATH) if FONT_PATH and os.path.exists(FONT_PATH) else None
+    return {
+        'ocr_lang': OCR_LANG,
+        'ocr_text_height': OCR_TEXT_HEIGHT,
+        'detection_max_side': DETECTION_MAX_SIDE,
+        'suppress_overlap': SUPPRESS_OVERLAP,
+        'target_lang': target_lang or DEFAULT_TARGET_LANG,
+        'backend': TRANSLATION_BACKEND,
+        'font': FONT_PATH,
+        'font_hash': font_hash,
+        'max_font_size': MAX_FONT_SIZE,
+        'pipeline_version': PIPELINE_VERSION,
+        'output': (output_format or OutputFormat()).config()
+    }
+
+
+class PageCache:
+    """
+    Манифест уже переведенных страниц в директории результатов.
+
+    Ключ страницы - хэш содержимого изображения и настроек конвейера,
+    поэтому измененные страницы или настройки обрабатываются заново.
+    """
+
+    def __init__(self, output_dir, config=None):
+        self.output_dir = output_dir
+        self.config = config or pipeline_config()
+        self._config_json = json.dumps(self.config, sort_keys=True)
+        self._path = os.path.join(output_dir, MANIFEST_NAME)
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self._path, encoding='utf-8') as file:
+                return json.load(file).get('pages', {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        # Атомарная запись: прерванный запуск не портит манифест
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'pages': self._entries}, file, indent=2)
+        os.replace(tmp_path, self._path)
+
+    def page_key(self, image_path):
+        """Ключ страницы: хэш изображения вместе с настройками"""
+        digest = hashlib.sha256()
+        with open_page(image_path) as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(self._config_json.encode('utf-8'))
+        return digest.hexdigest()
+
+    def is_done(self, image_path):
+        """Проверяет, есть ли актуальный результат для страницы"""
+        entry = self._entries.get(page_name(image_path))
+        if not entry or not os.path.exists(entry['output_path']):
+            return False
+        return entry['key'] == self.page_key(image_path)
+
+    def record(self, image_path, output_path):
+        """Запоминает результат страницы сразу после ее обработки"""
+        self._entries[page_name(image_path)] = {
+            'key': self.page_key(image_path),
+            'output_path': output_path
+        }
+        self._save()
+
+    def invalidate(self):
+        """Сбрасывает все записи манифеста"""
+        self._entries = {}
+        if os.path.exists(self._path):
+            os.remove(self._path)
@@ -0,0 +1,142 @@
+import queue
+import threading
+
+PIPELINE_QUEUE_SIZE = 2
+# Потоки стадий конвейера главы по умолчанию. Модели движка не потокобезопасны,
+# поэтому детекция и OCR идут в одном потоке; перевод ждет сеть.
+STAGE_WORKERS = {'load': 1, 'detect': 1, 'translate': 4, 'render': 2, 'encode': 2}
+# Пауза ожидания очереди, после которой проверяется флаг остановки
+_POLL_INTERVAL = 0.1
+
+
+class _Done:
+    """Маркер конца потока элементов"""
+
+
+_DONE = _Done()
+
+
+class Stage:
+    """
+    Стадия конвейера: функция над элементом и число потоков.
+
+    Функция получает результат предыдущей стадии и возвращает вход следующей.
+    """
+
+    def __init__(self, name, func, workers=1):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline:
+    """
+    Конвейер стадий с ограниченными очередями между ними.
+
+    Каждая стадия обрабатывает элементы в своих потоках, поэтому ожидание
+    сети на одной стадии перекрывается вычислениями на другой. Очереди
+    ограничены queue_size: быстрая стадия ждет, пока медленная освободит
+    место, и число элементов в работе не растет. Результаты отдаются в
+    исходном порядке. Ошибка элемента не останавливает конвейер: элемент
+    проходит оставшиеся стадии без обработки и возвращается с ошибкой.
+    """
+
+    def __init__(self, stages, queue_size=PIPELINE_QUEUE_SIZE):
+        self.stages = list(stages)
+        self.queue_size = max(1, queue_size)
+        self._stop = threading.Event()
+
+    def _put(self, target, item):
+        """Кладет элемент в очередь, пока конвейер не остановлен"""
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source):
+        """Забирает элемент из очереди, None после остановки"""
+        while not self._stop.is_set():
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def _feed(self, items, target):
+        for index, item in enumerate(items):
+            if not self._put(target, (index, item, None)):
+                return
+        self._put(target, _DONE)
+
+    def _work(self, stage, source, target, finished):
+        while True:
+            entry = self._get(source)
+            if entry is None:
+                return
+            if entry is _DONE:
+                # Маркер видят все потоки стадии, последний передает его дальше
+                source.put(entry)
+                if finished():
+                    self._put(target, _DONE)
+                return
+
+            index, item, error = entry
+            if error is None:
+                try:
+                    item = stage.func(item)
+                except Exception as e:
+                    error = (stage.name, e)
+            if not self._put(target, (index, item, error)):
+                return
+
+    def run(self, items):
+        """
+        Пропускает элементы через стадии
+
+        Yields:
+            (индекс, результат последней стадии, ошибка) в исходном порядке;
+            ошибка - None или (имя стадии, исключение)
+        """
+        self._stop.clear()
+        queues = [queue.Queue(self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+
+        for position, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+
+            def finished(remaining=remaining, lock=lock):
+                with lock:
+                    remaining[0] -= 1
+                    return remaining[0] == 0
+
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, name=f"{stage.name}-{worker}", daemon=True,
+                    args=(stage, queues[position], queues[position + 1], finished)))
+
+        for thread in threads:
+            thread.start()
+
+        pending = {}
+        next_index = 0
+        try:
+            while True:
+                entry = self._get(queues[-1])
+                if entry is None or entry is _DONE:
+                    break
+                pending[entry[0]] = entry
+                # Элементы, пришедшие раньше предшественников, ждут своей очереди
+                while next_index in pending:
+                    yield pending.pop(next_index)
+                    next_index += 1
+        finally:
+            # Остановка при любом выходе: конец, исключение потребителя, Ctrl+C
+            self._stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,117 @@
+import os
+import threading
+
+import numpy as np
+import cv2
+
+# Высота символов, к которой масштабируется область перед OCR (0 - прежнее
+# фиксированное увеличение в 2 раза)
+OCR_TEXT_HEIGHT = int(os.getenv('OCR_TEXT_HEIGHT', 24))
+MIN_SCALE = 0.5
+MAX_SCALE = 3.0
+# Большая сторона области после масштабирования: детектор строк OCR все равно
+# уменьшает изображение, а лишние пиксели только замедляют предобработку
+MAX_REGION_SIDE = 2048
+FIXED_SCALE = 2
+# Масштаб ближе к 1, чем на эту величину, не меняет размер области
+SCALE_TOLERANCE = 0.1
+# Разброс яркости (между 2-м и 98-м процентилями), при котором CLAHE не нужен
+HIGH_CONTRAST = 160
+
+
+def estimate_text_height(gray):
+    """
+    Оценивает высоту символов в области пузыря
+
+    Темные связные компоненты, не касающиеся края области (контур пузыря
+    и фон вокруг него), считаются символами; берется медиана их высот.
+
+    Returns:
+        Высота в пикселях или None, если символов не найдено
+    """
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if count <= 1:
+        return None
+
+    height, width = gray.shape
+    x, y, w, h, area = stats[1:].T
+    inside = (x > 0) & (y > 0) & (x + w < width) & (y + h < height)
+    # Точки шума и крупные пятна (рисунок внутри пузыря) не считаются
+    glyphs = inside & (h >= 3) & (area >= 4) & (h < height / 2) & (w < width / 2)
+    if glyphs.sum() < 2:
+        return None
+    return float(np.median(h[glyphs]))
+
+
+def contrast_range(gray):
+    """Разброс яркости между 2-м и 98-м процентилями по гистограмме"""
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    cumulative = np.cumsum(hist) / hist.sum()
+    low = int(np.searchsorted(cumulative, 0.02))
+    high = int(np.searchsorted(cumulative, 0.98))
+    return high - low
+
+
+class TextPreprocessor:
+    """
+    Подготовка областей пузырей к OCR.
+
+    Масштаб выбирается так, чтобы символы имели высоту target_text_height:
+    крупный текст уменьшается, мелкий увеличивается сильнее, чем в 2 раза.
+    Изменение размера пропускается, если масштаб близок к 1, CLAHE - если
+    контраст уже высокий. Объект CLAHE создается один раз на поток.
+    """
+
+    def __init__(self, target_text_height=OCR_TEXT_HEIGHT, min_scale=MIN_SCALE, max_scale=MAX_SCALE,
+                 fallback_scale=FIXED_SCALE, max_side=MAX_REGION_SIDE):
+        self.target_text_height = target_text_height
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.fallback_scale = fallback_scale
+        self.max_side = max_side
+        self._local = threading.local()
+
+    @property
+    def clahe(self):
+        clahe = getattr(self._local, 'clahe', None)
+        if clahe is None:
+            clahe = self._local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        return clahe
+
+    def choose_scale(self, gray):
+        """Масштаб области по высоте символов"""
+        text_height = estimate_text_height(gray)
+        if text_height is None:
+            scale = self.fallback_scale
+        else:
+            scale = float(np.clip(self.target_text_height / text_height, self.min_scale, self.max_scale))
+        if self.max_side:
+            scale = min(scale, self.max_side / max(gray.shape))
+        return scale
+
+    def fixed(self, text_region, scale=FIXED_SCALE):
+        """Прежняя предобработка: увеличение в scale раз, CLAHE и Otsu"""
+        text_region = cv2.resize(text_region, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+        gray = cv2.cvtColor(text_region, cv2.COLOR_BGR2GRAY)
+        contrast = self.clahe.apply(gray)
+        _, binary = cv2.threshold(contrast, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+
+    def process(self, text_region):
+        """Предобработка области BGR, возвращает бинарное изображение для OCR"""
+        if not self.target_text_height:
+            return self.fixed(text_region)
+
+        # Размер меняется уже у одноканального изображения
+        gray = cv2.cvtColor(text_region, cv2.COLOR_BGR2GRAY)
+        scale = self.choose_scale(gray)
+        if abs(scale - 1) > SCALE_TOLERANCE:
+            interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+
+        if contrast_range(gray) < HIGH_CONTRAST:
+            gray = self.clahe.apply(gray)
+
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
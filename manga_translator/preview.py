@@ -0,0 +1,66 @@
+import numpy as np
+import cv2
+
+WINDOW_NAME = 'Current bubble'
+# Окно занимает 70% экрана FullHD
+WINDOW_WIDTH = int(1920 * 0.7)
+WINDOW_HEIGHT = int(1080 * 0.7)
+
+
+class BubblePreview:
+    """
+    Окно предпросмотра: показывает текущий пузырь и уже обработанные.
+
+    Подключается к translate_and_replace_text как наблюдатель только по запросу.
+    Страница уменьшается до размера окна один раз, контуры рисуются на этой
+    копии по одному: текущий - красным, при переходе к следующему он
+    перерисовывается зеленым.
+    """
+
+    def __init__(self, window_name=WINDOW_NAME, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT):
+        self.window_name = window_name
+        self.max_width = max_width
+        self.max_height = max_height
+        self.canvas = None
+        self.scale = 1.0
+        self._current = None
+
+    def start(self, image):
+        """Начинает показ новой страницы"""
+        height, width = image.shape[:2]
+        # Масштабируем изображение, сохраняя пропорции
+        if width > height:
+            new_width = self.max_width
+            new_height = int(self.max_width * height / width)
+        else:
+            new_height = self.max_height
+            new_width = int(self.max_height * width / height)
+
+        self.scale = new_width / width
+        self.canvas = cv2.resize(image, (new_width, new_height))
+        self._current = None
+
+        cv2.namedWindow(self.window_name, cv2.WINDOW_NORMAL)
+        cv2.resizeWindow(self.window_name, new_width, new_height)
+
+    def bubble(self, contour):
+        """Показывает пузырь, который сейчас обрабатывается"""
+        if self.canvas is None:
+            return
+
+        # Предыдущий пузырь уже обработан
+        if self._current is not None:
+            cv2.drawContours(self.canvas, [self._current], -1, (0, 255, 0), 2)
+
+        self._current = np.round(contour * self.scale).astype(np.int32)
+        cv2.drawContours(self.canvas, [self._current], -1, (0, 0, 255), 2)
+
+        cv2.imshow(self.window_name, self.canvas)
+        cv2.waitKey(1)
+
+    def finish(self):
+        """Закрывает окно после страницы"""
+        if self.canvas is not None:
+            cv2.destroyWindow(self.window_name)
+        self.canvas = None
+        self._current = None
@@ -0,0 +1,335 @@
+import argparse
+import base64
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+import cv2
+
+from .layout import TextLayout
+from .output import FORMATS, OutputFormat, write_image
+
+PROJECT_VERSION = 1
+CLEAN_PLATE_SUFFIX = '.clean.png'
+
+
+def encode_contour(contour):
+    """
+    Компактная запись контура OpenCV: разности соседних точек int32, zlib, base64
+
+    Соседние точки контура отличаются на несколько пикселей, поэтому
+    разности сжимаются в несколько раз лучше абсолютных координат.
+    """
+    points = np.asarray(contour, dtype=np.int32).reshape(-1, 2)
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int32))
+    return base64.b64encode(zlib.compress(deltas.astype('<i4').tobytes(), 9)).decode('ascii')
+
+
+def decode_contour(data):
+    """Восстанавливает контур (N, 1, 2) int32 из encode_contour"""
+    deltas = np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype='<i4').reshape(-1, 2)
+    return np.cumsum(deltas, axis=0, dtype=np.int32).reshape(-1, 1, 2)
+
+
+def project_path_for(output_path, project_dir):
+    """Путь файла проекта для результата страницы"""
+    name = os.path.splitext(os.path.basename(output_path))[0]
+    return os.path.join(project_dir, f"{name}.json")
+
+
+def clean_plate_path_for(output_path, project_dir):
+    """Путь чистой страницы для результата страницы"""
+    return os.path.splitext(project_path_for(output_path, project_dir))[0] + CLEAN_PLATE_SUFFIX
+
+
+def _union(first, second):
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return (min(first[0], second[0]), min(first[1], second[1]),
+            max(first[2], second[2]), max(first[3], second[3]))
+
+
+def _intersects(first, second):
+    return first[0] < second[2] and second[0] < first[2] and first[1] < second[3] and second[1] < first[3]
+
+
+class PageProject:
+    """
+    Проект страницы: блоки текста и чистая страница со стертым текстом.
+
+    Сохраняется при переводе страницы; по нему перерисовываются пузыри с
+    исправленным переводом без детекции, OCR, перевода и стирания - и без
+    загрузки моделей. Перерисовываются только пузыри, у которых translation
+    отличается от rendered (текста, который уже нарисован в результате).
+    """
+
+    def __init__(self, path, image_path, output_path, size, blocks, font_path, max_font_size, padding,
+                 output_format, clean_plate_path=None):
+        self.path = path
+        # Языки одной страницы делят одну чистую страницу
+        self.clean_plate_path = clean_plate_path or os.path.splitext(path)[0] + CLEAN_PLATE_SUFFIX
+        self.image_path = image_path
+        self.output_path = output_path
+        self.size = size
+        self.blocks = blocks
+        self.font_path = font_path
+        self.max_font_size = max_font_size
+        self.padding = padding
+        self.output_format = output_format
+
+    @classmethod
+    def from_page(cls, path, page, output_path, output_format=None, clean_plate_path=None):
+        """
+        Проект из обработанной страницы MangaTranslator
+
+        Args:
+            path: Путь файла проекта
+            page: Страница после apply_translations
+            output_path: Путь результата страницы
+            output_format: OutputFormat результата
+            clean_plate_path: Путь чистой страницы (по умолчанию рядом с проектом)
+        """
+        if page.clean_plate is None:
+            raise ValueError(f"Page {page.image_path} has no rendered translations")
+
+        blocks = []
+        for block, text in page.rendered_blocks:
+            blocks.append({
+                'text': block['text'],
+                'confidence': round(float(block.get('confidence', 0)), 4),
+                'bbox': [int(block['x']), int(block['y']), int(block['w']), int(block['h'])],
+                'contour': encode_contour(block['contour']),
+                'translation': text,
+                'rendered': text
+            })
+
+        height, width = page.clean_plate.shape[:2]
+        project = cls(path, page.image_path, output_path, [width, height], blocks,
+                      page.layout.font_path, page.layout.max_font_size, page.layout.padding,
+                      (output_format or OutputFormat()).config(), clean_plate_path)
+        project.clean_plate = page.clean_plate
+        return project
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != PROJECT_VERSION:
+            raise ValueError(f"Unsupported project version {data.get('version')} in {path}")
+
+        base = os.path.dirname(path)
+        clean_plate_path = data.get('clean_plate')
+        project = cls(path, data['image_path'], os.path.normpath(os.path.join(base, data['output_path'])),
+                      data['size'], data['blocks'], data['font_path'], data['max_font_size'], data['padding'],
+                      data['output'], clean_plate_path and os.path.normpath(os.path.join(base, clean_plate_path)))
+        project.clean_plate = None
+        return project
+
+    def save(self, write_clean_plate=True):
+        """Записывает JSON проекта (атомарно) и чистую страницу PNG"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if write_clean_plate:
+            write_image(self.clean_plate, self.clean_plate_path, OutputFormat('png'))
+
+        data = {
+            'version': PROJECT_VERSION,
+            'image_path': self.image_path,
+            # Путь результата относительно проекта, чтобы директорию главы можно было перенести
+            'output_path': os.path.relpath(self.output_path, directory or '.'),
+            'clean_plate': os.path.relpath(self.clean_plate_path, directory or '.'),
+            'size': self.size,
+            'font_path': self.font_path,
+            'max_font_size': self.max_font_size,
+            'padding': self.padding,
+            'output': self.output_format,
+            'blocks': self.blocks
+        }
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+
+    def changed(self):
+        """Индексы блоков, перевод которых отличается от нарисованного"""
+        return [i for i, block in enumerate(self.blocks) if block['translation'] != block['rendered']]
+
+    def contour(self, index):
+        return decode_contour(self.blocks[index]['contour'])
+
+    def _output_format(self):
+        config = self.output_format
+        # Пустой формат - расширение пути, а не OUTPUT_FORMAT текущего окружения
+        return OutputFormat(config['format'] or '', config['png_compression'], config['jpeg_quality'],
+                            config['webp_quality'], config['webp_lossless'], config['max_width'])
+
+    def _previous_output(self):
+        """Прежний результат, если его пиксели совпадают с отрисованными, иначе None"""
+        config = self.output_format
+        format = config['format'] or FORMATS.get(os.path.splitext(self.output_path)[1].lower())
+        # Частичная перерисовка возможна только поверх результата без потерь
+        if not self._output_format().lossless(format) or not os.path.exists(self.output_path):
+            return None
+        image = cv2.imread(self.output_path)
+        if image is None or [image.shape[1], image.shape[0]] != list(self.size):
+            return None
+        return image
+
+    def _footprint(self, layout, index):
+        """Рамка пикселей нарисованного и нового текста пузыря или None"""
+        block = self.blocks[index]
+        footprint = None
+        for text in {block['rendered'], block['translation']}:
+            if text:
+                footprint = _union(footprint, layout.extent(text, *block['bbox']))
+        if footprint is None:
+            return None
+        # Запас на сглаживание краев глифов
+        return footprint[0] - 1, footprint[1] - 1, footprint[2] + 1, footprint[3] + 1
+
+    def _dirty_region(self, layout, changed):
+        """
+        Область перерисовки и все пузыри, текст которых в нее попадает
+
+        Текст, не поместившийся в пузырь, выходит за его рамку, а рамки
+        соседних пузырей могут перекрываться, поэтому область расширяется,
+        пока в нее попадает текст еще не выбранных пузырей.
+
+        Returns:
+            ((x0, y0, x1, y1) или None, индексы пузырей по порядку)
+        """
+        footprints = [self._footprint(layout, i) for i in range(len(self.blocks))]
+        selected = set(changed)
+        region = None
+        for i in selected:
+            region = _union(region, footprints[i])
+        grown = region is not None
+        while grown:
+            grown = False
+            for i, footprint in enumerate(footprints):
+                if i not in selected and footprint is not None and _intersects(footprint, region):
+                    selected.add(i)
+                    region = _union(region, footprint)
+                    grown = True
+        return region, sorted(selected)
+
+    def render(self, full=False):
+        """
+        Перерисовывает измененные пузыри и сохраняет результат и проект
+
+        Если прежний результат записан без потерь в исходном размере,
+        восстанавливается из чистой страницы только область, куда попадает
+        старый и новый текст измененных пузырей, и в ней заново рисуются все
+        пузыри, чей текст ее задевает; пиксели совпадают с полной
+        перерисовкой. Иначе (JPEG, уменьшение, full=True) все тексты рисуются
+        заново на чистой странице.
+
+        Returns:
+            Число перерисованных пузырей
+        """
+        changed = self.changed()
+        if not changed and not full:
+            return 0
+
+        clean_plate = cv2.imread(self.clean_plate_path)
+        if clean_plate is None:
+            raise ValueError(f"Failed to read clean plate: {self.clean_plate_path}")
+
+        layout = TextLayout(self.font_path, self.max_font_size, padding=self.padding)
+        image = None if full else self._previous_output()
+
+        if image is None:
+            indices = range(len(self.blocks))
+            items = [(block['translation'], *block['bbox']) for block in self.blocks if block['translation']]
+            image = layout.render(clean_plate, items)
+        else:
+            region, indices = self._dirty_region(layout, changed)
+            if region is not None:
+                height, width = image.shape[:2]
+                x0, y0 = max(region[0], 0), max(region[1], 0)
+                x1, y1 = min(region[2], width), min(region[3], height)
+                # Координаты относительно области дают те же пиксели, что и рисование на всей странице
+                items = [(self.blocks[i]['translation'], x - x0, y - y0, w, h)
+                         for i in indices if self.blocks[i]['translation']
+                         for x, y, w, h in [self.blocks[i]['bbox']]]
+                image[y0:y1, x0:x1] = layout.render(clean_plate[y0:y1, x0:x1], items)
+
+        write_image(image, self.output_path, self._output_format())
+        for i in indices:
+            self.blocks[i]['rendered'] = self.blocks[i]['translation']
+        self.save(write_clean_plate=False)
+        return len(indices)
+
+
+def save_page_project(page, output_path, project_dir, output_format=None, clean_plate_path=None,
+                      write_clean_plate=True):
+    """
+    Сохраняет проект обработанной страницы
+
+    Args:
+        clean_plate_path: Общая чистая страница переводов на несколько языков
+        write_clean_plate: False, если общая чистая страница уже записана
+
+    Returns:
+        Путь файла проекта или None, если на странице нет нарисованных переводов
+    """
+    if page.clean_plate is None:
+        return None
+    path = project_path_for(output_path, project_dir)
+    PageProject.from_page(path, page, output_path, output_format, clean_plate_path).save(write_clean_plate)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Page project: inspect, edit and re-render translations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    show = subparsers.add_parser('show', help='List bubbles of a project')
+    show.add_argument('project')
+
+    edit = subparsers.add_parser('set', help='Change the translation of a bubble')
+    edit.add_argument('project')
+    edit.add_argument('index', type=int, help='Bubble number from "show"')
+    edit.add_argument('text', help='New translation (empty string removes the text); capitalized '
+                                   'like translations of the pipeline')
+    edit.add_argument('--verbatim', action='store_true', help='Keep the text exactly as typed')
+
+    render = subparsers.add_parser('render', help='Redraw bubbles whose translation changed')
+    render.add_argument('projects', nargs='+')
+    render.add_argument('--full', action='store_true', help='Redraw every bubble from the clean plate')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        project = PageProject.load(args.project)
+        changed = set(project.changed())
+        print(f"{project.image_path} -> {project.output_path}")
+        for i, block in enumerate(project.blocks):
+            mark = '*' if i in changed else ' '
+            print(f"{mark}{i:3}. [{', '.join(map(str, block['bbox']))}] ({block['confidence']:.2f}) {block['text']}")
+            print(f"      {block['translation']}")
+
+    elif args.command == 'set':
+        project = PageProject.load(args.project)
+        if not 0 <= args.index < len(project.blocks):
+            parser.error(f"bubble index must be between 0 and {len(project.blocks) - 1}")
+        # Тот же вид, что у переводов конвейера (apply_translations)
+        text = args.text.strip()
+        project.blocks[args.index]['translation'] = text if args.verbatim else text.capitalize()
+        project.save(write_clean_plate=False)
+        print(f"Bubble {args.index} updated, run 'render' to redraw")
+
+    elif args.command == 'render':
+        for path in args.projects:
+            start = time.perf_counter()
+            project = PageProject.load(path)
+            count = project.render(full=args.full)
+            print(f"{project.output_path}: {count} bubbles redrawn in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
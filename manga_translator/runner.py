@@ -0,0 +1,500 @@
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import io
+import os
+import time
+
+from .archive import page_name
+from .instrumentation import Tracer, get_tracer, set_tracer
+from .output import OutputWriter
+from .pipeline import PIPELINE_QUEUE_SIZE, STAGE_WORKERS, Pipeline, Stage
+from .preview import BubblePreview
+from .project import clean_plate_path_for, save_page_project
+from .tiling import TILE_HEIGHT, image_height, translate_strip
+from .translator import TranslatorEngine, get_default_engine, get_ocr_cache, get_translation_cache
+
+# Движок и запись результатов рабочего процесса: создаются один раз на процесс
+_worker_engine = None
+_worker_writer = None
+
+
+def output_path_for(image_path, output_dir, writer=None):
+    """Путь результата для страницы (расширение - по формату writer)"""
+    output_path = os.path.join(output_dir, f"translated_{page_name(image_path)}")
+    return writer.path_for(output_path) if writer is not None else output_path
+
+
+def target_paths_for(image_path, output_dir, targets, writer=None):
+    """Пути результатов страницы для каждого языка: output_dir/<язык>/..."""
+    return {target_lang: output_path_for(image_path, os.path.join(output_dir, target_lang), writer)
+            for target_lang in targets}
+
+
+def translate_page(image_path, output_dir, auto_translate=False, engine=None, observer=None, tile_height=None,
+                   writer=None, project_dir=None, targets=None):
+    """
+    Переводит одну страницу и сохраняет результат
+
+    Args:
+        observer: Наблюдатель за пузырями (BubblePreview); по умолчанию без окон
+        tile_height: Страницы выше этого значения обрабатываются полосами
+        writer: OutputWriter для фоновой записи результата
+        project_dir: Директория проектов страниц для повторной отрисовки (None - не сохранять)
+        targets: Языки перевода для translate_page_targets (None - DEFAULT_TARGET_LANG)
+
+    Returns:
+        Путь к сохраненному изображению или {язык: путь} при targets
+    """
+    if targets:
+        return translate_page_targets(image_path, output_dir, targets, engine, tile_height, writer, project_dir)
+
+    # Страница использует уже прогретые модели движка
+    engine = engine or get_default_engine()
+    tile_height = TILE_HEIGHT if tile_height is None else tile_height
+
+    # Определяем имя выходного файла
+    output_path = output_path_for(image_path, output_dir, writer)
+
+    if tile_height and image_height(image_path) > tile_height:
+        # Проект хранит одну чистую страницу, для лент полосами он не сохраняется
+        return translate_strip(image_path, output_path, engine, auto_translate, observer, tile_height,
+                               writer=writer)
+
+    translator = engine.page(image_path)
+    text_blocks = translator.process_bubbles()
+
+    translator.translate_and_replace_text(text_blocks, auto_mode=auto_translate, observer=observer)
+
+    translator.save_result(output_path, writer)
+    if project_dir:
+        save_page_project(translator, output_path, project_dir, writer.output_format if writer else None)
+    return output_path
+
+
+def translate_page_targets(image_path, output_dir, targets, engine=None, tile_height=None, writer=None,
+                           project_dir=None):
+    """
+    Переводит страницу на несколько языков за один проход детекции, OCR и стирания
+
+    Для каждого языка выполняются только перевод и отрисовка на общей чистой
+    странице. Результаты пишутся в output_dir/<язык>/, проекты - в
+    project_dir/<язык>/, общая чистая страница - один раз в project_dir/.
+
+    Returns:
+        Словарь {язык: путь результата}
+    """
+    engine = engine or get_default_engine()
+    tile_height = TILE_HEIGHT if tile_height is None else tile_height
+    outputs = target_paths_for(image_path, output_dir, targets, writer)
+
+    if tile_height and image_height(image_path) > tile_height:
+        # Полосы ленты стираются и рисуются по одной, поэтому лента обрабатывается для каждого языка
+        for target_lang, output_path in outputs.items():
+            translate_strip(image_path, output_path, engine, True, tile_height=tile_height, writer=writer,
+                            target_lang=target_lang)
+        return outputs
+
+    page = engine.page(image_path)
+    text_blocks = page.process_bubbles()
+    translations = {target_lang: page.translate_blocks(text_blocks, target_lang) for target_lang in targets}
+    render_targets(page, text_blocks, translations, outputs, writer, project_dir)
+    return outputs
+
+
+def render_targets(page, text_blocks, translations, outputs, writer=None, project_dir=None):
+    """Стирает текст страницы один раз и рисует и сохраняет переводы каждого языка"""
+    blocks = page.erase_text_blocks(text_blocks)
+    for i, (target_lang, output_path) in enumerate(outputs.items()):
+        page.render_language(blocks, translations[target_lang])
+        page.save_result(output_path, writer)
+        if project_dir:
+            # Чистая страница общая для всех языков и записывается один раз
+            save_page_project(page, output_path, os.path.join(project_dir, target_lang),
+                              writer.output_format if writer else None,
+                              clean_plate_path_for(output_path, project_dir), write_clean_plate=i == 0)
+
+
+def _page_counters(engine):
+    """Текущие счетчики кэшей переводов и OCR процесса и пропущенных вызовов OCR движка"""
+    counters = {'ocr_calls_avoided': engine.ocr_calls_avoided,
+                'translation_failures': engine.translation_failures}
+    for prefix, cache in (('cache', get_translation_cache()), ('ocr_cache', get_ocr_cache())):
+        counters[f'{prefix}_hits'] = cache.hits if cache is not None else 0
+        counters[f'{prefix}_misses'] = cache.misses if cache is not None else 0
+    return counters
+
+
+def _count_page_counters(result, engine, before):
+    """Записывает в результат обращения к кэшам и пропуски OCR за время обработки страницы"""
+    for name, value in _page_counters(engine).items():
+        result[name] = value - before[name]
+
+
+def _new_result(index, image_path):
+    return {'index': index, 'image_path': image_path, 'output_path': None, 'outputs': {},
+            'success': False, 'error': None, 'elapsed': 0.0, 'log': '',
+            'cache_hits': 0, 'cache_misses': 0, 'ocr_cache_hits': 0, 'ocr_cache_misses': 0, 'ocr_calls_avoided': 0,
+            'translation_failures': 0,
+            'output_bytes': 0, 'encode_time': 0.0, 'trace': []}
+
+
+def _set_outputs(result, outputs):
+    """Записывает в результат пути страницы: один путь или {язык: путь}"""
+    if isinstance(outputs, dict):
+        result['outputs'] = outputs
+    else:
+        result['output_path'] = outputs
+
+
+def _output_paths(result):
+    return list(result['outputs'].values()) or [result['output_path']]
+
+
+def _finish_write(result, writer):
+    """Дожидается записи файлов страницы и добавляет в результат их размер и время кодирования"""
+    if not result['success']:
+        return
+    for output_path in _output_paths(result):
+        try:
+            stats = writer.wait(output_path)
+        except Exception as e:
+            result['success'] = False
+            result['error'] = f"write: {type(e).__name__}: {e}"
+            print(f"Failed to write {output_path}: {e}")
+            return
+        result['output_bytes'] += stats['bytes']
+        result['encode_time'] += stats['encode_time']
+        print(f"Translated image saved as '{stats['path']}' "
+              f"({stats['bytes'] / 1024:.0f} KB, encoded in {stats['encode_time']:.2f}s)")
+
+
+def _init_worker(ocr_batch_size, trace, output_format):
+    """Создает движок (и трассировщик) рабочего процесса"""
+    global _worker_engine, _worker_writer
+    _worker_engine = TranslatorEngine(ocr_batch_size=ocr_batch_size)
+    # Страницы уже обрабатываются параллельно, файл пишется в том же процессе
+    _worker_writer = OutputWriter(output_format, workers=0)
+    if trace:
+        set_tracer(Tracer())
+
+
+def _run_page(index, image_path, output_dir, tile_height, project_dir, targets):
+    """Обрабатывает страницу в рабочем процессе, перехватывая вывод"""
+    log = io.StringIO()
+    result = _new_result(index, image_path)
+    counters = _page_counters(_worker_engine)
+    start = time.perf_counter()
+
+    with contextlib.redirect_stdout(log), get_tracer().page(image_path):
+        try:
+            # В процессах нет ни окна предпросмотра, ни ввода с клавиатуры
+            _set_outputs(result, translate_page(image_path, output_dir, auto_translate=True,
+                                                engine=_worker_engine, tile_height=tile_height,
+                                                writer=_worker_writer, project_dir=project_dir, targets=targets))
+            result['success'] = True
+            _finish_write(result, _worker_writer)
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+
+    result['elapsed'] = time.perf_counter() - start
+    result['log'] = log.getvalue()
+    # События трассы передаются в главный процесс вместе с результатом
+    result['trace'] = get_tracer().drain()
+    _count_page_counters(result, _worker_engine, counters)
+    return result
+
+
+def _run_sequential(images, output_dir, auto_translate, engine, on_result, tile_height, preview, writer,
+                    project_dir, targets):
+    """Обрабатывает страницы по очереди в текущем процессе, файлы пишутся в фоне"""
+    observer = BubblePreview() if preview else None
+    results = []
+    # Страницы, ожидающие записи файла; отдаются в on_result по порядку
+    waiting = deque()
+
+    def flush(block):
+        while waiting and (block or not waiting[0]['success'] or all(map(writer.done, _output_paths(waiting[0])))):
+            result = waiting.popleft()
+            _finish_write(result, writer)
+            if on_result:
+                on_result(result)
+
+    for i, image_path in enumerate(images, 1):
+        print(f"\nProcessing image {i}/{len(images)}: {image_path}")
+        result = _new_result(i, image_path)
+        counters = _page_counters(engine)
+        start = time.perf_counter()
+        try:
+            with get_tracer().page(image_path):
+                _set_outputs(result, translate_page(image_path, output_dir, auto_translate, engine=engine,
+                                                    observer=observer, tile_height=tile_height,
+                                                    writer=writer, project_dir=project_dir, targets=targets))
+            result['success'] = True
+            print(f"Successfully processed {image_path}")
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            print(f"Error processing {image_path}: {e}")
+            print(f"Failed to process {image_path}")
+        result['elapsed'] = time.perf_counter() - start
+        _count_page_counters(result, engine, counters)
+        waiting.append(result)
+        results.append(result)
+        flush(block=False)
+
+    flush(block=True)
+    return results
+
+
+def _run_parallel(images, output_dir, workers, ocr_batch_size, on_result, tile_height, output_format,
+                  project_dir, targets):
+    """Распределяет страницы по пулу процессов, результаты возвращаются в порядке страниц"""
+    results = []
+    tracer = get_tracer()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(ocr_batch_size, tracer.enabled, output_format)) as executor:
+        futures = [executor.submit(_run_page, i, image_path, output_dir, tile_height, project_dir, targets)
+                   for i, image_path in enumerate(images, 1)]
+
+        for i, (image_path, future) in enumerate(zip(images, futures), 1):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Падение самого рабочего процесса не должно останавливать остальные страницы
+                result = _new_result(i, image_path)
+                result['error'] = f"Worker failed: {type(e).__name__}: {e}"
+
+            if result['trace']:
+                tracer.merge(result['trace'])
+            status = 'done' if result['success'] else 'FAILED'
+            print(f"[{i}/{len(images)}] {status} {image_path} ({result['elapsed']:.1f}s)")
+            if on_result:
+                on_result(result)
+            results.append(result)
+    return results
+
+
+def _chapter_stages(output_dir, engine, tile_height, stage_workers, writer, project_dir=None, targets=None):
+    """
+    Стадии конвейера главы поверх методов MangaTranslator
+
+    С targets страница стирается один раз, а перевод, отрисовка и запись
+    выполняются для каждого языка.
+    """
+    workers = dict(STAGE_WORKERS, **(stage_workers or {}))
+    tile_height = TILE_HEIGHT if tile_height is None else tile_height
+    tracer = get_tracer()
+
+    def load(image_path):
+        state = {'image_path': image_path, 'start': time.perf_counter(),
+                 'output_path': None if targets else output_path_for(image_path, output_dir, writer),
+                 'outputs': target_paths_for(image_path, output_dir, targets, writer) if targets else {},
+                 'page': None, 'text_blocks': [], 'translations': {}, 'renders': {}, 'saved': False,
+                 # Счетчики страницы собираются всеми ее стадиями, как в tracer.page()
+                 'counters': defaultdict(int)}
+        if tile_height and image_height(image_path) > tile_height:
+            state['tiled'] = True
+            return state
+        with tracer.bind(image_path, state['counters']), tracer.span('load'):
+            state['page'] = engine.page(image_path)
+        return state
+
+    def detect(state):
+        with tracer.bind(state['image_path'], state['counters']):
+            if state.get('tiled'):
+                # Полосы ленты обрабатываются целиком в этой стадии
+                for target_lang, output_path in (state['outputs'] or {None: state['output_path']}).items():
+                    translate_strip(state['image_path'], output_path, engine, True,
+                                    tile_height=tile_height, writer=writer, target_lang=target_lang)
+                state['saved'] = True
+            else:
+                state['text_blocks'] = state['page'].process_bubbles()
+                state['ocr_calls_avoided'] = state['page'].ocr_calls_avoided
+        return state
+
+    def translate(state):
+        if state['text_blocks'] and not state['saved']:
+            with tracer.bind(state['image_path'], state['counters']):
+                if targets:
+                    state['translations'] = {target_lang: state['page'].translate_blocks(state['text_blocks'],
+                                                                                         target_lang)
+                                             for target_lang in targets}
+                else:
+                    state['translations'] = state['page'].translate_blocks(state['text_blocks'])
+                state['translation_failures'] = state['page'].translation_failures
+        return state
+
+    def render(state):
+        if not state['saved']:
+            with tracer.bind(state['image_path'], state['counters']):
+                if targets:
+                    blocks = state['page'].erase_text_blocks(state['text_blocks'])
+                    for target_lang in targets:
+                        image = state['page'].render_language(blocks, state['translations'].get(target_lang, {}))
+                        state['renders'][target_lang] = (image, state['page'].rendered_blocks)
+                elif state['text_blocks']:
+                    state['page'].apply_translations(state['text_blocks'], state['translations'], auto_mode=True)
+                else:
+                    print("No text blocks found!")
+        return state
+
+    def encode(state):
+        if not state['saved']:
+            with tracer.bind(state['image_path'], state['counters']):
+                page = state['page']
+                for i, (target_lang, (image, rendered_blocks)) in enumerate(state['renders'].items()):
+                    output_path = state['outputs'][target_lang]
+                    page.output_image, page.rendered_blocks = image, rendered_blocks
+                    page.save_result(output_path, writer)
+                    if project_dir:
+                        save_page_project(page, output_path, os.path.join(project_dir, target_lang),
+                                          writer.output_format, clean_plate_path_for(output_path, project_dir),
+                                          write_clean_plate=i == 0)
+                if not targets:
+                    page.save_result(state['output_path'], writer)
+                    if project_dir:
+                        save_page_project(page, state['output_path'], project_dir, writer.output_format)
+            state['saved'] = True
+        # Страница больше не нужна, буферы изображения освобождаются
+        state['page'] = None
+        tracer.finish_page(state['image_path'], state['start'], state['counters'])
+        state['traced'] = True
+        return state
+
+    return [Stage(name, func, workers[name]) for name, func in
+            [('load', load), ('detect', detect), ('translate', translate),
+             ('render', render), ('encode', encode)]]
+
+
+def _run_pipelined(images, output_dir, engine, on_result, tile_height, stage_workers, queue_size, output_format,
+                   project_dir, targets, archives):
+    """Обрабатывает страницы конвейером стадий в потоках текущего процесса"""
+    # Кодирование - отдельная стадия со своими потоками, запись в ее потоке
+    writer = OutputWriter(output_format, workers=0, archives=archives)
+    pipeline = Pipeline(_chapter_stages(output_dir, engine, tile_height, stage_workers, writer, project_dir,
+                                        targets),
+                        PIPELINE_QUEUE_SIZE if queue_size is None else queue_size)
+    results = []
+    start = time.perf_counter()
+
+    with contextlib.closing(pipeline.run(images)) as outputs:
+        for index, state, error in outputs:
+            result = _new_result(index + 1, images[index])
+            if isinstance(state, dict):
+                result['elapsed'] = time.perf_counter() - state['start']
+                result['ocr_calls_avoided'] = state.get('ocr_calls_avoided', 0)
+                result['translation_failures'] = state.get('translation_failures', 0)
+                if not state.get('traced'):
+                    # Страница упала до стадии кодирования: событие страницы пишется здесь
+                    get_tracer().finish_page(state['image_path'], state['start'], state['counters'])
+            else:
+                # Страница не загрузилась, время начала неизвестно
+                get_tracer().finish_page(images[index], time.perf_counter(), {})
+            if error is None:
+                _set_outputs(result, state['outputs'] or state['output_path'])
+                result['success'] = True
+                _finish_write(result, writer)
+            else:
+                stage, e = error
+                result['error'] = f"{stage}: {type(e).__name__}: {e}"
+
+            status = 'done' if result['success'] else 'FAILED'
+            print(f"[{result['index']}/{len(images)}] {status} {result['image_path']} ({result['elapsed']:.1f}s)")
+            if on_result:
+                on_result(result)
+            results.append(result)
+
+    print(f"Pipeline wall time {time.perf_counter() - start:.1f}s")
+    return results
+
+
+def run_chapter(images, output_dir, auto_translate=False, workers=1, engine=None, ocr_batch_size=None,
+                on_result=None, tile_height=None, preview=False, pipelined=False, stage_workers=None,
+                queue_size=None, output_format=None, output_workers=None, project_dir=None, targets=None,
+                archives=None):
+    """
+    Переводит все страницы главы
+
+    Args:
+        images: Пути к страницам в порядке чтения
+        output_dir: Директория для результатов
+        auto_translate: Переводить без подтверждения
+        workers: Количество рабочих процессов (1 - в текущем процессе)
+        engine: Движок для последовательного режима
+        ocr_batch_size: Размер батча OCR для движков рабочих процессов
+        on_result: Вызывается для результата каждой страницы по порядку
+        tile_height: Высота полосы для длинных страниц (вебтунов)
+        preview: Показывать окно с текущим пузырем (только в текущем процессе)
+        pipelined: Обрабатывать страницы конвейером стадий (только автоматический режим)
+        stage_workers: Потоки стадий конвейера, например {'translate': 4}
+        queue_size: Размер очередей между стадиями конвейера
+        output_format: OutputFormat результатов (по умолчанию из переменных окружения)
+        output_workers: Потоки фоновой записи результатов в последовательном режиме
+        project_dir: Директория проектов страниц для повторной отрисовки без моделей
+        targets: Языки перевода; страница детектируется, распознается и стирается
+                 один раз, результаты пишутся в output_dir/<язык>/ (только автоматический режим)
+        archives: {директория результатов: ArchiveWriter} - страницы пишутся в архивы
+                  по мере готовности (в текущем процессе, без workers)
+
+    Returns:
+        Список результатов по страницам в исходном порядке
+    """
+    for target_lang in targets or []:
+        os.makedirs(os.path.join(output_dir, target_lang), exist_ok=True)
+    if archives and workers > 1 and not pipelined:
+        raise ValueError("Archive output is written by one process, use the pipeline instead of workers")
+
+    if pipelined:
+        engine = engine or TranslatorEngine(ocr_batch_size=ocr_batch_size)
+        return _run_pipelined(images, output_dir, engine, on_result, tile_height, stage_workers, queue_size,
+                              output_format, project_dir, targets, archives)
+
+    if workers <= 1:
+        engine = engine or TranslatorEngine(ocr_batch_size=ocr_batch_size)
+        writer_args = {} if output_workers is None else {'workers': output_workers}
+        with OutputWriter(output_format, archives=archives, **writer_args) as writer:
+            return _run_sequential(images, output_dir, auto_translate, engine, on_result, tile_height, preview,
+                                   writer, project_dir, targets)
+
+    return _run_parallel(images, output_dir, workers, ocr_batch_size, on_result, tile_height, output_format,
+                         project_dir, targets)
+
+
+def print_summary(results):
+    """Печатает итог по главе со списком неудачных страниц"""
+    failed = [r for r in results if not r['success']]
+    total_time = sum(r['elapsed'] for r in results)
+    print(f"\nProcessed {len(results) - len(failed)}/{len(results)} pages "
+          f"(page time {total_time:.1f}s)")
+
+    hits = sum(r['cache_hits'] for r in results)
+    misses = sum(r['cache_misses'] for r in results)
+    if hits or misses:
+        print(f"Translation cache: {hits} hits, {misses} misses")
+
+    ocr_hits = sum(r['ocr_cache_hits'] for r in results)
+    ocr_misses = sum(r['ocr_cache_misses'] for r in results)
+    if ocr_hits or ocr_misses:
+        print(f"OCR cache: {ocr_hits} hits, {ocr_misses} misses "
+              f"(hit rate {ocr_hits / (ocr_hits + ocr_misses):.0%})")
+
+    avoided = sum(r['ocr_calls_avoided'] for r in results)
+    if avoided:
+        print(f"Overlap suppression: {avoided} bubble candidates merged or dropped before OCR")
+
+    output_bytes = sum(r['output_bytes'] for r in results)
+    if output_bytes:
+        print(f"Output: {output_bytes / (1024 * 1024):.1f} MB written, "
+              f"encode time {sum(r['encode_time'] for r in results):.1f}s")
+
+    untranslated = sum(r['translation_failures'] for r in results)
+    if untranslated:
+        print(f"WARNING: {untranslated} texts were left untranslated after retries (see page logs)")
+
+    if failed:
+        print("Failed pages:")
+        for result in failed:
+            print(f"  {result['index']}. {result['image_path']}: {result['error']}")
+            # Последние строки вывода страницы помогают понять причину
+            for line in result['log'].strip().splitlines()[-5:]:
+                print(f"       {line}")
@@ -0,0 +1,760 @@
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# .env читается до констант ниже и до импорта модулей пакета: они читают окружение при импорте
+load_dotenv()
+
+from .archive import ARCHIVE_EXTENSIONS, is_archive, list_images
+
+SERVICE_DB_PATH = os.getenv('SERVICE_DB_PATH', os.path.join('saved', 'service_jobs.sqlite3'))
+SERVICE_INBOX = os.getenv('SERVICE_INBOX', 'inbox')
+SERVICE_OUTPUT_DIR = os.getenv('SERVICE_OUTPUT_DIR', 'service_output')
+SERVICE_HOST = os.getenv('SERVICE_HOST', '127.0.0.1')
+SERVICE_PORT = int(os.getenv('SERVICE_PORT', 8765))
+# Страниц (из любых заданий) в одном общем батче OCR
+SERVICE_BATCH_PAGES = int(os.getenv('SERVICE_BATCH_PAGES', 4))
+# Период опроса входящей директории и пустой очереди, секунды
+SERVICE_POLL_INTERVAL = float(os.getenv('SERVICE_POLL_INTERVAL', 1.0))
+# Окно, за которое считается текущая производительность, секунды
+THROUGHPUT_WINDOW = 300
+
+# Принятые и отклоненные файлы входящей директории; скрытые директории не сканируются
+ACCEPTED_DIR = '.accepted'
+REJECTED_DIR = '.rejected'
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+
+class JobQueue:
+    """
+    Постоянная очередь заданий перевода в SQLite.
+
+    Задание - глава (директория или архив); при постановке в очередь ее
+    страницы записываются отдельными строками, поэтому после перезапуска
+    службы продолжаются только необработанные страницы. Страницы выдаются
+    по убыванию приоритета задания, затем по порядку постановки, так что
+    батч может включать конец одного задания и начало следующего.
+    """
+
+    def __init__(self, path=SERVICE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: команды submit и status других процессов работают во время обработки
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                input_path TEXT NOT NULL,
+                output_dir TEXT NOT NULL,
+                targets TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                source TEXT NOT NULL,
+                status TEXT NOT NULL,
+                pages_total INTEGER NOT NULL,
+                pages_done INTEGER NOT NULL DEFAULT 0,
+                pages_failed INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                started REAL,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                job_id INTEGER NOT NULL,
+                page_index INTEGER NOT NULL,
+                image_path TEXT NOT NULL,
+                status TEXT NOT NULL,
+                outputs TEXT,
+                elapsed REAL,
+                error TEXT,
+                PRIMARY KEY (job_id, page_index)
+            );
+            CREATE INDEX IF NOT EXISTS pages_status ON pages (status);
+        ''')
+        self._conn.commit()
+
+    def submit(self, input_path, output_dir=None, priority=0, targets=None, source='cli'):
+        """
+        Ставит главу в очередь
+
+        Args:
+            input_path: Директория страниц или архив .cbz/.zip
+            output_dir: Директория результатов (по умолчанию SERVICE_OUTPUT_DIR/<номер>_<имя>)
+            priority: Задания с большим приоритетом обрабатываются раньше
+            targets: Языки перевода (None - DEFAULT_TARGET_LANG)
+
+        Returns:
+            Номер задания
+        """
+        input_path = os.path.abspath(input_path)
+        if not os.path.isdir(input_path) and not is_archive(input_path):
+            raise ValueError(f"Input must be a directory or a .cbz/.zip archive: {input_path}")
+        images = list_images(input_path)
+        if not images:
+            raise ValueError(f"No images found in {input_path}")
+
+        # Пути абсолютные: служба может работать в другой директории, чем отправитель
+        output_dir = os.path.abspath(output_dir) if output_dir else None
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO jobs (input_path, output_dir, targets, priority, source, status, pages_total, created) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (input_path, output_dir or '', json.dumps(targets) if targets else None, int(priority), source,
+                 'queued', len(images), now)
+            )
+            job_id = cursor.lastrowid
+            if not output_dir:
+                name = os.path.splitext(os.path.basename(input_path.rstrip(os.sep)))[0]
+                output_dir = os.path.abspath(os.path.join(SERVICE_OUTPUT_DIR, f"{job_id:05d}_{name}"))
+                self._conn.execute('UPDATE jobs SET output_dir = ? WHERE id = ?', (output_dir, job_id))
+            self._conn.executemany(
+                'INSERT INTO pages (job_id, page_index, image_path, status) VALUES (?, ?, ?, ?)',
+                [(job_id, i, image_path, 'queued') for i, image_path in enumerate(images, 1)]
+            )
+            self._conn.commit()
+        return job_id
+
+    def recover(self):
+        """Возвращает в очередь страницы, прерванные остановкой службы; Returns: их число"""
+        with self._lock:
+            count = self._conn.execute("UPDATE pages SET status = 'queued' WHERE status = 'running'").rowcount
+            self._conn.commit()
+        return count
+
+    def next_pages(self, limit):
+        """
+        Забирает до limit страниц из очереди и отмечает их как обрабатываемые
+
+        Returns:
+            Список словарей страницы с полями задания (output_dir, targets)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.job_id, p.page_index, p.image_path, j.output_dir, j.targets FROM pages p "
+                "JOIN jobs j ON j.id = p.job_id WHERE p.status = 'queued' AND j.status IN ('queued', 'running') "
+                "ORDER BY j.priority DESC, j.id, p.page_index LIMIT ?",
+                (limit,)
+            ).fetchall()
+            if not rows:
+                return []
+            self._conn.executemany("UPDATE pages SET status = 'running' WHERE job_id = ? AND page_index = ?",
+                                   [(row['job_id'], row['page_index']) for row in rows])
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'running', started = COALESCE(started, ?) WHERE id = ? AND status = 'queued'",
+                [(time.time(), job_id) for job_id in {row['job_id'] for row in rows}]
+            )
+            self._conn.commit()
+        return [{'job_id': row['job_id'], 'index': row['page_index'], 'image_path': row['image_path'],
+                 'output_dir': row['output_dir'], 'targets': json.loads(row['targets']) if row['targets'] else None}
+                for row in rows]
+
+    def finish_page(self, job_id, index, outputs=None, error=None, elapsed=0.0):
+        """
+        Записывает результат страницы; задание без оставшихся страниц завершается
+
+        Returns:
+            Новый статус задания, если оно завершилось, иначе None
+        """
+        with self._lock:
+            self._conn.execute(
+                'UPDATE pages SET status = ?, outputs = ?, elapsed = ?, error = ? WHERE job_id = ? AND page_index = ?',
+                ('failed' if error else 'done', json.dumps(outputs) if outputs else None, elapsed, error,
+                 job_id, index)
+            )
+            counter = 'pages_failed' if error else 'pages_done'
+            self._conn.execute(f'UPDATE jobs SET {counter} = {counter} + 1 WHERE id = ?', (job_id,))
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM pages WHERE job_id = ? AND status IN ('queued', 'running')", (job_id,)
+            ).fetchone()[0]
+            status = None
+            if not remaining:
+                job = self._conn.execute('SELECT status, pages_failed FROM jobs WHERE id = ?', (job_id,)).fetchone()
+                if job['status'] != 'cancelled':
+                    status = 'failed' if job['pages_failed'] else 'done'
+                    self._conn.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ?',
+                                       (status, time.time(), job_id))
+            self._conn.commit()
+        return status
+
+    def cancel(self, job_id):
+        """Отменяет задание: страницы в очереди не обрабатываются; Returns: было ли задание активно"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id)
+            )
+            self._conn.execute("UPDATE pages SET status = 'cancelled' WHERE job_id = ? AND status = 'queued'",
+                               (job_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def _job_dict(self, row):
+        job = dict(row)
+        job['targets'] = json.loads(job['targets']) if job['targets'] else None
+        end = job['finished'] or time.time()
+        finished_pages = job['pages_done'] + job['pages_failed']
+        job['elapsed'] = end - job['started'] if job['started'] else 0.0
+        job['pages_per_minute'] = finished_pages * 60 / job['elapsed'] if job['elapsed'] else 0.0
+        return job
+
+    def job(self, job_id, pages=False):
+        """Задание со счетчиками (и страницами при pages=True) или None"""
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._job_dict(row)
+            if pages:
+                job['pages'] = []
+                for page in self._conn.execute('SELECT * FROM pages WHERE job_id = ? ORDER BY page_index',
+                                               (job_id,)):
+                    page = dict(page)
+                    page['outputs'] = json.loads(page['outputs']) if page['outputs'] else None
+                    job['pages'].append(page)
+        return job
+
+    def jobs(self, limit=50, status=None):
+        """Последние задания, новые первыми"""
+        query = 'SELECT * FROM jobs'
+        params = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY id DESC LIMIT ?', params + [limit]).fetchall()
+            return [self._job_dict(row) for row in rows]
+
+    def counts(self):
+        """Число заданий по статусам и страниц в очереди"""
+        with self._lock:
+            jobs = dict(self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+            queued_pages = self._conn.execute(
+                "SELECT COUNT(*) FROM pages p JOIN jobs j ON j.id = p.job_id "
+                "WHERE p.status = 'queued' AND j.status IN ('queued', 'running')"
+            ).fetchone()[0]
+        return {'jobs': {status: jobs.get(status, 0) for status in JOB_STATUSES}, 'queued_pages': queued_pages}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _entry_signature(path):
+    """Размер и время изменения файла или содержимого директории: пока они меняются, копирование не закончено"""
+    if os.path.isfile(path):
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime)
+    signature = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            stat = os.stat(os.path.join(root, file))
+            signature.append((file, stat.st_size, stat.st_mtime))
+    return tuple(sorted(signature))
+
+
+class InboxWatcher:
+    """
+    Входящая директория: каждая глава, положенная в нее, становится заданием.
+
+    Глава - архив .cbz/.zip или директория со страницами; файл задания
+    *.json ({"input": путь, "priority": 0, "targets": ["en"], "output": путь})
+    задает параметры явно. Элемент принимается, когда его размер и время
+    изменения не менялись между двумя опросами (копирование закончено),
+    после чего переносится в .accepted (или .rejected при ошибке).
+    """
+
+    def __init__(self, inbox_dir, queue, priority=0, targets=None):
+        self.inbox_dir = inbox_dir
+        self.queue = queue
+        self.priority = priority
+        self.targets = targets
+        self._seen = {}
+        os.makedirs(os.path.join(inbox_dir, ACCEPTED_DIR), exist_ok=True)
+        os.makedirs(os.path.join(inbox_dir, REJECTED_DIR), exist_ok=True)
+
+    def _move(self, path, directory):
+        target = os.path.join(self.inbox_dir, directory, os.path.basename(path))
+        if os.path.exists(target):
+            stem, extension = os.path.splitext(os.path.basename(path))
+            target = os.path.join(self.inbox_dir, directory, f"{stem}_{int(time.time() * 1000)}{extension}")
+        shutil.move(path, target)
+        return target
+
+    def _submit(self, path):
+        if path.lower().endswith('.json'):
+            with open(path, encoding='utf-8') as f:
+                spec = json.load(f)
+            job_id = self.queue.submit(spec['input'], spec.get('output'), spec.get('priority', self.priority),
+                                       spec.get('targets', self.targets), source='inbox')
+            self._move(path, ACCEPTED_DIR)
+        else:
+            # Глава переносится до постановки в очередь: задание ссылается на ее новое место
+            accepted = self._move(path, ACCEPTED_DIR)
+            try:
+                job_id = self.queue.submit(accepted, priority=self.priority, targets=self.targets, source='inbox')
+            except Exception:
+                self._move(accepted, REJECTED_DIR)
+                raise
+        return job_id
+
+    def poll(self):
+        """Ставит в очередь готовые элементы; Returns: номера новых заданий"""
+        submitted = []
+        entries = set()
+        for name in sorted(os.listdir(self.inbox_dir)):
+            path = os.path.join(self.inbox_dir, name)
+            if name.startswith('.') or not (os.path.isdir(path)
+                                            or name.lower().endswith(ARCHIVE_EXTENSIONS + ('.json',))):
+                continue
+            entries.add(path)
+            try:
+                signature = _entry_signature(path)
+            except OSError:
+                continue
+            if self._seen.get(path) != signature:
+                self._seen[path] = signature
+                continue
+
+            del self._seen[path]
+            try:
+                job_id = self._submit(path)
+                print(f"Inbox: queued job {job_id} from {name}")
+                submitted.append(job_id)
+            except Exception as e:
+                print(f"Inbox: rejected {name}: {type(e).__name__}: {e}")
+                if os.path.exists(path):
+                    self._move(path, REJECTED_DIR)
+
+        # Элементы, убранные из директории до принятия, забываются
+        for path in set(self._seen) - entries:
+            del self._seen[path]
+        return submitted
+
+
+class TranslationService:
+    """
+    Служба перевода с прогретыми моделями.
+
+    Один TranslatorEngine на все время работы: модели, кэши переводов и OCR
+    и клиент бэкенда перевода общие для всех заданий. Страницы забираются
+    из JobQueue пачками до batch_pages и распознаются одним общим батчем
+    OCR, даже если принадлежат разным заданиям. Перевод страниц пачки идет
+    параллельно, отрисовка и запись - как в пакетном режиме.
+    """
+
+    def __init__(self, queue, engine=None, batch_pages=SERVICE_BATCH_PAGES, output_format=None,
+                 poll_interval=SERVICE_POLL_INTERVAL, inbox=None):
+        # Модели и OpenCV загружаются только при запуске службы, не для команд submit и status
+        from .output import OutputWriter
+        from .translator import TranslatorEngine
+
+        self.queue = queue
+        self.engine = engine or TranslatorEngine()
+        self.batch_pages = max(1, batch_pages)
+        self.writer = OutputWriter(output_format)
+        self.poll_interval = poll_interval
+        self.inbox = inbox
+        self._translate_pool = ThreadPoolExecutor(self.batch_pages, thread_name_prefix='page-translate')
+        self._stop = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.started = time.time()
+        self.pages_done = 0
+        self.pages_failed = 0
+        self.batches = 0
+        self.batch_jobs = 0
+        self.bubbles = 0
+        # (время завершения, страниц) последних пачек для текущей производительности
+        self._recent = deque()
+
+    def stop(self):
+        self._stop.set()
+
+    def _page_outputs(self, item):
+        from .runner import output_path_for, target_paths_for
+
+        if item['targets']:
+            for lang in item['targets']:
+                os.makedirs(os.path.join(item['output_dir'], lang), exist_ok=True)
+            return target_paths_for(item['image_path'], item['output_dir'], item['targets'], self.writer)
+        os.makedirs(item['output_dir'], exist_ok=True)
+        return output_path_for(item['image_path'], item['output_dir'], self.writer)
+
+    def _detect(self, items):
+        """
+        Загружает страницы пачки и распознает их пузыри одним батчем OCR
+
+        Модели не потокобезопасны, поэтому все, что вызывает детекцию и OCR
+        (и ленты, обрабатываемые полосами целиком), выполняется здесь, в
+        потоке службы.
+        """
+        from .runner import translate_page
+        from .tiling import TILE_HEIGHT, image_height
+
+        batched = []
+        for item in items:
+            if item['error'] is not None:
+                continue
+            try:
+                if TILE_HEIGHT and image_height(item['image_path']) > TILE_HEIGHT:
+                    # Ленты обрабатываются полосами целиком через translate_page
+                    item['tiled'] = True
+                    translate_page(item['image_path'], item['output_dir'], True, engine=self.engine,
+                                   writer=self.writer, targets=item['targets'])
+                    continue
+                item['page'] = self.engine.page(item['image_path'])
+                batched.append(item)
+            except Exception as e:
+                item['error'] = f"{type(e).__name__}: {e}"
+
+        try:
+            blocks = self.engine.process_pages([item['page'] for item in batched])
+        except Exception:
+            # Ошибка одной страницы не должна ронять пачку: страницы распознаются по одной
+            blocks = []
+            for item in batched:
+                try:
+                    blocks.append(item['page'].process_bubbles())
+                except Exception as e:
+                    item['error'] = f"{type(e).__name__}: {e}"
+                    blocks.append(None)
+        for item, text_blocks in zip(batched, blocks):
+            item['text_blocks'] = text_blocks
+
+    def _translate(self, item):
+        """Переводит блоки страницы на языки задания (без вызовов моделей)"""
+        if item.get('tiled'):
+            return
+        page, text_blocks = item['page'], item['text_blocks']
+        if item['targets']:
+            item['translations'] = {lang: page.translate_blocks(text_blocks, lang) for lang in item['targets']}
+        else:
+            item['translations'] = page.translate_blocks(text_blocks) if text_blocks else {}
+
+    def _render(self, item):
+        """Стирает текст, рисует переводы и ставит файлы в очередь записи"""
+        from .runner import render_targets
+
+        if item.get('tiled'):
+            return
+        page = item['page']
+        if item['targets']:
+            render_targets(page, item['text_blocks'], item['translations'], item['outputs'], self.writer)
+        else:
+            if item['text_blocks']:
+                page.apply_translations(item['text_blocks'], item['translations'], auto_mode=True)
+            page.save_result(item['outputs'], self.writer)
+
+    def process_batch(self, items):
+        """
+        Обрабатывает пачку страниц из очереди
+
+        Returns:
+            Список результатов страниц в формате runner
+        """
+        from .runner import _finish_write, _new_result, _set_outputs
+
+        start = time.perf_counter()
+        for item in items:
+            item['error'] = None
+            try:
+                item['outputs'] = self._page_outputs(item)
+            except OSError as e:
+                item['error'] = f"{type(e).__name__}: {e}"
+
+        self._detect(items)
+        bubbles = sum(len(item.get('text_blocks') or []) for item in items)
+
+        # Перевод ждет сеть: страницы пачки переводятся параллельно через общий клиент
+        def translate(item):
+            if item['error'] is None:
+                try:
+                    self._translate(item)
+                except Exception as e:
+                    item['error'] = f"{type(e).__name__}: {e}"
+
+        list(self._translate_pool.map(translate, items))
+
+        results = []
+        for item in items:
+            result = _new_result(item['index'], item['image_path'])
+            if item['error'] is None:
+                try:
+                    self._render(item)
+                    _set_outputs(result, item['outputs'])
+                    result['success'] = True
+                    _finish_write(result, self.writer)
+                except Exception as e:
+                    item['error'] = f"{type(e).__name__}: {e}"
+            if item['error'] is not None:
+                result['success'] = False
+                result['error'] = item['error']
+                print(f"Failed to process {item['image_path']}: {item['error']}")
+            result['elapsed'] = time.perf_counter() - start
+            results.append(result)
+
+            outputs = result['outputs'] or ({None: result['output_path']} if result['output_path'] else None)
+            status = self.queue.finish_page(item['job_id'], item['index'],
+                                            {lang or '': path for lang, path in outputs.items()}
+                                            if result['success'] else None,
+                                            result['error'], result['elapsed'])
+            if status:
+                job = self.queue.job(item['job_id'])
+                print(f"Job {item['job_id']} {status}: {job['pages_done']}/{job['pages_total']} pages "
+                      f"in {job['elapsed']:.1f}s ({job['pages_per_minute']:.1f} pages/min)")
+
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.batches += 1
+            self.batch_jobs += len({item['job_id'] for item in items})
+            self.bubbles += bubbles
+            succeeded = sum(result['success'] for result in results)
+            self.pages_done += succeeded
+            self.pages_failed += len(results) - succeeded
+            self._recent.append((time.time(), len(results)))
+        print(f"Batch: {len(items)} pages from {len({item['job_id'] for item in items})} jobs, "
+              f"{bubbles} bubbles, {elapsed:.1f}s")
+        return results
+
+    def stats(self):
+        """Состояние очереди, производительность и кэши службы"""
+        from .translator import get_ocr_cache, get_translation_cache
+
+        now = time.time()
+        with self._stats_lock:
+            while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW:
+                self._recent.popleft()
+            recent_pages = sum(pages for _, pages in self._recent)
+            window = min(THROUGHPUT_WINDOW, now - self.started)
+            stats = {
+                'uptime': now - self.started,
+                'pages_done': self.pages_done,
+                'pages_failed': self.pages_failed,
+                'batches': self.batches,
+                'jobs_per_batch': self.batch_jobs / self.batches if self.batches else 0.0,
+                'bubbles_per_batch': self.bubbles / self.batches if self.batches else 0.0,
+                'pages_per_minute': recent_pages * 60 / window if window > 0 else 0.0,
+                'ocr_calls_avoided': self.engine.ocr_calls_avoided,
+                'translation_failures': self.engine.translation_failures
+            }
+        stats.update(self.queue.counts())
+        for name, cache in (('translation_cache', get_translation_cache()), ('ocr_cache', get_ocr_cache())):
+            stats[name] = cache.stats() if cache is not None else None
+        return stats
+
+    def run(self):
+        """Обрабатывает очередь, пока не вызван stop"""
+        recovered = self.queue.recover()
+        if recovered:
+            print(f"Re-queued {recovered} pages interrupted by the previous shutdown")
+        self.engine.warm_up()
+        print(f"Service ready: {self.queue.counts()['queued_pages']} pages queued")
+
+        while not self._stop.is_set():
+            if self.inbox is not None:
+                try:
+                    self.inbox.poll()
+                except Exception as e:
+                    print(f"Inbox error: {type(e).__name__}: {e}")
+            items = self.queue.next_pages(self.batch_pages)
+            if not items:
+                self._stop.wait(self.poll_interval)
+                continue
+            self.process_batch(items)
+
+        self._translate_pool.shutdown(wait=True)
+        self.writer.close()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    Локальный HTTP API службы
+
+        POST   /jobs        {"input": путь, "priority": 0, "targets": ["en"], "output": путь}
+        GET    /jobs        последние задания (?status=queued)
+        GET    /jobs/<id>   задание со страницами
+        DELETE /jobs/<id>   отмена задания
+        GET    /status      очередь, производительность и кэши
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'jobs' and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def do_GET(self):
+        queue = self.server.service.queue
+        path, _, query = self.path.partition('?')
+        if path == '/status':
+            self._reply(200, self.server.service.stats())
+        elif path == '/jobs':
+            params = dict(item.partition('=')[::2] for item in query.split('&') if item)
+            if not params.get('limit', '50').isdigit():
+                self._reply(400, {'error': 'limit must be a positive integer'})
+                return
+            self._reply(200, queue.jobs(int(params.get('limit', 50)), params.get('status')))
+        elif self._job_id() is not None:
+            job = queue.job(self._job_id(), pages=True)
+            self._reply(200, job) if job else self._reply(404, {'error': 'job not found'})
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if self.path != '/jobs':
+            self._reply(404, {'error': 'not found'})
+            return
+        try:
+            spec = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not isinstance(spec, dict) or not isinstance(spec.get('input'), str):
+                raise ValueError('expected a JSON object with an "input" path')
+            targets = spec.get('targets')
+            if targets is not None and (not isinstance(targets, list)
+                                        or not all(isinstance(lang, str) for lang in targets)):
+                raise ValueError('"targets" must be a list of language codes')
+            job_id = self.server.service.queue.submit(spec['input'], spec.get('output'), spec.get('priority', 0),
+                                                      spec.get('targets'), source='api')
+        except (KeyError, TypeError, ValueError, OSError) as e:
+            self._reply(400, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self._reply(201, {'id': job_id})
+
+    def do_DELETE(self):
+        job_id = self._job_id()
+        if job_id is None:
+            self._reply(404, {'error': 'not found'})
+        elif self.server.service.queue.cancel(job_id):
+            self._reply(200, {'id': job_id, 'status': 'cancelled'})
+        else:
+            self._reply(409, {'error': 'job is not queued or running'})
+
+
+def start_api(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """Запускает HTTP API службы в фоновом потоке; Returns: сервер (остановка - shutdown())"""
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, name='service-api', daemon=True).start()
+    return server
+
+
+def _parse_targets(value):
+    return [lang.strip() for lang in value.split(',') if lang.strip()] if value else None
+
+
+def _print_job(job):
+    targets = f" [{','.join(job['targets'])}]" if job['targets'] else ''
+    print(f"{job['id']:5}  {job['status']:9}  p{job['priority']:<3} "
+          f"{job['pages_done']}/{job['pages_total']} pages ({job['pages_failed']} failed)  "
+          f"{job['pages_per_minute']:.1f} pages/min  {job['input_path']}{targets} -> {job['output_dir']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translation service: warm models and a persistent job queue')
+    parser.add_argument('--db', default=SERVICE_DB_PATH, help='Job queue database path')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help='Run the service')
+    serve.add_argument('--inbox', default=SERVICE_INBOX, help='Watched directory for chapters and job files')
+    serve.add_argument('--no-inbox', action='store_true', help='Do not watch an inbox directory')
+    serve.add_argument('--host', default=SERVICE_HOST)
+    serve.add_argument('--port', type=int, default=SERVICE_PORT, help='HTTP API port (0 disables the API)')
+    serve.add_argument('--batch-pages', type=int, default=SERVICE_BATCH_PAGES,
+                       help='Pages from any jobs recognized in one shared OCR batch')
+    serve.add_argument('--ocr-batch-size', type=int, default=None)
+    serve.add_argument('--priority', type=int, default=0, help='Priority of chapters dropped into the inbox')
+    serve.add_argument('--targets', type=_parse_targets, default=None,
+                       help='Target languages of chapters dropped into the inbox, e.g. en,ru')
+
+    submit = subparsers.add_parser('submit', help='Queue a chapter')
+    submit.add_argument('input', help='Directory or .cbz/.zip archive')
+    submit.add_argument('--output', default=None, help='Output directory')
+    submit.add_argument('--priority', type=int, default=0)
+    submit.add_argument('--targets', type=_parse_targets, default=None)
+
+    status = subparsers.add_parser('status', help='Show jobs')
+    status.add_argument('job', type=int, nargs='?', help='Show the pages of one job')
+
+    cancel = subparsers.add_parser('cancel', help='Cancel a queued or running job')
+    cancel.add_argument('job', type=int)
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db)
+    if args.command == 'submit':
+        try:
+            job_id = queue.submit(args.input, args.output, args.priority, args.targets)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Queued job {job_id}: {queue.job(job_id)['pages_total']} pages")
+
+    elif args.command == 'status':
+        if args.job is None:
+            counts = queue.counts()
+            print(', '.join(f"{count} {name}" for name, count in counts['jobs'].items()) +
+                  f"; {counts['queued_pages']} pages queued")
+            for job in queue.jobs():
+                _print_job(job)
+        else:
+            job = queue.job(args.job, pages=True)
+            if job is None:
+                parser.error(f"job {args.job} not found")
+            _print_job(job)
+            for page in job['pages']:
+                print(f"  {page['page_index']:4}  {page['status']:9}  {page['image_path']}"
+                      + (f"  {page['error']}" if page['error'] else ''))
+
+    elif args.command == 'cancel':
+        print(f"Job {args.job} cancelled" if queue.cancel(args.job) else f"Job {args.job} is not active")
+
+    elif args.command == 'serve':
+        from .translator import TranslatorEngine
+
+        inbox = None if args.no_inbox else InboxWatcher(args.inbox, queue, args.priority, args.targets)
+        service = TranslationService(queue, TranslatorEngine(ocr_batch_size=args.ocr_batch_size),
+                                     batch_pages=args.batch_pages, inbox=inbox)
+        # SIGTERM планировщика завершает текущую пачку, как и Ctrl+C
+        signal.signal(signal.SIGTERM, lambda *_: service.stop())
+        api = start_api(service, args.host, args.port) if args.port else None
+        if api:
+            print(f"API listening on http://{args.host}:{api.server_address[1]}")
+        try:
+            service.run()
+        except KeyboardInterrupt:
+            print("Stopping: interrupted pages are re-queued on the next start")
+        finally:
+            if api:
+                api.shutdown()
+
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
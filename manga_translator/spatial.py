@@ -0,0 +1,162 @@
+import os
+from collections import defaultdict
+
+import cv2
+
+# Доля точек контура кандидата внутри контура другого, при которой кандидат
+# считается вложенным (0 - не подавлять перекрытия)
+SUPPRESS_OVERLAP = float(os.getenv('SUPPRESS_OVERLAP', 0.85))
+# Отношение площадей контуров, начиная с которого вложенные кандидаты считаются
+# частями одного пузыря; при меньшем внешний кандидат - обертка (фон, промежуток между панелями)
+SIMILAR_AREA = 0.5
+GRID_CELL_SIZE = 128
+
+
+def overlap_ratio(a, b):
+    """Доля пересечения рамок (x, y, w, h) относительно меньшей из них"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x2 <= x1 or y2 <= y1:
+        return 0.0
+    return (x2 - x1) * (y2 - y1) / min(a[2] * a[3], b[2] * b[3])
+
+
+def contained_fraction(inner, outer):
+    """Доля точек контура inner внутри контура outer или на его границе"""
+    points = inner.reshape(-1, 2)
+    inside = sum(cv2.pointPolygonTest(outer, (float(x), float(y)), False) >= 0 for x, y in points)
+    return inside / len(points)
+
+
+def union_bbox(a, b):
+    x, y = min(a[0], b[0]), min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+
+class GridIndex:
+    """
+    Равномерная сетка над рамками (x, y, w, h).
+
+    Рамка регистрируется во всех ячейках, которые она задевает, поэтому
+    запрос проверяет только рамки из соседних ячеек, а не все рамки страницы.
+    """
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.bboxes = {}
+        self._cells = defaultdict(set)
+
+    def _cell_range(self, bbox):
+        x, y, w, h = bbox
+        size = self.cell_size
+        for cx in range(int(x // size), int((x + max(w, 1) - 1) // size) + 1):
+            for cy in range(int(y // size), int((y + max(h, 1) - 1) // size) + 1):
+                yield cx, cy
+
+    def insert(self, key, bbox):
+        """Добавляет рамку или заменяет рамку ключа"""
+        if key in self.bboxes:
+            self.remove(key)
+        self.bboxes[key] = bbox
+        for cell in self._cell_range(bbox):
+            self._cells[cell].add(key)
+
+    def remove(self, key):
+        bbox = self.bboxes.pop(key)
+        for cell in self._cell_range(bbox):
+            self._cells[cell].discard(key)
+
+    def query(self, bbox):
+        """Ключи рамок, пересекающихся с bbox, в порядке добавления"""
+        found = set()
+        for cell in self._cell_range(bbox):
+            found.update(self._cells.get(cell, ()))
+        x, y, w, h = bbox
+        return sorted(key for key in found
+                      if self.bboxes[key][0] < x + w and x < self.bboxes[key][0] + self.bboxes[key][2]
+                      and self.bboxes[key][1] < y + h and y < self.bboxes[key][1] + self.bboxes[key][3])
+
+
+def suppress_overlapping(bboxes, contours, areas, threshold=SUPPRESS_OVERLAP, similar_area=SIMILAR_AREA):
+    """
+    Объединяет и подавляет вложенные кандидаты до OCR
+
+    Кандидаты должны идти по убыванию площади контура. Сетка по рамкам
+    отбирает пары, у которых рамка меньшего почти целиком (threshold) лежит в
+    рамке большего; вложенность проверяется по самим контурам - почти все
+    точки контура меньшего должны лежать внутри контура большего. Рамки
+    неровных контуров (фон, рисунок) накрывают соседние пузыри, поэтому
+    одного пересечения рамок недостаточно. Для вложенного кандидата:
+      - при близких площадях контуров это части или дубликаты одного пузыря:
+        меньший присоединяется к большему, рамка расширяется до объединения;
+      - иначе больший - обертка вокруг пузыря (белый фон, промежуток между
+        панелями) и отбрасывается, пузырь остается.
+
+    Args:
+        bboxes: Рамки (x, y, w, h) кандидатов
+        contours: Контуры OpenCV кандидатов
+        areas: Площади контуров
+
+    Returns:
+        (индексы оставшихся кандидатов по порядку, {индекс: (рамка, присоединенные индексы)},
+         число отброшенных оберток)
+    """
+    index = GridIndex()
+    for i, bbox in enumerate(bboxes):
+        index.insert(i, tuple(bbox))
+    if not threshold:
+        return list(range(len(bboxes))), {}, 0
+
+    merged = {}
+    removed = set()
+    wrappers = 0
+    for i in range(len(bboxes)):
+        if i in removed:
+            continue
+        bbox = tuple(bboxes[i])
+        inside = [j for j in index.query(bbox)
+                  if j > i and j not in removed and overlap_ratio(bbox, bboxes[j]) >= threshold
+                  and contained_fraction(contours[j], contours[i]) >= threshold]
+        if any(areas[j] < similar_area * areas[i] for j in inside):
+            removed.add(i)
+            index.remove(i)
+            wrappers += 1
+            continue
+
+        for j in inside:
+            removed.add(j)
+            bbox = union_bbox(bbox, bboxes[j])
+            index.remove(j)
+        if inside:
+            merged[i] = (bbox, inside)
+
+    kept = [i for i in range(len(bboxes)) if i not in removed]
+    return kept, merged, wrappers
+
+
+def group_nearby(points, max_distance):
+    """
+    Группирует точки (x, y), соседние не дальше max_distance по каждой оси
+
+    Соседи ищутся по сетке с ячейкой max_distance, группы - связные
+    компоненты соседства. Returns: списки индексов групп.
+    """
+    index = GridIndex(max(1, max_distance))
+    parent = list(range(len(points)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, (x, y) in enumerate(points):
+        area = (x - max_distance + 1, y - max_distance + 1, 2 * max_distance - 1, 2 * max_distance - 1)
+        for j in index.query(area):
+            parent[find(j)] = find(i)
+        index.insert(i, (x, y, 1, 1))
+
+    groups = defaultdict(list)
+    for i in range(len(points)):
+        groups[find(i)].append(i)
+    return list(groups.values())
@@ -0,0 +1,90 @@
+import os
+
+from PIL import Image
+
+from .archive import open_page, read_image
+from .output import write_image
+from .spatial import overlap_ratio
+from .translator import get_default_engine
+
+# Страницы выше TILE_HEIGHT обрабатываются полосами (0 - выключено)
+TILE_HEIGHT = int(os.getenv('TILE_HEIGHT', 0))
+TILE_OVERLAP = int(os.getenv('TILE_OVERLAP', 512))
+
+
+def image_height(image_path):
+    """Высота изображения по заголовку файла, без декодирования"""
+    with open_page(image_path) as file, Image.open(file) as image:
+        return image.size[1]
+
+
+def translate_strip(image_path, output_path, engine=None, auto_translate=True, observer=None,
+                    tile_height=None, overlap=None, writer=None, target_lang=None):
+    """
+    Переводит вертикальную ленту (вебтун) перекрывающимися полосами
+
+    Каждая полоса детектируется, распознается и рисуется отдельно, поэтому
+    рабочие буферы (маски, кропы, преобразования цвета) ограничены размером
+    полосы. Сама лента декодируется и кодируется целиком: ни OpenCV, ни PIL
+    не умеют читать PNG/WebP по частям, так что память растет с высотой
+    ленты (3 байта на пиксель плюс закодированный файл). Пузырь принадлежит полосе, если его верх лежит в ее
+    неперекрытой части; пузыри, уже обработанные в предыдущей полосе,
+    отбрасываются как дубликаты на стыке.
+    """
+    engine = engine or get_default_engine()
+    tile_height = tile_height or TILE_HEIGHT
+    overlap = TILE_OVERLAP if overlap is None else overlap
+    if overlap >= tile_height:
+        raise ValueError("Tile overlap must be smaller than tile height")
+    step = tile_height - overlap
+
+    # Лента декодируется один раз и служит буфером результата
+    strip = read_image(image_path)
+    if strip is None:
+        raise ValueError(f"Failed to read image: {image_path}")
+    height = strip.shape[0]
+
+    carry_original = None  # Исходные пиксели зоны перекрытия до отрисовки
+    previous_owned = []    # Рамки пузырей предыдущей полосы в координатах ленты
+
+    for start in range(0, height, step):
+        end = min(start + tile_height, height)
+        last = end == height
+
+        tile_original = strip[start:end].copy()
+        if carry_original is not None:
+            tile_original[:len(carry_original)] = carry_original
+
+        page = engine.page(f"{image_path}@{start}", image=tile_original)
+        # Результат полосы начинается с уже отрисованных пикселей ленты
+        page.output_image = strip[start:end].copy()
+
+        def owns(x, y, w, h):
+            # Пузырь начинается в зоне перекрытия - его обработает следующая полоса
+            if not last and y >= step:
+                return False
+            # Пузырь уже обработан предыдущей полосой
+            bbox = (x, y + start, w, h)
+            return not any(overlap_ratio(bbox, other) > 0.5 for other in previous_owned)
+
+        owned = page.collect_bubble_regions(accept=owns)
+
+        regions = [candidate['region'] for candidate in owned]
+        text_blocks = page.build_text_blocks(owned, engine.recognize_regions(regions))
+        page.translate_and_replace_text(text_blocks, auto_mode=auto_translate, observer=observer,
+                                        target_lang=target_lang)
+
+        if not last:
+            carry_original = tile_original[step:].copy()
+        previous_owned = [(c['x'], c['y'] + start, c['w'], c['h']) for c in owned]
+        strip[start:end] = page.output_image
+
+        if last:
+            break
+
+    if writer is not None:
+        writer.submit(strip, output_path)
+    else:
+        write_image(strip, output_path)
+        print(f"\nTranslated image saved as '{output_path}'")
+    return output_path
@@ -1,16 +1,23 @@
-from inference import get_model
-import supervision as sv
-from paddleocr import PaddleOCR
-from deep_translator import GoogleTranslator
-from PIL import Image, ImageDraw, ImageFont
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-import requests
 import numpy as np
 import re
 import cv2
 import os
 
+from .archive import read_image
+from .backends import get_backend, split_batches
+from .cache import TranslationCache, TRANSLATION_CACHE_PATH, normalize_text
+from .client import get_client
+from .contours import ContourTable
+from .instrumentation import get_tracer
+from .layout import TextLayout, hyphenate_word
+from .ocr import MIN_LINE_CONFIDENCE, parse_ocr_lines, recognize_batched
+from .ocr_cache import OCRCache, OCR_CACHE_PATH
+from .output import write_image
+from .preprocess import TextPreprocessor
+from .preview import BubblePreview
+from .spatial import group_nearby, suppress_overlapping
+
 # Get environment variables
 API_KEY = os.getenv('API_KEY')
 MODEL_ID = os.getenv('MODEL_ID')
@@ -21,6 +28,11 @@ DEFAULT_TARGET_LANG = os.getenv('DEFAULT_TARGET_LANG')
 OCR_LANG = os.getenv('OCR_LANG')
 FONT_PATH = os.getenv('FONT_PATH')
 MAX_FONT_SIZE = int(os.getenv('MAX_FONT_SIZE', 15))
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', 6))
+# Страницы с большей стороной длиннее этого значения детектируются в уменьшенной копии (0 - выключено)
+DETECTION_MAX_SIDE = int(os.getenv('DETECTION_MAX_SIDE', 0))
+# Увеличивается при изменениях, влияющих на результат обработки страницы
+PIPELINE_VERSION = 3
 
 def check_required_env_vars():
     required_vars = ['API_KEY', 'MODEL_ID']
@@ -28,53 +40,269 @@ def check_required_env_vars():
     if missing_vars:
         raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
-def translate_text(text, target_lang=DEFAULT_TARGET_LANG):
-    translator = GoogleTranslator(source='auto', target=target_lang)
-    try:
-        return translator.translate(text)
-    except:
-        return text
+_translation_cache = None
+
+
+def get_translation_cache():
+    """Возвращает общий кэш переводов процесса (None, если кэш отключен)"""
+    global _translation_cache
+    if _translation_cache is None and TRANSLATION_CACHE_PATH:
+        _translation_cache = TranslationCache(TRANSLATION_CACHE_PATH)
+    return _translation_cache
+
+
+_ocr_cache = None
+
+
+def get_ocr_cache():
+    """Возвращает общий кэш OCR процесса (None, если кэш отключен)"""
+    global _ocr_cache
+    if _ocr_cache is None and OCR_CACHE_PATH:
+        _ocr_cache = OCRCache(OCR_CACHE_PATH)
+    return _ocr_cache
+
+
+def translate_batch(texts, target_lang=DEFAULT_TARGET_LANG, source_lang='auto', backend=None, cache=None,
+                    failures=None):
+    """
+    Переводит список строк минимальным числом запросов
+
+    Одинаковые строки переводятся один раз, уже известные переводы берутся
+    из кэша, остальные делятся на пакеты в пределах ограничений бэкенда и
+    отправляются параллельно через общий TranslationClient.
+
+    Args:
+        failures: Словарь, в который записываются {строка: ошибка} для строк,
+                  оставшихся без перевода
+
+    Returns:
+        Список переводов в порядке исходных строк (исходная строка, если перевод не удался)
+    """
+    backend = backend if backend is not None else get_backend()
+    cache = cache or get_translation_cache()
+    tracer = get_tracer()
+
+    normalized = [normalize_text(text) for text in texts]
+    translations = {}
+    missing = []
+
+    for text in dict.fromkeys(normalized):
+        if not text:
+            translations[text] = text
+            continue
+        cached = cache.get(text, source_lang, target_lang, backend.name) if cache is not None else None
+        if cached is not None:
+            translations[text] = cached
+            tracer.count('translation_cache_hits')
+        else:
+            missing.append(text)
+            tracer.count('translation_cache_misses')
+
+    new_entries = []
+    batches = split_batches(missing, backend.max_batch_chars, backend.max_batch_items, backend.separator_length)
+    results = get_client(backend).translate_batches(batches, source_lang, target_lang) if batches else []
+    for batch, (translated, error) in zip(batches, results):
+        for text, result in zip(batch, translated or [None] * len(batch)):
+            if result:
+                translations[text] = result
+                new_entries.append((text, source_lang, target_lang, backend.name, result))
+            else:
+                # Без перевода остается исходный текст; он не кэшируется, а ошибка сообщается
+                translations[text] = text
+                if failures is not None:
+                    failures[text] = error or 'empty translation'
+
+    if cache is not None:
+        cache.set_many(new_entries)
+
+    return [translations[text] for text in normalized]
+
+
+def translate_text(text, target_lang=DEFAULT_TARGET_LANG, cache=None):
+    return translate_batch([text], target_lang, cache=cache)[0]
+
+
+class TranslatorEngine:
+    """
+    Долгоживущий движок перевода: владеет моделями детекции и OCR.
+
+    Модели загружаются лениво при первом обращении и переиспользуются
+    всеми страницами, созданными через этот движок.
+    """
+
+    def __init__(self, ocr_lang=None, model_id=None, api_key=None, ocr=None, model=None,
+                 ocr_batch_size=None, preprocessor=None, ocr_cache=None):
+        self.ocr_lang = ocr_lang or OCR_LANG
+        self.ocr_batch_size = ocr_batch_size or OCR_BATCH_SIZE
+        self.model_id = model_id or MODEL_ID
+        self.api_key = api_key or API_KEY
+        # Готовые модели можно передать извне (например, заглушки в бенчмарках)
+        self._ocr = ocr
+        self._model = model
+        self._env_loaded = False
+        # Состояние предобработки (CLAHE) общее для всех страниц движка
+        self.preprocessor = preprocessor or TextPreprocessor()
+        self._ocr_cache = ocr_cache
+        # Вызовы OCR, которых удалось избежать подавлением перекрытий
+        self.ocr_calls_avoided = 0
+        # Пузыри, оставшиеся без перевода из-за ошибок бэкенда
+        self.translation_failures = 0
+
+    def _load_env(self):
+        """Загружает переменные окружения один раз за время жизни движка"""
+        if not self._env_loaded:
+            load_dotenv()
+            self._env_loaded = True
+
+    @property
+    def model(self):
+        """
+        Модель детекции Roboflow, загружается при первом обращении
+
+        Конвейер находит пузыри по контурам и модель не использует; ключи
+        API нужны только при обращении к ней.
+        """
+        if self._model is None:
+            self._load_env()
+            check_required_env_vars()
+            from inference import get_model
+
+            self._model = get_model(model_id=self.model_id, api_key=self.api_key)
+        return self._model
+
+    @property
+    def ocr(self):
+        """OCR-модель, загружается при первом обращении"""
+        if self._ocr is None:
+            self._load_env()
+            # PaddleOCR импортируется несколько секунд, поэтому только когда нужен OCR
+            from paddleocr import PaddleOCR
+
+            self._ocr = PaddleOCR(
+                use_angle_cls=True,
+                lang=self.ocr_lang,
+                det_db_thresh=0.3,  # Увеличивает чувствительность детектора текста
+                det_db_box_thresh=0.5,  # Порог уверенности для текстовых боксов
+                rec_batch_num=self.ocr_batch_size,  # Размер батча для распознавания
+                use_gpu=True  # Использование GPU если доступно
+            )
+        return self._ocr
+
+    def warm_up(self):
+        """Принудительно загружает OCR заранее (модель детекции конвейером не используется)"""
+        self.ocr
+        return self
+
+    def page(self, image_path, image=None):
+        """Создает страницу, использующую модели этого движка"""
+        return MangaTranslator(image_path, engine=self, image=image)
+
+    @property
+    def ocr_cache(self):
+        """Кэш OCR движка, по умолчанию общий кэш процесса"""
+        return self._ocr_cache if self._ocr_cache is not None else get_ocr_cache()
+
+    def recognize_regions(self, regions):
+        """
+        Распознает список подготовленных областей общими батчами
+
+        Области, похожие на уже распознанные, берутся из кэша OCR без вызова модели.
+        """
+        tracer = get_tracer()
+        cache = self.ocr_cache
+        if cache is None:
+            with tracer.span('ocr', regions=len(regions)):
+                return recognize_batched(self.ocr, regions)
+
+        keys = [cache.key(region, self.ocr_lang) for region in regions]
+        results = cache.lookup(keys)
+        missing = [i for i, lines in enumerate(results) if lines is None]
+        tracer.count('ocr_cache_hits', len(regions) - len(missing))
+        tracer.count('ocr_cache_misses', len(missing))
+
+        if missing:
+            with tracer.span('ocr', regions=len(missing)):
+                recognized = recognize_batched(self.ocr, [regions[i] for i in missing])
+            cache.store([keys[i] for i in missing], recognized)
+            for i, lines in zip(missing, recognized):
+                results[i] = lines
+        return results
+
+    def process_pages(self, pages):
+        """
+        Обрабатывает пузыри окна страниц с общим батчевым распознаванием
+
+        Args:
+            pages: Список объектов MangaTranslator
+
+        Returns:
+            Список отсортированных блоков текста для каждой страницы
+        """
+        candidates = [page.collect_bubble_regions() for page in pages]
+        regions = [c['region'] for page_candidates in candidates for c in page_candidates]
+        recognized = self.recognize_regions(regions)
+
+        results = []
+        offset = 0
+        for page, page_candidates in zip(pages, candidates):
+            page_lines = recognized[offset:offset + len(page_candidates)]
+            offset += len(page_candidates)
+            results.append(page.build_text_blocks(page_candidates, page_lines))
+        return results
+
+
+_default_engine = None
+
+
+def get_default_engine():
+    """Возвращает общий для процесса движок"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TranslatorEngine()
+    return _default_engine
+
 
 class MangaTranslator:
-    def __init__(self, image_path):
+    """Состояние одной страницы: изображение, результат и блоки текста"""
+
+    def __init__(self, image_path, engine=None, image=None):
+        """
+        Args:
+            image_path: Путь к странице (используется и как имя страницы)
+            engine: Движок с моделями, по умолчанию общий движок процесса
+            image: Уже декодированное изображение BGR вместо чтения image_path
+        """
         self.image_path = image_path
-        self.image = cv2.imread(image_path)
+        self.image = read_image(image_path) if image is None else image
+        if self.image is None:
+            raise ValueError(f"Failed to read image: {image_path}")
         self.output_image = self.image.copy()
         self.page_height = self.image.shape[0]
         self.section_height = self.page_height / 3
-        
-        load_dotenv()
-        check_required_env_vars()
-
-        self.model = get_model(model_id=MODEL_ID, api_key=API_KEY)
-        # self.ocr = PaddleOCR(use_angle_cls=True, lang=OCR_LANG)
-        self.ocr = PaddleOCR(
-            use_angle_cls=True,
-            lang=OCR_LANG,
-            det_db_thresh=0.3,  # Увеличивает чувствительность детектора текста
-            det_db_box_thresh=0.5,  # Порог уверенности для текстовых боксов
-            rec_batch_num=6,  # Размер батча для распознавания
-            use_gpu=True  # Использование GPU если доступно
-        )
+
+        # Модели не создаются на каждую страницу, а берутся из общего движка
+        self.engine = engine if engine is not None else get_default_engine()
+        self.layout = TextLayout(FONT_PATH, MAX_FONT_SIZE)
+        # Страница со стертым текстом до отрисовки и нарисованные блоки (для проекта страницы)
+        self.clean_plate = None
+        self.rendered_blocks = []
+        self.ocr_calls_avoided = 0
+        # Тексты без перевода после повторов: {текст: ошибка} и число по всем языкам
+        self.failed_translations = {}
+        self.translation_failures = 0
+
+    @property
+    def model(self):
+        return self.engine.model
+
+    @property
+    def ocr(self):
+        return self.engine.ocr
     
 
     def preprocess_text_region(self, text_region):
-        """Предобработка изображения перед OCR"""
-        # Увеличение размера изображения для лучшего распознавания
-        scale = 2
-        text_region = cv2.resize(text_region, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-        
-        # Преобразование в оттенки серого
-        gray = cv2.cvtColor(text_region, cv2.COLOR_BGR2GRAY)
-        
-        # Повышение контраста
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        contrast = clahe.apply(gray)
-        
-        # Бинаризация изображения
-        _, binary = cv2.threshold(contrast, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        return binary
+        """Предобработка изображения перед OCR (масштаб по высоте символов)"""
+        return self.engine.preprocessor.process(text_region)
 
     def remove_text_from_image(image, x, y, w, h):
         """Удаляет текст из прямоугольной области и заполняет её белым цветом"""
@@ -99,94 +327,18 @@ class MangaTranslator:
 
     def draw_text_on_image(self, image, text, x, y, w, h, max_font_size=MAX_FONT_SIZE, padding=4):
         """Рисует текст на изображении с переносом слов"""
-        img_pil = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-        draw = ImageDraw.Draw(img_pil)
-        
-        # Проверка минимальных размеров
-        if w < 20 or h < 20:
-            print(f"Warning: Box too small for text: {w}x{h}")
-            return image
-        
-        inner_x = x + padding
-        inner_y = y + padding
-        inner_w = w - 2 * padding
-        inner_h = h - 2 * padding
-        
-        try:
-            min_font_size = 8
-            font_size = min(h//2, max_font_size)
-            
-            while font_size >= min_font_size:
-                try:
-                    font = ImageFont.truetype(FONT_PATH, font_size)
-                except:
-                    print("Failed to load custom font, using default")
-                    font = ImageFont.load_default()
-                    
-                words = text.split()
-                lines = []
-                current_line = ""
-                
-                for word in words:
-                    # Проверяем, поместится ли слово целиком
-                    test_line = f"{current_line} {word}".strip()
-                    bbox = draw.textbbox((0, 0), test_line, font=font)
-                    
-                    if bbox[2] - bbox[0] <= inner_w:
-                        current_line = test_line
-                    else:
-                        # Если текущая строка не пуста, добавляем её
-                        if current_line:
-                            lines.append(current_line)
-                            current_line = ""
-                        
-                        # Проверяем, нужно ли разбивать слово
-                        word_bbox = draw.textbbox((0, 0), word, font=font)
-                        if word_bbox[2] - word_bbox[0] > inner_w:
-                            # Разбиваем длинное слово
-                            word_parts = self.hyphenate_word(word, inner_w, draw, font)
-                            if word_parts:
-                                lines.append(word_parts[0])
-                                current_line = word_parts[1]
-                        else:
-                            current_line = word
-                
-                if current_line:
-                    lines.append(current_line)
-                
-                # Проверяем общую высоту
-                total_height = sum(draw.textbbox((0, 0), line, font=font)[3] - draw.textbbox((0, 0), line, font=font)[1] 
-                                for line in lines)
-                
-                if total_height <= inner_h:
-                    # Вертикальное центрирование
-                    start_y = inner_y + (inner_h - total_height) // 2
-                    current_y = start_y
-                    
-                    # Рисуем текст
-                    for line in lines:
-                        bbox = draw.textbbox((0, 0), line, font=font)
-                        text_width = bbox[2] - bbox[0]
-                        text_x = inner_x + (inner_w - text_width) // 2
-                        
-                        draw.text((text_x, current_y), line, fill='black', font=font)
-                        current_y += bbox[3] - bbox[1]
-                    
-                    break
-                
-                font_size -= 1
-            
-            if font_size < min_font_size:
-                print(f"Warning: Could not fit text within bounds")
-                font = ImageFont.load_default()
-                draw.text((inner_x, inner_y), text, fill='black', font=font)
-        
-        except Exception as e:
-            print(f"Error drawing text: {e}")
-            font = ImageFont.load_default()
-            draw.text((inner_x, inner_y), text, fill='black', font=font)
-        
-        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+        layout = self.layout
+        if padding != layout.padding:
+            layout = TextLayout(FONT_PATH, max_font_size, padding=padding)
+        return layout.render(image, [(text, x, y, w, h)], max_font_size)
+
+    def render_text_blocks(self, items):
+        """Рисует тексты нескольких пузырей за один проход"""
+        tracer = get_tracer()
+        attempts = self.layout.size_attempts
+        with tracer.span('render', bubbles=len(items)):
+            self.output_image = self.layout.render(self.output_image, items)
+        tracer.count('font_size_iterations', self.layout.size_attempts - attempts)
 
     def get_section(self, block):
         """Определяет секцию на странице для блока текста"""
@@ -198,32 +350,45 @@ class MangaTranslator:
         else:
             return 2
 
-    def detect_speech_bubbles(self):
-        """Определяет пузыри с текстом на изображении"""
+    def detect_bubble_table(self, min_area=100, max_side=None):
+        """
+        Находит кандидаты в пузыри и возвращает таблицу их признаков
+
+        Args:
+            min_area: Минимальная площадь пузыря
+            max_side: Если большая сторона страницы длиннее, детекция идет
+                      в уменьшенной копии, а контуры переводятся обратно
+        """
+        max_side = DETECTION_MAX_SIDE if max_side is None else max_side
+
         # Конвертируем в оттенки серого
         gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
         
+        scale = 1.0
+        if max_side and max(gray.shape) > max_side:
+            scale = max_side / max(gray.shape)
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
         # Применяем пороговое значение для получения бинарного изображения
         _, binary = cv2.threshold(gray, 240, 255, cv2.THRESH_BINARY)
         
         # Находим контуры
         contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        bubble_contours = []
-        min_area = 100  # Минимальная площадь пузыря
+        # Отбрасываем мелкие контуры до аппроксимации
+        table = ContourTable.from_contours(contours, min_area * scale * scale)
         
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area > min_area:
-                # Аппроксимируем контур для сглаживания
-                epsilon = 0.02 * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
-                
-                # Добавляем контур если он достаточно гладкий
-                if len(approx) > 5:
-                    bubble_contours.append(contour)
+        if scale != 1.0:
+            # Координаты переводим обратно в полное разрешение
+            table = table.scaled(1 / scale, min_area)
         
-        return bubble_contours
+        # Оставляем контуры, которые достаточно гладкие
+        table.compute_vertices()
+        return table.select(table.vertices > 5)
+
+    def detect_speech_bubbles(self):
+        """Определяет пузыри с текстом на изображении"""
+        return self.detect_bubble_table().contours
 
     def create_bubble_mask(self, contour):
         """Создает маску для конкретного пузыря"""
@@ -233,119 +398,140 @@ class MangaTranslator:
 
     def hyphenate_word(self, word, max_width, draw, font):
         """Разбивает длинное слово с помощью дефиса"""
-        if not word:
-            return []
-            
-        vowels = 'аеёиоуыэюяАЕЁИОУЫЭЮЯ'
-        consonants = 'бвгджзйклмнпрстфхцчшщБВГДЖЗЙКЛМНПРСТФХЦЧШЩ'
-        
-        for i in range(len(word)-1, 1, -1):
-            # Проверяем, можно ли разделить слово в этой позиции
-            if (word[i-1] in vowels and word[i] in consonants) or \
-            (word[i-1] in consonants and word[i] in consonants):
-                # Пробуем разделить слово
-                first_part = word[:i] + '-'
-                bbox = draw.textbbox((0, 0), first_part, font=font)
-                if bbox[2] - bbox[0] <= max_width:
-                    return [first_part, word[i:]]
-        
-        # Если не удалось найти подходящее место для переноса,
-        # просто разделим слово пополам с дефисом
-        mid = len(word) // 2
-        return [word[:mid] + '-', word[mid:]]
+        return hyphenate_word(word, max_width, font)
+
+    def erase_block(self, block):
+        """Стирает текст пузыря блока вместе с присоединенными к нему частями"""
+        with get_tracer().span('erase', x=block['x'], y=block['y'], w=block['w'], h=block['h']):
+            for contour in [block['contour']] + block.get('merged_contours', []):
+                self.remove_text_from_bubble(contour)
 
     def remove_text_from_bubble(self, contour):
         """Удаляет текст из пузыря и заполняет его белым цветом"""
+        # Работаем только в прямоугольнике пузыря (с запасом под толщину контура)
+        page_height, page_width = self.image.shape[:2]
+        x, y, w, h = cv2.boundingRect(contour)
+        x0, y0 = max(0, x - 2), max(0, y - 2)
+        x1, y1 = min(page_width, x + w + 2), min(page_height, y + h + 2)
+        offset = (-x0, -y0)
+
         # Создаем маску для пузыря
-        mask = np.zeros(self.image.shape[:2], dtype=np.uint8)
-        cv2.drawContours(mask, [contour], -1, (255), -1)
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.drawContours(mask, [contour], -1, (255), -1, offset=offset)
         
         # Сохраняем контур пузыря
         border_mask = np.zeros_like(mask)
-        cv2.drawContours(border_mask, [contour], -1, (255), 2)
-        
-        # Создаем белое изображение того же размера
-        white_background = np.ones_like(self.output_image) * 255
+        cv2.drawContours(border_mask, [contour], -1, (255), 2, offset=offset)
         
-        # Применяем маску для заполнения белым цветом
-        mask_3channel = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
-        self.output_image = np.where(mask_3channel == 255, white_background, self.output_image)
+        # Заполняем пузырь белым цветом прямо в результирующем изображении
+        output_roi = self.output_image[y0:y1, x0:x1]
+        output_roi[mask == 255] = 255
         
         # Восстанавливаем контур пузыря
-        border_mask_3channel = cv2.cvtColor(border_mask, cv2.COLOR_GRAY2BGR)
-        original_borders = cv2.bitwise_and(self.image, border_mask_3channel)
-        self.output_image = cv2.addWeighted(self.output_image, 1, original_borders, 1, 0)
+        image_roi = self.image[y0:y1, x0:x1]
+        original_borders = cv2.bitwise_and(image_roi, image_roi, mask=border_mask)
+        self.output_image[y0:y1, x0:x1] = cv2.add(output_roi, original_borders)
 
     def get_bubble_bounds(self, contour):
         """Получает границы пузыря"""
         return cv2.boundingRect(contour)
 
-    def process_bubbles(self):
-        """Обрабатывает все пузыри на изображении"""
-        bubble_contours = self.detect_speech_bubbles()
-        text_blocks = []
-        
-        # Сортируем контуры по размеру, чтобы исключить слишком маленькие
-        bubble_contours = sorted(bubble_contours, key=cv2.contourArea, reverse=True)
-        
-        for contour in bubble_contours:
-            area = cv2.contourArea(contour)
-            if area < 100:  # Пропускаем слишком маленькие области
-                continue
-                
-            x, y, w, h = self.get_bubble_bounds(contour)
-            
-            # Проверяем соотношение сторон пузыря
-            aspect_ratio = w / h
-            if aspect_ratio > 5 or aspect_ratio < 0.2:  # Пропускаем слишком узкие или широкие области
+    def collect_bubble_regions(self, accept=None):
+        """
+        Находит пузыри и готовит их области для OCR
+
+        Args:
+            accept: Необязательная функция accept(x, y, w, h), отбирающая
+                    пузыри до вырезания и предобработки
+        """
+        candidates = []
+        tracer = get_tracer()
+        
+        # Сортируем контуры по размеру
+        with tracer.span('detect'):
+            table = self.detect_bubble_table().sorted_by_area()
+        tracer.count('bubbles_detected', len(table))
+        
+        # Пропускаем слишком маленькие, слишком узкие или широкие области
+        aspect_ratio = table.aspect_ratio
+        keep = (table.area >= 100) & (aspect_ratio <= 5) & (aspect_ratio >= 0.2)
+        tracer.count('bubbles_rejected_aspect', int(len(table) - keep.sum()))
+        table = table.select(keep)
+        
+        # Части одного пузыря объединяются, обертки вокруг пузырей отбрасываются до OCR
+        bboxes = table.bbox.tolist()
+        kept, merged, wrappers = suppress_overlapping(bboxes, table.contours, table.area)
+        self.ocr_calls_avoided = len(bboxes) - len(kept)
+        self.engine.ocr_calls_avoided += self.ocr_calls_avoided
+        tracer.count('bubbles_merged', sum(len(members) for _, members in merged.values()))
+        tracer.count('bubbles_rejected_wrapper', wrappers)
+        tracer.count('ocr_calls_avoided', self.ocr_calls_avoided)
+        if self.ocr_calls_avoided:
+            print(f"Skipped OCR for {self.ocr_calls_avoided} overlapping bubble candidates")
+        
+        for i in kept:
+            contour = table.contours[i]
+            x, y, w, h = merged[i][0] if i in merged else bboxes[i]
+            if accept is not None and not accept(x, y, w, h):
                 continue
-                
-            # Создаем маску для текущего пузыря
-            mask = np.zeros(self.image.shape[:2], dtype=np.uint8)
-            cv2.drawContours(mask, [contour], -1, (255), -1)
             
             # Вырезаем область с текстом
             text_region = self.image[y:y+h, x:x+w].copy()
             
             # Предобработка изображения
-            processed_region = self.preprocess_text_region(text_region)
+            with tracer.span('preprocess', x=x, y=y, w=w, h=h):
+                processed_region = self.preprocess_text_region(text_region)
             
-            # Применяем OCR с повышенной точностью
+            candidates.append({
+                'contour': contour,
+                # Контуры присоединенных частей пузыря стираются вместе с ним
+                'merged_contours': [table.contours[j] for j in merged[i][1]] if i in merged else [],
+                'region': processed_region,
+                'x': x,
+                'y': y,
+                'w': w,
+                'h': h
+            })
+        
+        return candidates
+
+    def recognize_region(self, processed_region):
+        """Распознает одну область отдельным вызовом OCR"""
+        with get_tracer().span('ocr_bubble'):
             result = self.ocr.ocr(processed_region, cls=True)
+        return parse_ocr_lines(result)
+
+    def build_text_blocks(self, candidates, recognized):
+        """Собирает блоки текста из результатов OCR, сопоставленных с пузырями"""
+        text_blocks = []
+        tracer = get_tracer()
+        
+        for candidate, lines in zip(candidates, recognized):
+            tracer.count('ocr_lines', len(lines))
+            # Фильтруем результаты с низкой уверенностью (единственное место фильтрации)
+            confident = [(text, confidence) for text, confidence in lines if confidence > MIN_LINE_CONFIDENCE]
+            tracer.count('ocr_low_confidence_lines', len(lines) - len(confident))
+            lines = confident
+            if not lines:
+                continue
             
-            if result and result[0]:
-                texts = []
-                confidences = []
-                
-                for line in result[0]:
-                    if isinstance(line, list):
-                        for item in line:
-                            if isinstance(item, tuple) and len(item) >= 2:
-                                text = item[0]  # Текст
-                                confidence = item[1]  # Уверенность распознавания
-                                
-                                # Фильтруем результаты с низкой уверенностью
-                                if confidence > 0.5:  # Порог уверенности
-                                    texts.append(text)
-                                    confidences.append(confidence)
-                
-                if texts:
-                    # Объединяем текст с учетом уверенности распознавания
-                    final_text = ' '.join(texts)
-                    avg_confidence = sum(confidences) / len(confidences)
-                    
-                    # Очистка текста
-                    final_text = self.clean_text(final_text)
-                    
-                    text_blocks.append({
-                        'text': final_text,
-                        'confidence': avg_confidence,
-                        'contour': contour,
-                        'x': x,
-                        'y': y,
-                        'w': w,
-                        'h': h
-                    })
+            # Объединяем текст с учетом уверенности распознавания
+            final_text = ' '.join(text for text, _ in lines)
+            avg_confidence = sum(confidence for _, confidence in lines) / len(lines)
+            
+            # Очистка текста
+            final_text = self.clean_text(final_text)
+            
+            text_blocks.append({
+                'text': final_text,
+                'confidence': avg_confidence,
+                'contour': candidate['contour'],
+                'merged_contours': candidate.get('merged_contours', []),
+                'x': candidate['x'],
+                'y': candidate['y'],
+                'w': candidate['w'],
+                'h': candidate['h']
+            })
         
         # Сортировка блоков с учетом их расположения на странице
         sorted_blocks = sorted(text_blocks, 
@@ -353,6 +539,24 @@ class MangaTranslator:
         
         return sorted_blocks
 
+    def process_bubbles(self, batched=True):
+        """
+        Обрабатывает все пузыри на изображении
+
+        Args:
+            batched: Распознавать строки всех пузырей общими батчами
+                     вместо отдельного вызова OCR на каждый пузырь
+        """
+        candidates = self.collect_bubble_regions()
+        regions = [candidate['region'] for candidate in candidates]
+        
+        if batched:
+            recognized = self.engine.recognize_regions(regions)
+        else:
+            recognized = [self.recognize_region(region) for region in regions]
+        
+        return self.build_text_blocks(candidates, recognized)
+
     def validate_text(self, text):
         """Валидация распознанного текста"""
         if not text:
@@ -371,26 +575,10 @@ class MangaTranslator:
 
     def merge_nearby_text(self, texts, max_distance=50):
         """Объединение близко расположенных текстовых блоков"""
-        merged = []
-        current_group = []
-        
-        for text in sorted(texts, key=lambda t: (t['y'], t['x'])):
-            if not current_group:
-                current_group.append(text)
-                continue
-                
-            last = current_group[-1]
-            if (abs(text['y'] - last['y']) < max_distance and 
-                abs(text['x'] - last['x']) < max_distance):
-                current_group.append(text)
-            else:
-                merged.append(' '.join(t['text'] for t in current_group))
-                current_group = [text]
-        
-        if current_group:
-            merged.append(' '.join(t['text'] for t in current_group))
-        
-        return merged
+        # Соседи ищутся по сетке, а не сравнением с последним блоком отсортированного списка
+        texts = sorted(texts, key=lambda t: (t['y'], t['x']))
+        groups = group_nearby([(t['x'], t['y']) for t in texts], max_distance)
+        return [' '.join(texts[i]['text'] for i in sorted(group)) for group in sorted(groups, key=min)]
 
     def clean_text(self, text):
         """Очистка и нормализация распознанного текста"""
@@ -402,69 +590,134 @@ class MangaTranslator:
         
         return text.strip()
 
-    def show_current_bubble(self, current_contour, processed_contours=None):
+    def save_result(self, output_path, writer=None):
         """
-        Показывает текущий обрабатываемый пузырь и уже обработанные пузыри на изображении
-        
+        Сохраняет результат
+
         Args:
-            current_contour: Текущий обрабатываемый контур
-            processed_contours: Список уже обработанных контуров
+            output_path: Путь файла результата
+            writer: OutputWriter для фоновой записи; без него файл пишется сразу
+
+        Returns:
+            Future записи (с writer) или словарь write_image
+        """
+        if writer is not None:
+            return writer.submit(self.output_image, output_path)
+
+        stats = write_image(self.output_image, output_path)
+        print(f"\nTranslated image saved as '{output_path}' "
+              f"({stats['bytes'] / 1024:.0f} KB, encoded in {stats['encode_time']:.2f}s)")
+        return stats
+
+    def translate_blocks(self, text_blocks, target_lang=None):
+        """
+        Переводит все тексты страницы одним пакетом
+
+        Args:
+            target_lang: Язык перевода, по умолчанию DEFAULT_TARGET_LANG
+
+        Returns:
+            Словарь {исходный текст: перевод}; для непереведенных пузырей -
+            исходный текст, ошибка записывается в failed_translations
+        """
+        target_lang = target_lang or DEFAULT_TARGET_LANG
+        failures = {}
+        unique_texts = list(dict.fromkeys(block['text'] for block in text_blocks))
+        try:
+            with get_tracer().span('translate', texts=len(unique_texts), target_lang=target_lang):
+                translations = dict(zip(unique_texts, translate_batch(unique_texts, target_lang,
+                                                                      failures=failures)))
+        except Exception as e:
+            print(f"Batch translation error: {e}")
+            # Все тексты страницы остаются исходными и считаются непереведенными
+            translations = {text: text for text in unique_texts}
+            failures = {normalize_text(text): f"{type(e).__name__}: {e}" for text in unique_texts}
+
+        for text in unique_texts:
+            error = failures.get(normalize_text(text))
+            if error is not None:
+                self.failed_translations[text] = error
+                print(f"Translation to {target_lang} failed, keeping original text: {text[:40]!r}: {error}")
+        if failures:
+            self.translation_failures += len(failures)
+            self.engine.translation_failures += len(failures)
+        return translations
+
+    def translate_and_replace_text(self, text_blocks, auto_mode=False, observer=None, target_lang=None):
+        """
+        Переводит и заменяет текст в пузырях
+
+        Args:
+            text_blocks: Блоки текста из process_bubbles
+            auto_mode: Использовать перевод без подтверждения
+            observer: Наблюдатель за обработкой пузырей (например, BubblePreview);
+                      без него страница обрабатывается без предпросмотра
+            target_lang: Язык перевода, по умолчанию DEFAULT_TARGET_LANG
         """
-        # Создаем копию изображения для отображения
-        display_image = self.image.copy()
-        
-        # Рисуем уже обработанные контуры зеленым цветом
-        if processed_contours:
-            cv2.drawContours(display_image, processed_contours, -1, (0, 255, 0), 2)
-        
-        # Рисуем текущий контур красным цветом
-        cv2.drawContours(display_image, [current_contour], -1, (0, 0, 255), 2)
-        
-        # Получаем размер экрана
-        screen_width = 1920  # Стандартное разрешение FullHD
-        screen_height = 1080
-        
-        # Вычисляем размер окна (70% от размера экрана)
-        window_width = int(screen_width * 0.7)
-        window_height = int(screen_height * 0.7)
-        
-        # Масштабируем изображение, сохраняя пропорции
-        aspect_ratio = display_image.shape[1] / display_image.shape[0]
-        
-        if aspect_ratio > 1:
-            # Изображение шире, чем выше
-            new_width = window_width
-            new_height = int(window_width / aspect_ratio)
-        else:
-            # Изображение выше, чем шире
-            new_height = window_height
-            new_width = int(window_height * aspect_ratio)
-        
-        # Изменяем размер изображения
-        resized_image = cv2.resize(display_image, (new_width, new_height))
-        
-        # Показываем изображение
-        cv2.namedWindow('Current bubble', cv2.WINDOW_NORMAL)
-        cv2.resizeWindow('Current bubble', new_width, new_height)
-        cv2.imshow('Current bubble', resized_image)
-        cv2.waitKey(1)
-
-    def save_result(self, output_path):
-        """Сохраняет результат"""
-        cv2.imwrite(output_path, self.output_image)
-        print(f"\nTranslated image saved as '{output_path}'")
-
-    def translate_and_replace_text(self, text_blocks, auto_mode=False):
-        """Переводит и заменяет текст в пузырях"""
         if not text_blocks:
             print("No text blocks found!")
             return
-            
+
+        self.apply_translations(text_blocks, self.translate_blocks(text_blocks, target_lang), auto_mode, observer)
+
+    def erase_text_blocks(self, text_blocks):
+        """
+        Стирает исходный текст всех блоков, не рисуя переводов
+
+        Чистая страница затем служит основой для render_language каждого
+        языка, поэтому стирание выполняется один раз на страницу.
+
+        Returns:
+            Стертые блоки без дубликатов текста
+        """
+        erased = []
+        previous_texts = set()
+        for block in text_blocks:
+            if not block['text'].strip() or block['text'] in previous_texts:
+                continue
+            previous_texts.add(block['text'])
+            self.erase_block(block)
+            erased.append(block)
+
+        self.clean_plate = self.output_image
+        return erased
+
+    def render_language(self, blocks, page_translations):
+        """
+        Рисует переводы одного языка на чистой странице после erase_text_blocks
+
+        Чистая страница не меняется: отрисовка создает новое изображение.
+
+        Returns:
+            Изображение результата (также в output_image)
+        """
+        text_items = []
+        self.rendered_blocks = []
+        for block in blocks:
+            # Без перевода в пузыре остается исходный текст, а не пустое место
+            text = (page_translations.get(block['text']) or block['text']).strip().capitalize()
+            text_items.append((text, block['x'], block['y'], block['w'], block['h']))
+            self.rendered_blocks.append((block, text))
+
+        self.output_image = self.clean_plate
+        self.render_text_blocks(text_items)
+        return self.output_image
+
+    def apply_translations(self, text_blocks, page_translations, auto_mode=False, observer=None):
+        """
+        Стирает исходный текст и рисует переводы
+
+        Args:
+            text_blocks: Блоки текста из process_bubbles
+            page_translations: Переводы из translate_blocks
+            auto_mode: Использовать перевод без подтверждения
+            observer: Наблюдатель за обработкой пузырей
+        """
         previous_texts = set()  # Для отслеживания дубликатов
-        processed_contours = []  # Для отслеживания обработанных контуров
-        
-        # Создаем окно заранее
-        cv2.namedWindow('Current bubble', cv2.WINDOW_NORMAL)
+        text_items = []  # Тексты рисуются одним проходом после стирания
+
+        if observer:
+            observer.start(self.image)
             
         for i, block in enumerate(text_blocks, 1):
             original_text = block['text']
@@ -476,18 +729,18 @@ class MangaTranslator:
             
             previous_texts.add(original_text)
             
-            # Показываем текущий пузырь и обработанные
-            self.show_current_bubble(block['contour'], processed_contours)
+            if observer:
+                observer.bubble(block['contour'])
             
             print(f"\n{i}. Original text (confidence: {confidence:.2f}):")
             print(f"   {original_text}")
             
-            try:
-                translated_text = translate_text(original_text)
-                print(f"   Translation: {translated_text}")
-            except Exception as e:
-                print(f"   Translation error: {e}")
-                translated_text = original_text
+            # Непереведенный текст остается исходным, как и в translate_batch: повторный
+            # запрос без языка страницы перевел бы его на язык по умолчанию
+            translated_text = page_translations.get(original_text) or original_text
+            if original_text in self.failed_translations:
+                print(f"   Translation failed: {self.failed_translations[original_text]}")
+            print(f"   Translation: {translated_text}")
             
             # В автоматическом режиме используем перевод без подтверждения
             if auto_mode:
@@ -497,21 +750,27 @@ class MangaTranslator:
                 final_text = custom_text if custom_text else translated_text
             
             if final_text and final_text.strip() != ' ':
-                self.remove_text_from_bubble(block['contour'])
-                self.output_image = self.draw_text_on_image(
-                    self.output_image,
+                self.erase_block(block)
+                text_items.append((
                     final_text.strip().capitalize(),
                     block['x'],
                     block['y'],
                     block['w'],
                     block['h']
-                )
-                processed_contours.append(block['contour'])
+                ))
+                self.rendered_blocks.append((block, text_items[-1][0]))
 
-        # Закрываем окно после завершения
-        cv2.destroyAllWindows()
+        # Отрисовка создает новое изображение, поэтому чистая страница не копируется
+        self.clean_plate = self.output_image
+        self.render_text_blocks(text_items)
+
+        if observer:
+            observer.finish()
 
 def main():
+    from bs4 import BeautifulSoup
+    import requests
+
     # Путь к изображению
     # image_path = f'{IMAGES_DIR}{INPUT_IMAGES_DIR}4.jpeg'
     # images = glob.glob(f'{IMAGES_DIR}{INPUT_IMAGES_DIR}*.jpeg')
@@ -545,7 +804,7 @@ def main():
         text_blocks = translator.process_bubbles()
         
         # Переводим и заменяем текст
-        translator.translate_and_replace_text(text_blocks)
+        translator.translate_and_replace_text(text_blocks, observer=BubblePreview())
         
         # Сохраняем результат
         translator.save_result(output_path)